@@ -975,7 +975,6 @@ def delete_quarantined_file(filename):
     quarantine_dir_abs = os.path.join(
         current_app.config['PROJECT_ROOT'], quarantine_dir_rel)
     filepath = os.path.join(quarantine_dir_abs, filename)
-    log_file_path = os.path.join(quarantine_dir_abs, 'quarantine_log.json')
 
     try:
         if os.path.exists(filepath) and os.path.isfile(filepath):
@@ -992,17 +991,10 @@ def delete_quarantined_file(filename):
         return redirect(url_for('admin.content_management', tab='attachments'))
 
     try:
-        if os.path.exists(log_file_path):
-            with open(log_file_path, 'r+', encoding='utf-8') as f:
-                logs = json.load(f)
-                updated_logs = [log for log in logs if log.get(
-                    'unique_filename') != filename]
-                f.seek(0)
-                f.truncate()
-                json.dump(updated_logs, f, indent=4)
-            flash(
-                f"Quarantined file '{filename}' and its log entry have been deleted.", 'success')
-    except (IOError, json.JSONDecodeError) as e:
+        util.remove_quarantine_log_entry(quarantine_dir_abs, filename)
+        flash(
+            f"Quarantined file '{filename}' and its log entry have been deleted.", 'success')
+    except IOError as e:
         flash(
             f"File was deleted, but failed to update quarantine log: {e}", 'danger')
 
@@ -1063,6 +1055,7 @@ def system_settings():
         )
 
         if database.update_system_settings(settings_to_update):
+            terminal_handler.invalidate_max_concurrent_webapp_clients()
             # --- 監査ログ記録 ---
             util.log_audit_event(
                 action='UPDATE_SYSTEM_SETTINGS',
@@ -1351,6 +1344,7 @@ def toggle_plugin_status():
     is_enabled = True if action == 'enable' else False
 
     if database.upsert_plugin_setting(plugin_id, is_enabled):
+        plugin_manager.invalidate_available_plugins_cache()
         flash(
             f"Plugin '{plugin_id}' has been {action}d. Restart the server to apply changes.", 'success')
         util.log_audit_event(
@@ -2094,6 +2088,7 @@ def access_management():
                 try:
                     ipaddress.ip_network(ip_address, strict=False)
                     if database.add_ip_ban(ip_address, reason, session.get('user_id')):
+                        util.invalidate_ip_ban_cache()
                         flash(f'Successfully banned {ip_address}.', 'success')
                     else:
                         flash(
@@ -2104,6 +2099,7 @@ def access_management():
         elif action == 'delete':
             ban_id = request.form.get('id')
             if ban_id and database.delete_ip_ban(ban_id):
+                util.invalidate_ip_ban_cache()
                 flash('IP ban rule has been removed.', 'success')
             else:
                 flash('Failed to remove IP ban rule.', 'danger')
@@ -2452,15 +2448,12 @@ def content_management():
             'quarantine_directory', 'data/quarantine')
         quarantine_dir_abs = os.path.join(
             current_app.config['PROJECT_ROOT'], quarantine_dir_rel)
-        log_file_path = os.path.join(quarantine_dir_abs, 'quarantine_log.json')
         try:
-            if os.path.exists(log_file_path):
-                with open(log_file_path, 'r', encoding='utf-8') as f:
-                    quarantined_files = json.load(f)
-                if isinstance(quarantined_files, list):
-                    quarantined_files.sort(key=lambda x: x.get(
-                        'timestamp', 0), reverse=True)
-        except (json.JSONDecodeError, IOError) as e:
+            quarantined_files = list(
+                util.iter_quarantine_log(quarantine_dir_abs))
+            quarantined_files.sort(key=lambda x: x.get(
+                'timestamp', 0), reverse=True)
+        except IOError as e:
             flash(f"Could not read quarantine log: {e}", 'danger')
 
         search_params = {'tab': 'attachments', 'sort_by': sort_by,
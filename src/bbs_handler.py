@@ -75,8 +75,7 @@ class CommandHandler:
             return
 
         if kanban_body:
-            processed_body = kanban_body.replace(
-                '\r\n', '\n').replace('\n', '\r\n')
+            processed_body = util.to_crlf(kanban_body)
             self.chan.send(processed_body.encode('utf-8'))
             if not processed_body.endswith('\r\n'):
                 self.chan.send(b'\r\n')
@@ -1027,8 +1026,7 @@ class CommandHandler:
         util.send_text_by_key(
             self.chan, "bbs.current_kanban_body_prompt", self.menu_mode)
         if current_body:
-            processed_current_body = current_body.replace(
-                '\r\n', '\n').replace('\n', '\r\n')
+            processed_current_body = util.to_crlf(current_body)
             self.chan.send(processed_current_body.encode('utf-8'))
             if not processed_current_body.endswith('\r\n'):
                 self.chan.send(b'\r\n')
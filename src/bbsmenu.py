@@ -479,8 +479,7 @@ def handle_auto_download(chan, login_id: str, user_id_pk: int, user_level: int,
             chan.send(b'\r\n')
 
             # 4. 本文を表示
-            body_to_send = article['body'].replace(
-                '\r\n', '\n').replace('\n', '\r\n')
+            body_to_send = util.to_crlf(article['body'])
             wrapped_body_lines = textwrap.wrap(
                 body_to_send, width=78, replace_whitespace=False, drop_whitespace=False)
             for line in wrapped_body_lines:
@@ -15,7 +15,7 @@ import collections
 import threading
 import time
 import os
-import json
+import orjson
 from . import terminal_handler
 from . import util, bbsmenu
 
@@ -222,7 +222,7 @@ def user_joins_room(room_id: str, login_id: str, display_name: str, chan, room_n
                             exclude_user_id=user_id)
 
                         if subscriptions:
-                            notification_payload = json.dumps({
+                            notification_payload = orjson.dumps({
                                 "title": "GR-BBS Chat",
                                 "body": f"{display_name}さんが「{room_name}」に入室しました。",
                                 "data": {"url": f"/?shortcut=c:{room_id}"}
@@ -393,12 +393,32 @@ class BoardManager:
 
     def __init__(self, db_manager_instance):
         self._db = db_manager_instance
+        # 掲示板の作成・削除・設定変更のたびに増える番号。掲示板情報のキャッシュの鮮度判定に使用する。
+        self.version = 0
 
     def get_by_shortcut_id(self, shortcut_id):
         """ショートカットID（例: 'A', 'B'）から掲示板情報を取得します。"""
         query = "SELECT * FROM boards WHERE shortcut_id = %s"
         return self._db.execute_query(query, (shortcut_id,), fetch='one')
 
+    def get_by_shortcut_ids(self, shortcut_ids):
+        """複数のショートカットIDの掲示板情報を1回のクエリでまとめて取得します。
+
+        照合はDBの照合順序に従い大文字小文字を区別しないため、結果のキーは小文字の文字列に揃えます。
+        呼び出し側も `str(shortcut_id).lower()` で参照してください。
+
+        :return: {小文字のshortcut_id: 掲示板情報} 形式の辞書。存在しない掲示板は含まれません。
+        """
+        shortcut_ids = list(
+            {str(shortcut_id).lower(): str(shortcut_id) for shortcut_id in shortcut_ids}.values())
+        if not shortcut_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(shortcut_ids))
+        query = f"SELECT * FROM boards WHERE shortcut_id IN ({placeholders})"
+        results = self._db.execute_query(
+            query, tuple(shortcut_ids), fetch='all')
+        return {str(row['shortcut_id']).lower(): row for row in results} if results else {}
+
     def get_by_id(self, board_id_pk):
         """主キー（`id`）から掲示板情報を取得します。"""
         query = "SELECT * FROM boards WHERE id = %s"
@@ -423,11 +443,13 @@ class BoardManager:
         """
         params = (shortcut_id, name, description, operators, default_permission,
                   kanban_body, status, read_level, write_level, board_type, allow_attachments, allowed_extensions, max_attachment_size_mb, max_threads, max_replies)
+        self.version += 1
         return self._db.execute_query(query, params)
 
     def delete_entry(self, shortcut_id):
         """ショートカットIDを指定して掲示板を削除します。関連データは削除されません。"""
         query = "DELETE FROM boards WHERE shortcut_id = %s"
+        self.version += 1
         return self._db.execute_query(query, (shortcut_id,)) is not None
 
     def delete_and_related_data(self, board_id_pk):
@@ -452,6 +474,7 @@ class BoardManager:
                 f"{cursor.rowcount} board entry deleted for board_id {board_id_pk}.")
 
             conn.commit()
+            self.version += 1
             logging.info(
                 f"Board ID {board_id_pk} and all related data have been successfully deleted.")
             return True
@@ -473,6 +496,7 @@ class BoardManager:
         params = (
             operator_user_ids_json_string if operator_user_ids_json_string is not None else '[]', board_id_pk)
         self._db.execute_query(query, params)
+        self.version += 1
         logging.info(
             f"掲示板ID {board_id_pk} のオペレーターリストを更新しました: {operator_user_ids_json_string}")
         return True
@@ -481,6 +505,7 @@ class BoardManager:
         """掲示板の看板（入室時に表示されるメッセージ）を更新します。"""
         query = "UPDATE boards SET kanban_body = %s WHERE id = %s"
         self._db.execute_query(query, (new_kanban_body, board_id_pk))
+        self.version += 1
         logging.info(f"掲示板ID {board_id_pk} の看板本文を更新しました")
         return True
 
@@ -490,6 +515,7 @@ class BoardManager:
         try:
             self._db.execute_query(
                 query, (read_level, write_level, board_id_pk))
+            self.version += 1
             logging.info(
                 f"掲示板ID {board_id_pk} のレベルを R:{read_level}, W:{write_level} に更新しました。")
             return True
@@ -873,6 +899,9 @@ class ArticleManager:
 class MailManager:
     """`mails` テーブルに関連する全てのデータベース操作を管理します。"""
 
+    # メール保存用のINSERT文。`executemany` ではコネクタが複数行の1つのINSERT文に書き換えて送信する。
+    _INSERT_QUERY = "INSERT INTO mails (sender_id, recipient_id, subject, body, sent_at, sender_ip_address) VALUES (%s, %s, %s, %s, %s, %s)"
+
     def __init__(self, db_manager_instance):
         self._db = db_manager_instance
 
@@ -888,6 +917,17 @@ class MailManager:
         result = self._db.execute_query(query, (user_id_pk,), fetch='one')
         return result['count'] if result else 0
 
+    def get_counts(self, user_id_pk):
+        """受信箱の総メール数と未読メール数を1回のクエリで取得し、(総数, 未読数) のタプルで返します。"""
+        query = """
+            SELECT COUNT(*) AS total, COALESCE(SUM(is_read = 0), 0) AS unread
+            FROM mails WHERE recipient_id = %s AND recipient_deleted = 0
+        """
+        result = self._db.execute_query(query, (user_id_pk,), fetch='one')
+        if not result:
+            return 0, 0
+        return int(result['total']), int(result['unread'])
+
     def mark_as_read(self, mail_id, recipient_user_id_pk):
         """指定されたメールを既読状態にします。メール閲覧時に呼び出されます。"""
         conn = self._db.get_connection()
@@ -919,6 +959,34 @@ class MailManager:
             if conn:
                 conn.close()
 
+    def mark_as_read_bulk(self, mail_ids, recipient_user_id_pk):
+        """複数のメールを1回のUPDATEでまとめて既読状態にします。更新した件数を返します。"""
+        if not mail_ids:
+            return 0
+        conn = self._db.get_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            placeholders = ', '.join(['%s'] * len(mail_ids))
+            query = f"UPDATE mails SET is_read = 1 WHERE recipient_id = %s AND is_read = 0 AND id IN ({placeholders})"
+            cursor.execute(query, (recipient_user_id_pk, *mail_ids))
+            updated_rows = cursor.rowcount
+            conn.commit()
+            logging.info(
+                f"ユーザID {recipient_user_id_pk} のメール {updated_rows} 件を既読にマークしました。")
+            return updated_rows
+        except mysql.connector.Error as err:
+            logging.error(
+                f"メール一括既読化中にDBエラー (UserID: {recipient_user_id_pk}): {err}")
+            if conn:
+                conn.rollback()
+            return 0
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
     def get_oldest_unread(self, recipient_user_id_pk):
         """指定されたユーザーの最も古い未読メールを1件取得します。メール閲覧コマンドで使用します。"""
         query = """
@@ -933,27 +1001,74 @@ class MailManager:
         """
         return self._db.execute_query(query, (recipient_user_id_pk,), fetch='one')
 
-    def get_for_view(self, user_id_pk, view_mode):
-        """指定されたユーザーの受信箱または送信箱の一覧を取得します。"""
+    def get_headers_for_view(self, user_id_pk, view_mode, limit=None, offset=0):
+        """指定されたユーザーの受信箱または送信箱の一覧を、本文を除いたヘッダ情報のみで取得します。
+
+        limit を指定した場合は、送信日時順で offset 件目から最大 limit 件のみを取得します。
+        本文は閲覧時に get_body で個別に取得します。
+        一覧の表示モードから見た削除状態 (is_deleted) と状態マーク (status_mark: '*' 削除済み, '#' 未読, ' ') も
+        SQL 側で算出して返します。
+        """
         if view_mode == 'inbox':
             query = """                SELECT
-                    m.id, m.sender_id, m.subject, m.body, m.is_read, m.sent_at, m.recipient_deleted, m.sender_ip_address,
+                    m.id, m.sender_id, m.subject, m.is_read, m.sent_at, m.recipient_deleted, m.sender_ip_address,
+                    m.recipient_deleted AS is_deleted,
+                    CASE WHEN m.recipient_deleted = 1 THEN '*' WHEN m.is_read = 0 THEN '#' ELSE ' ' END AS status_mark,
                     u.name AS sender_name
                 FROM mails AS m
                 LEFT JOIN users AS u ON m.sender_id = u.id
                 WHERE m.recipient_id = %s
-                ORDER BY m.sent_at ASC
+                ORDER BY m.sent_at ASC, m.id ASC
             """
         else:
             query = """                SELECT
-                    m.id, m.recipient_id, m.subject, m.body, m.is_read, m.sent_at, m.sender_deleted,
+                    m.id, m.recipient_id, m.subject, m.is_read, m.sent_at, m.sender_deleted,
+                    m.sender_deleted AS is_deleted,
+                    CASE WHEN m.sender_deleted = 1 THEN '*' ELSE ' ' END AS status_mark,
                     u.name AS recipient_name
                 FROM mails AS m
                 LEFT JOIN users AS u ON m.recipient_id = u.id
                 WHERE m.sender_id = %s
-                ORDER BY m.sent_at ASC
+                ORDER BY m.sent_at ASC, m.id ASC
             """
-        return self._db.execute_query(query, (user_id_pk,), fetch='all')
+        params = [user_id_pk]
+        if limit is not None:
+            query += " LIMIT %s OFFSET %s"
+            params.extend([limit, offset])
+        return self._db.execute_query(query, tuple(params), fetch='all')
+
+    def get_body(self, mail_id, user_id_pk):
+        """指定されたメールの本文を取得します。送信者または受信者本人のメールのみ取得できます。"""
+        query = "SELECT body FROM mails WHERE id = %s AND (recipient_id = %s OR sender_id = %s)"
+        result = self._db.execute_query(
+            query, (mail_id, user_id_pk, user_id_pk), fetch='one')
+        return result['body'] if result else None
+
+    def get_count_for_view(self, user_id_pk, view_mode):
+        """受信箱または送信箱の一覧に表示されるメールの件数（削除済みを含む）を取得します。"""
+        id_column = 'recipient_id' if view_mode == 'inbox' else 'sender_id'
+        query = f"SELECT COUNT(*) AS count FROM mails WHERE {id_column} = %s"
+        result = self._db.execute_query(query, (user_id_pk,), fetch='one')
+        return result['count'] if result else 0
+
+    def get_first_unread_index(self, user_id_pk):
+        """受信箱の一覧における、最初の未読メールの位置（0始まり）を取得します。未読がなければ None を返します。"""
+        query = """
+            SELECT (
+                SELECT COUNT(*) FROM mails AS m
+                WHERE m.recipient_id = %s
+                  AND (m.sent_at < f.sent_at OR (m.sent_at = f.sent_at AND m.id < f.id))
+            ) AS position
+            FROM (
+                SELECT id, sent_at FROM mails
+                WHERE recipient_id = %s AND is_read = 0 AND recipient_deleted = 0
+                ORDER BY sent_at ASC, id ASC
+                LIMIT 1
+            ) AS f
+        """
+        result = self._db.execute_query(
+            query, (user_id_pk, user_id_pk), fetch='one')
+        return result['position'] if result else None
 
     def toggle_delete_status_generic(self, mail_id, user_id, mode_param):
         """メールの削除フラグをトグルします（送信者側または受信者側の論理削除）。"""
@@ -1003,6 +1118,31 @@ class MailManager:
             if conn:
                 conn.close()
 
+    def send_many(self, sender_id, recipient_ids, subject, body, sent_at, ip_address=None):
+        """同じ内容のメールを複数の宛先に、1回の executemany と1つのトランザクションで保存します。"""
+        if not recipient_ids:
+            return True
+        conn = self._db.get_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            params_list = [(sender_id, recipient_id, subject, body, sent_at, ip_address)
+                           for recipient_id in recipient_ids]
+            cursor.executemany(self._INSERT_QUERY, params_list)
+            conn.commit()
+            return True
+        except mysql.connector.Error as err:
+            logging.error(
+                f"メールの一括保存中にDBエラー (SenderID: {sender_id}): {err}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
     def send_system_mail(self, recipient_id, subject, body):
         """システム（シスオペ）から指定されたユーザーへメールを送信します。"""
         # usersインスタンスがグローバルに利用可能であることを前提とする
@@ -1012,10 +1152,9 @@ class MailManager:
             return False
 
         sent_at = int(time.time())
-        query = "INSERT INTO mails (sender_id, recipient_id, subject, body, sent_at, sender_ip_address) VALUES (%s, %s, %s, %s, %s, %s)"
         params = (sender_id, recipient_id, subject, body, sent_at, None)
 
-        if self._db.execute_query(query, params) is not None:
+        if self._db.execute_query(self._INSERT_QUERY, params) is not None:
             logging.info(
                 f"システムメールを送信しました (To: UserID {recipient_id}, Subject: {subject})")
             return True
@@ -1148,6 +1287,38 @@ class AccessLogManager:
                   username, display_name, event_type, message)
         self._db.execute_query(query, params)
 
+    def log_events_bulk(self, events):
+        """
+        複数のアクセスイベントを1回の `executemany` でまとめて記録します。
+
+        :param events: (timestamp, ip_address, user_id, username, display_name, event_type, message) のタプルのリスト。
+        :return: 記録した件数。エラー時は0。
+        """
+        if not events:
+            return 0
+        query = """
+            INSERT INTO access_logs (timestamp, ip_address, user_id, username, display_name, event_type, message)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self._db.get_connection()
+            cursor = conn.cursor()
+            cursor.executemany(query, events)
+            conn.commit()
+            return len(events)
+        except mysql.connector.Error as err:
+            logging.error(f"アクセスログの一括記録中にDBエラー ({len(events)}件): {err}")
+            if conn:
+                conn.rollback()
+            return 0
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
     def get_logs(self, page=1, per_page=50, ip_address=None, username=None, display_name=None, event_type=None, message=None, sort_by='timestamp', order='desc'):
         """管理画面用に、ページネーション、フィルタリング、ソート機能付きでアクセスログを取得します。"""
         where_clauses = []
@@ -1434,6 +1605,31 @@ class PasskeyManager:
         params = (new_sign_count, int(time.time()), credential_id)
         return self._db.execute_query(query, params) is not None
 
+    def update_sign_counts_bulk(self, updates):
+        """
+        複数のPasskeyの署名カウントと最終利用日時を、1回のUPDATE文でまとめて更新します。
+
+        :param updates: (credential_id, new_sign_count, last_used_at) のタプルのリスト。
+        :return: 成功した場合はTrue。
+        """
+        if not updates:
+            return True
+        cases = ' '.join(['WHEN %s THEN %s'] * len(updates))
+        placeholders = ', '.join(['%s'] * len(updates))
+        query = f"""
+            UPDATE passkeys
+            SET sign_count = CASE credential_id {cases} END,
+                last_used_at = CASE credential_id {cases} END
+            WHERE credential_id IN ({placeholders})
+        """
+        params = []
+        for credential_id, new_sign_count, _ in updates:
+            params.extend((credential_id, new_sign_count))
+        for credential_id, _, last_used_at in updates:
+            params.extend((credential_id, last_used_at))
+        params.extend(credential_id for credential_id, _, _ in updates)
+        return self._db.execute_query(query, tuple(params)) is not None
+
     def delete_by_id_and_user_id(self, passkey_id: int, user_id: int) -> bool:
         """主キーIDとユーザーIDを指定してPasskeyを削除します。"""
         query = "DELETE FROM passkeys WHERE id = %s AND user_id = %s"
@@ -1659,6 +1855,44 @@ class DatabaseInitializer:
             logging.error(f"データベース初期化チェック中にエラー: {e}")
             return False
 
+    def ensure_mail_indexes(self):
+        """
+        `mails`テーブルに必要なインデックスが無ければ追加します。
+
+        インデックスは`CREATE TABLE IF NOT EXISTS`にしか書かれていないため、
+        既存の環境では起動時にここで不足分を補います。何度実行しても安全です。
+        """
+        required_indexes = {
+            'idx_mails_recipient_sent': ('recipient_id', 'sent_at'),
+            'idx_mails_sender_sent': ('sender_id', 'sent_at'),
+            'idx_mails_recipient_unread': ('recipient_id', 'is_read', 'recipient_deleted', 'sent_at'),
+        }
+        query = """
+            SELECT INDEX_NAME AS index_name,
+                   GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) AS columns
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'mails'
+            GROUP BY INDEX_NAME
+        """
+        rows = self._db.execute_query(query, fetch='all')
+        if rows is None:
+            logging.error("mailsテーブルのインデックス情報の取得に失敗しました。")
+            return False
+        # 名前に関係なく、同じカラム構成のインデックスがあれば追加済みとみなす
+        existing = {tuple(row['columns'].split(',')) for row in rows if row['columns']}
+
+        success = True
+        for index_name, columns in required_indexes.items():
+            if columns in existing:
+                continue
+            alter_query = f"ALTER TABLE mails ADD INDEX {index_name} ({', '.join(columns)})"
+            if self._db.execute_query(alter_query) is None:
+                logging.error(f"mailsテーブルへのインデックス追加に失敗しました: {index_name}")
+                success = False
+            else:
+                logging.info(f"mailsテーブルにインデックスを追加しました: {index_name}")
+        return success
+
     def initialize_and_sysop(self, sysop_id, sysop_password, sysop_email):
         """全てのテーブルを作成し、デフォルトデータ (シスオペ、ゲストユーザー等) を挿入します。"""
         # utilモジュールはdatabase.pyの外部にあるため、ここでインポートする
@@ -1734,7 +1968,10 @@ class DatabaseInitializer:
                     is_read BOOLEAN DEFAULT 0,
                     sent_at INT NOT NULL,
                     sender_deleted BOOLEAN DEFAULT 0,
-                    recipient_deleted BOOLEAN DEFAULT 0
+                    recipient_deleted BOOLEAN DEFAULT 0,
+                    INDEX idx_mails_recipient_sent (recipient_id, sent_at),
+                    INDEX idx_mails_sender_sent (sender_id, sent_at),
+                    INDEX idx_mails_recipient_unread (recipient_id, is_read, recipient_deleted, sent_at)
                 )
                 """,
                 """
@@ -1972,6 +2209,63 @@ class PluginDataManager:
             return result['value']  # 既にオブジェクトならそのまま返す
         return None
 
+    def save_many(self, plugin_id, items):
+        """
+        複数のキーと値を1回の `executemany` でまとめて保存または更新します。
+        ループ内で `save` を繰り返すとキーごとにDBとの往復が発生するため、こちらを使用してください。
+
+        :param items: {'key1': value1, 'key2': value2, ...} 形式の辞書。
+        :return: 成功した場合はTrue、失敗した場合はFalse。
+        """
+        if not items:
+            return True
+        current_time = int(time.time())
+        query = """
+            INSERT INTO plugin_data (plugin_id, `key`, `value`, created_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE `value` = VALUES(`value`), updated_at = VALUES(updated_at)
+        """
+        params = [(plugin_id, key, json.dumps(value), current_time, current_time)
+                  for key, value in items.items()]
+        conn = None
+        cursor = None
+        try:
+            conn = self._db.get_connection()
+            cursor = conn.cursor()
+            cursor.executemany(query, params)
+            conn.commit()
+            return True
+        except mysql.connector.Error as err:
+            logging.error(f"プラグインデータの一括保存中にDBエラー (Plugin: {plugin_id}, {len(params)}件): {err}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def get_many(self, plugin_id, keys):
+        """
+        指定された複数のキーに紐づくデータを1回のクエリでまとめて取得します。
+        存在しないキーは結果の辞書に含まれません。
+
+        :return: {'key1': value1, 'key2': value2, ...} 形式の辞書。
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        placeholders = ', '.join(['%s'] * len(keys))
+        query = f"SELECT `key`, `value` FROM plugin_data WHERE plugin_id = %s AND `key` IN ({placeholders})"
+        results = self._db.execute_query(
+            query, (plugin_id, *keys), fetch='all')
+        if not results:
+            return {}
+        # MySQLのJSON型は文字列として返されることがあるため、明示的にデコードする
+        return {row['key']: json.loads(row['value']) if isinstance(row['value'], str) else row['value']
+                for row in results}
+
     def delete(self, plugin_id, key):
         """指定されたプラグインIDとキーに紐づく単一のデータを削除します。"""
         query = "DELETE FROM plugin_data WHERE plugin_id = %s AND `key` = %s"
@@ -2032,7 +2326,10 @@ def execute_query(query, params=None, fetch=None):
 
 
 def update_record(table, set_data, where_data):
-    return db_manager.update_record(table, set_data, where_data)
+    result = db_manager.update_record(table, set_data, where_data)
+    if table == 'boards':
+        boards.version += 1
+    return result
 
 
 def get_user_auth_info(username):
@@ -2119,6 +2416,15 @@ def get_board_by_shortcut_id(shortcut_id):
     return boards.get_by_shortcut_id(shortcut_id)
 
 
+def get_boards_by_shortcut_ids(shortcut_ids):
+    return boards.get_by_shortcut_ids(shortcut_ids)
+
+
+def get_boards_version():
+    """掲示板情報の更新バージョンを返します。値が変わっていれば掲示板情報のキャッシュは古くなっています。"""
+    return boards.version
+
+
 def get_board_by_id(board_id_pk):
     return boards.get_by_id(board_id_pk)
 
@@ -2231,16 +2537,36 @@ def get_total_mail_count(user_id_pk):
     return mails.get_total_count(user_id_pk)
 
 
+def get_mail_counts(user_id_pk):
+    return mails.get_counts(user_id_pk)
+
+
 def mark_mail_as_read(mail_id, recipient_user_id_pk):
     return mails.mark_as_read(mail_id, recipient_user_id_pk)
 
 
+def mark_mails_as_read_bulk(mail_ids, recipient_user_id_pk):
+    return mails.mark_as_read_bulk(mail_ids, recipient_user_id_pk)
+
+
 def get_oldest_unread_mail(recipient_user_id_pk):
     return mails.get_oldest_unread(recipient_user_id_pk)
 
 
-def get_mails_for_view(user_id_pk, view_mode):
-    return mails.get_for_view(user_id_pk, view_mode)
+def get_mail_headers_for_view(user_id_pk, view_mode, limit=None, offset=0):
+    return mails.get_headers_for_view(user_id_pk, view_mode, limit=limit, offset=offset)
+
+
+def get_mail_body(mail_id, user_id_pk):
+    return mails.get_body(mail_id, user_id_pk)
+
+
+def get_mail_count_for_view(user_id_pk, view_mode):
+    return mails.get_count_for_view(user_id_pk, view_mode)
+
+
+def get_first_unread_mail_index(user_id_pk):
+    return mails.get_first_unread_index(user_id_pk)
 
 
 def toggle_mail_delete_status_generic(mail_id, user_id, mode_param):
@@ -2251,6 +2577,10 @@ def send_system_mail(recipient_id, subject, body):
     return mails.send_system_mail(recipient_id, subject, body)
 
 
+def send_mails(sender_id, recipient_ids, subject, body, sent_at, ip_address=None):
+    return mails.send_many(sender_id, recipient_ids, subject, body, sent_at, ip_address=ip_address)
+
+
 def save_telegram(sender_name, recipient_name, message, current_timestamp):
     return telegrams.save(sender_name, recipient_name, message, current_timestamp)
 
@@ -2276,6 +2606,11 @@ def log_access_event(ip_address, event_type, user_id=None, username=None, displa
     return access_logs.log_event(ip_address, event_type, user_id, username, display_name, message)
 
 
+def log_access_events_bulk(events):
+    """キューに溜めたアクセスイベントをまとめて記録します。"""
+    return access_logs.log_events_bulk(events)
+
+
 def get_access_logs(page=1, per_page=50, ip_address=None, username=None, display_name=None, event_type=None, message=None, sort_by='timestamp', order='desc'):  # noqa
     return access_logs.get_logs(page, per_page, ip_address, username, display_name, event_type, message, sort_by, order)  # noqa
 
@@ -2342,6 +2677,10 @@ def update_passkey_sign_count(credential_id, new_sign_count):
     return passkeys.update_sign_count(credential_id, new_sign_count)
 
 
+def update_passkey_sign_counts_bulk(updates):
+    return passkeys.update_sign_counts_bulk(updates)
+
+
 def delete_passkey_by_id_and_user_id(passkey_id: int, user_id: int) -> bool:
     return passkeys.delete_by_id_and_user_id(passkey_id, user_id)
 
@@ -2372,6 +2711,10 @@ def initialize_database_and_sysop(sysop_id, sysop_password, sysop_email):
     return initializer.initialize_and_sysop(sysop_id, sysop_password, sysop_email)
 
 
+def ensure_mail_indexes():
+    return initializer.ensure_mail_indexes()
+
+
 def optimize_all_tables():
     """全てのテーブルに対して `OPTIMIZE TABLE` コマンドを実行します。"""
     try:
@@ -2397,6 +2740,16 @@ def get_plugin_data(plugin_id, key):
     return plugin_data_manager.get(plugin_id, key)
 
 
+def save_plugin_data_many(plugin_id, items):
+    """複数のプラグインデータを一括で保存または更新します。"""
+    return plugin_data_manager.save_many(plugin_id, items)
+
+
+def get_plugin_data_many(plugin_id, keys):
+    """指定された複数キーのプラグインデータを一括で取得します。"""
+    return plugin_data_manager.get_many(plugin_id, keys)
+
+
 def delete_plugin_data(plugin_id, key):
     """指定されたキーのプラグインデータを削除します。"""
     return plugin_data_manager.delete(plugin_id, key)
@@ -2481,3 +2834,6 @@ def init_app(app):
     if not check_database_initialized():
         from . import util  # 循環インポートを避ける
         util.initialize_database_and_sysop()
+    else:
+        # 既存の環境にも後から追加したインデックスを反映する
+        ensure_mail_indexes()
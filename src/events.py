@@ -9,36 +9,204 @@ SocketIOイベントハンドラを定義します。クライアント接続の
 """
 
 from flask import request, session, url_for, current_app
-from flask_socketio import emit, disconnect
+from flask_socketio import disconnect
+import atexit
+import collections
 import logging
 import os
-import glob
+import fnmatch
+import re
+import time
 import uuid
-import json
-import shutil
-import ipaddress
+from gevent.threadpool import ThreadPool
 from werkzeug.utils import secure_filename
 from . import database
 
 from . import terminal_handler, util
 
+# --- アクセスログのバッファリング ---
+# 接続/切断のたびにDBへ書き込むと1イベントごとに往復が発生するため、
+# イベントはキューに積み、バックグラウンドタスクがまとめて書き込む。
+ACCESS_LOG_FLUSH_INTERVAL = 0.5  # 秒
+ACCESS_LOG_BATCH_SIZE = 500
+_access_log_queue = collections.deque()
+_access_log_flusher_started = False
+
+
+def _queue_access_event(ip_address, event_type, username=None, display_name=None, message=None):
+    """アクセスイベントを書き込みキューに追加します。"""
+    # database.log_access_event と同様、GUESTの表示名がなければ生成する
+    if username and username.upper() == 'GUEST' and not display_name:
+        display_name = util.get_display_name(username, ip_address)
+    _access_log_queue.append((int(time.time()), ip_address, None,
+                              username, display_name, event_type, message))
+
+
+def _flush_access_log_queue():
+    """キューから最大 `ACCESS_LOG_BATCH_SIZE` 件を取り出してDBに書き込み、取り出した件数を返します。"""
+    batch = []
+    while _access_log_queue and len(batch) < ACCESS_LOG_BATCH_SIZE:
+        batch.append(_access_log_queue.popleft())
+    if batch:
+        database.log_access_events_bulk(batch)
+    return len(batch)
+
+
+def _drain_access_log_queue():
+    """キューに残っている全てのアクセスイベントを書き込みます。終了時に呼び出されます。"""
+    try:
+        while _flush_access_log_queue():
+            pass
+    except Exception as e:
+        logging.error(f"アクセスログキューの書き出し中にエラー: {e}")
+
+
+def _access_log_flusher(socketio):
+    """一定間隔でアクセスログキューをDBに書き出すバックグラウンドタスク。"""
+    while True:
+        socketio.sleep(ACCESS_LOG_FLUSH_INTERVAL)
+        try:
+            while _flush_access_log_queue() >= ACCESS_LOG_BATCH_SIZE:
+                pass
+        except Exception as e:
+            logging.error(f"アクセスログの一括書き込み中にエラー: {e}")
+
+
+# ログ表示用の改行正規化 (LF/CRLF -> CRLF を1パスで行う)
+_NL_RE = re.compile(rb'\r?\n')
+
+# ログをターミナルに表示する際の最大サイズ。これを超える場合は末尾のみを送信する。
+# 全体は `web.download_log` からダウンロードできる。
+LOG_CONTENT_MAX_BYTES = 1024 * 1024
+_LOG_TRUNCATED_MARKER = (
+    f"*** ログが大きいため、末尾 {LOG_CONTENT_MAX_BYTES // 1024}KB のみ表示しています。"
+    "全体はダウンロードして確認してください。 ***\r\n")
+
+
+def _log_bytes_for_terminal(raw, truncated):
+    """ログのバイト列を、ターミナル表示用の文字列 (改行はCRLF) に変換します。"""
+    if truncated:
+        # 途中から読み込んだ場合、マルチバイト文字の途中で切れないよう次の行頭から表示する
+        newline_pos = raw.find(b'\n')
+        if newline_pos != -1:
+            raw = raw[newline_pos + 1:]
+    content = _NL_RE.sub(b'\r\n', raw).decode('utf-8', 'replace')
+    if truncated:
+        content = _LOG_TRUNCATED_MARKER + content
+    return content
+
+# --- セッションログ一覧のキャッシュ ---
+# {検索用の表示名: (有効期限(monotonic), ログファイル情報のリスト)}
+LOG_FILE_LIST_CACHE_TTL = 5.0  # 秒
+_log_file_list_cache = {}
+
+
+def _log_file_search_name(handler):
+    """ログファイル一覧の検索に使用する表示名を返します。"""
+    display_name_for_log = handler.user_session.get(
+        'display_name', handler.user_session.get('username'))
+    return display_name_for_log.replace('(', '_').replace(')', '')
+
+
+# secure_filename を通しても変化しないことが明らかなファイル名
+# (先頭・末尾が英数字で、英数字と . _ - のみで構成される)
+_SAFE_RE = re.compile(r'^[A-Za-z0-9](?:[A-Za-z0-9._-]{0,253}[A-Za-z0-9])?$')
+
+
+def _fast_secure_filename(filename):
+    """よくあるASCIIのファイル名はそのまま返し、それ以外は `secure_filename` で無害化します。"""
+    if _SAFE_RE.match(filename):
+        return filename
+    return secure_filename(filename)
+
+
+# サムネイル生成用のワーカースレッド数
+THUMBNAIL_WORKERS = 2
+_thumbnail_pool = None
+
+
+def _get_thumbnail_pool():
+    """サムネイル生成用のスレッドプールを返します。初回呼び出し時に作成します。
+
+    geventのスレッドプールは実際のOSスレッドで動作し、Pillowは画像処理中にGILを
+    解放するため、ハブ (イベントループ) をブロックせずにサムネイルを生成できます。
+    """
+    global _thumbnail_pool
+    if _thumbnail_pool is None:
+        _thumbnail_pool = ThreadPool(THUMBNAIL_WORKERS)
+    return _thumbnail_pool
+
+
+def _create_thumbnail_in_pool(original_path, thumbnail_path):
+    """スレッドプール上でサムネイルを生成します。
+
+    完了を待たずに実行するため、Pillowの予期せぬ例外もここでログに記録します。
+    """
+    try:
+        util.create_thumbnail(original_path, thumbnail_path)
+    except Exception as e:
+        logging.error(
+            f"サムネイルの生成中に予期せぬエラー: {e} (Path: {original_path})", exc_info=True)
+
+
+# アップロードファイル書き込み時の1回あたりの最大書き込みサイズ
+UPLOAD_WRITE_CHUNK_SIZE = 1024 * 1024
+
+
+def _write_upload_file(path, data):
+    """アップロードされたデータをファイルに書き込み、最後に一度だけfsyncします。
+
+    Pythonのファイルオブジェクトを経由せず、`os.write` で直接書き込みます。
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        mv = memoryview(data)
+        offset = 0
+        while offset < len(mv):
+            offset += os.write(fd, mv[offset:offset + UPLOAD_WRITE_CHUNK_SIZE])
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
 
 def init_events(socketio, app):
     """全てのSocketIOイベントハンドラを初期化し、登録します。"""
+    global _access_log_flusher_started
+    if not _access_log_flusher_started:
+        _access_log_flusher_started = True
+        socketio.start_background_task(_access_log_flusher, socketio)
+        atexit.register(_drain_access_log_queue)
+
+    def _local_emit(event, *args):
+        """現在のクライアントにのみイベントを送信します。
+
+        送信先は常にこのプロセスに接続しているクライアントであるため、
+        メッセージキュー (Redis等) を経由せずに直接送信します。
+        """
+        socketio.emit(event, *args, to=request.sid, ignore_queue=True)
 
     @socketio.on('connect')
     def handle_connect(auth=None):
         """新しいクライアントのWebSocket接続を処理し、セッションを初期化します。"""
+        # 接続元IPはここで一度だけ取得・解析し、以降のチェックで使い回す
+        remote_ip_str = util.get_client_ip()
+        remote_ip_obj = None
+        if remote_ip_str:
+            try:
+                remote_ip_obj = util.parse_ip(remote_ip_str)
+            except ValueError:
+                pass
+
         # --- Proxy/VPN/Torチェック ---
         security_config = current_app.config.get('SECURITY', {})
         if security_config.get('block_proxies', False):
-            remote_ip_str = util.get_client_ip()
             if remote_ip_str:
-                is_proxy, reason = util.is_proxy_connection(remote_ip_str)
+                is_proxy, reason = util.is_proxy_connection(
+                    remote_ip_str, remote_ip_obj)
                 if is_proxy:
                     logging.warning(
                         f"Proxy/VPN/TorからのWebSocket接続をブロックしました。IP: {remote_ip_str}, Reason: {reason}")
-                    database.log_access_event(
+                    _queue_access_event(
                         ip_address=remote_ip_str, event_type='PROXY_BLOCKED',
                         username=session.get('username'), display_name=session.get('display_name'),
                         message=f"Blocked proxy/hosting WebSocket connection ({reason})."
@@ -48,15 +216,14 @@ def init_events(socketio, app):
         # --- IP BANチェック ---
         # HTTPリクエストだけでなく、WebSocket接続時にもBANチェックを行う
         try:
-            banned_ips = database.get_all_ip_bans()
-            if banned_ips:
-                remote_ip_str = util.get_client_ip()
-                if remote_ip_str:
-                    remote_ip = ipaddress.ip_address(remote_ip_str)
-                    if any(remote_ip in ipaddress.ip_network(ban['ip_address'], strict=False) for ban in banned_ips):
-                        logging.warning(
-                            f"Banned IP {remote_ip_str} tried to connect via WebSocket.")
-                        return False  # 接続を拒否
+            # BANが1件もなければチェックしない (不正な形式のIPでも接続を許可する)
+            if remote_ip_str and util.has_ip_bans():
+                if remote_ip_obj is None:
+                    raise ValueError(f"不正なIPアドレスです: {remote_ip_str}")
+                if util.is_ip_banned(remote_ip_obj):
+                    logging.warning(
+                        f"Banned IP {remote_ip_str} tried to connect via WebSocket.")
+                    return False  # 接続を拒否
         except Exception as e:
             logging.error(f"WebSocket接続時のIP BANチェック中にエラー: {e}")
             return False  # 安全のためエラー時も接続を拒否
@@ -66,35 +233,30 @@ def init_events(socketio, app):
 
         username_to_connect = session.get('username', 'Unknown')
         if username_to_connect.upper() != 'GUEST':
-            sid_to_disconnect = None
-            for sid, handler in terminal_handler.client_states.copy().items():
-                if handler.user_session.get('username') == username_to_connect:
-                    sid_to_disconnect = sid
-                    break
+            with terminal_handler.current_webapp_clients_lock:
+                sid_to_disconnect = terminal_handler.username_to_sid.get(
+                    username_to_connect.upper())
             if sid_to_disconnect:
                 logoff_message_text = util.get_text_by_key(
                     "auth.logged_in_from_another_location", session.get('menu_mode', '2'))
-                processed_text = logoff_message_text.replace(
-                    '\r\n', '\n').replace('\n', '\r\n')
+                processed_text = util.to_crlf(logoff_message_text)
                 socketio.emit('force_disconnect', {
                               'message': processed_text}, to=sid_to_disconnect)
                 disconnect(sid_to_disconnect, silent=True)
 
+        max_clients = terminal_handler.get_max_concurrent_webapp_clients()
         with terminal_handler.current_webapp_clients_lock:
-            server_prefs = database.read_server_pref()
-            max_clients = server_prefs.get(
-                'max_concurrent_webapp_clients', 4)
             if max_clients > 0 and terminal_handler.current_webapp_clients >= max_clients:
                 return False
             terminal_handler.current_webapp_clients += 1
 
         username = session.get('username', 'Unknown')
-        ip_addr = util.get_client_ip()
+        ip_addr = remote_ip_str
         display_name = util.get_display_name(username, ip_addr)
         logging.getLogger('grbbs.access').info(
             f"CONNECT - User: {username}, DisplayName: {display_name}, IP: {ip_addr}, SID: {request.sid}")
-        database.log_access_event(ip_address=ip_addr, event_type='CONNECT',
-                                  username=username, display_name=display_name, message=f"SID: {request.sid}")
+        _queue_access_event(ip_address=ip_addr, event_type='CONNECT',
+                            username=username, display_name=display_name, message=f"SID: {request.sid}")
 
         sid = request.sid
         user_session_data = {
@@ -105,6 +267,9 @@ def init_events(socketio, app):
         handler = terminal_handler.WebTerminalHandler(
             app, sid, user_session_data, ip_addr, socketio)
         terminal_handler.client_states[sid] = handler
+        if username.upper() != 'GUEST':
+            with terminal_handler.current_webapp_clients_lock:
+                terminal_handler.username_to_sid[username.upper()] = sid
 
     @socketio.on('set_speed')
     def handle_set_speed(speed_name):
@@ -132,8 +297,18 @@ def init_events(socketio, app):
             display_name = handler.user_session.get(
                 'display_name', username)
         ip_addr = util.get_client_ip()
-        database.log_access_event(ip_address=ip_addr, event_type='DISCONNECT',
-                                  username=username, display_name=display_name, message=f"SID: {sid}")
+        _queue_access_event(ip_address=ip_addr, event_type='DISCONNECT',
+                            username=username, display_name=display_name, message=f"SID: {sid}")
+
+        if handler and username.upper() != 'GUEST':
+            with terminal_handler.current_webapp_clients_lock:
+                # 同じユーザーが別の場所から再接続済みの場合は、新しいセッションの索引を残す
+                if terminal_handler.username_to_sid.get(username.upper()) == sid:
+                    del terminal_handler.username_to_sid[username.upper()]
+
+        if handler and handler.input_dropped_count:
+            logging.warning(
+                f"セッション中に破棄された入力: {handler.input_dropped_count}件 (User: {username}, SID: {sid})")
 
         if sid in terminal_handler.client_states:
             terminal_handler.client_states[sid].stop_worker()
@@ -145,8 +320,7 @@ def init_events(socketio, app):
         sid = request.sid
         if sid in terminal_handler.client_states:
             handler = terminal_handler.client_states[sid]
-            handler.input_queue.append(data)
-            handler.input_event.set()
+            handler.enqueue_input(data)
 
     @socketio.on('toggle_logging')
     def handle_toggle_logging():
@@ -156,10 +330,10 @@ def init_events(socketio, app):
             handler = terminal_handler.client_states[sid]
             if handler.is_logging:
                 handler.is_logging = False
-                log_content = "".join(handler.log_buffer)
+                log_content = bytes(handler.log_buffer)
                 handler.log_buffer.clear()
                 if not log_content.strip():
-                    emit('logging_stopped', {'message': 'ログに内容がありません。'})
+                    _local_emit('logging_stopped', {'message': 'ログに内容がありません。'})
                     return
                 bbs_name = util.app_config.get(
                     'server', {}).get('BBS_NAME', 'GR-BBS')
@@ -172,18 +346,20 @@ def init_events(socketio, app):
                 filepath = os.path.join(
                     current_app.config['SESSION_LOG_DIR'], filename)
                 try:
-                    with open(filepath, 'w', encoding='utf-8') as f:
+                    with open(filepath, 'wb') as f:
                         f.write(log_content)
+                    _log_file_list_cache.pop(
+                        _log_file_search_name(handler), None)
                     download_url = url_for(
                         'web.download_log', filename=filename)
-                    emit('log_saved', {
-                         'url': download_url, 'filename': filename})
+                    _local_emit('log_saved', {
+                                'url': download_url, 'filename': filename})
                 except Exception as e:
-                    emit('logging_stopped', {'message': 'ログファイルの保存に失敗しました。'})
+                    _local_emit('logging_stopped', {'message': 'ログファイルの保存に失敗しました。'})
             else:
                 handler.is_logging = True
                 handler.log_buffer.clear()
-                emit('logging_started')
+                _local_emit('logging_started')
 
     @socketio.on('get_log_files')
     def handle_get_log_files():
@@ -196,36 +372,42 @@ def init_events(socketio, app):
             return
 
         handler = terminal_handler.client_states[sid]
-        display_name_for_log = handler.user_session.get(
-            'display_name', handler.user_session.get('username'))
-        safe_display_name = display_name_for_log.replace(
-            '(', '_').replace(')', '')
+        safe_display_name = _log_file_search_name(handler)
         search_pattern = f"*_{safe_display_name}_*.log"
 
-        log_files = []
         try:
-            session_log_dir = current_app.config.get('SESSION_LOG_DIR')
-            file_paths = glob.glob(os.path.join(
-                session_log_dir, search_pattern))
-            for file_path in file_paths:
-                try:
-                    stat = os.stat(file_path)
-                    log_files.append({
-                        'filename': os.path.basename(file_path),
-                        'size': stat.st_size,
-                        'mtime': stat.st_mtime
-                    })
-                except OSError:
-                    continue
-
-            log_files.sort(key=lambda x: x['mtime'], reverse=True)
-            emit('log_files_list', {'files': log_files})
+            now = time.monotonic()
+            cached = _log_file_list_cache.get(safe_display_name)
+            if cached and cached[0] > now:
+                log_files = cached[1]
+            else:
+                log_files = []
+                session_log_dir = current_app.config.get('SESSION_LOG_DIR')
+                # scandirはディレクトリを1回走査するだけで済み、globのようにエントリごとのlstatを行わない
+                with os.scandir(session_log_dir) as it:
+                    for entry in it:
+                        if entry.name.startswith('.') or not fnmatch.fnmatch(entry.name, search_pattern):
+                            continue
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        log_files.append({
+                            'filename': entry.name,
+                            'size': stat.st_size,
+                            'mtime': stat.st_mtime
+                        })
+
+                log_files.sort(key=lambda x: x['mtime'], reverse=True)
+                _log_file_list_cache[safe_display_name] = (
+                    now + LOG_FILE_LIST_CACHE_TTL, log_files)
+            _local_emit('log_files_list', {'files': log_files})
             logging.info(
                 f"Sent log file list to {session.get('username')} (sid: {sid})")
         except Exception as e:
             logging.error(
                 f"Error getting log files for {session.get('username')}: {e}")
-            emit('error_message', {'message': 'ログファイルの取得に失敗しました。'})
+            _local_emit('error_message', {'message': 'ログファイルの取得に失敗しました。'})
 
     @socketio.on('get_log_content')
     def handle_get_log_content(data):
@@ -245,15 +427,18 @@ def init_events(socketio, app):
             return
 
         try:
-            with open(safe_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            content_for_terminal = content.replace(
-                '\r\n', '\n').replace('\n', '\r\n')
-            emit('log_content', {'filename': filename,
-                 'content': content_for_terminal})
+            with open(safe_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                truncated = size > LOG_CONTENT_MAX_BYTES
+                if truncated:
+                    f.seek(size - LOG_CONTENT_MAX_BYTES)
+                raw = f.read(LOG_CONTENT_MAX_BYTES)
+            content_for_terminal = _log_bytes_for_terminal(raw, truncated)
+            _local_emit('log_content', {'filename': filename,
+                        'content': content_for_terminal})
         except Exception as e:
             logging.error(f"Error reading log file {filename}: {e}")
-            emit('error_message', {'message': 'ログファイルの読み込みに失敗しました。'})
+            _local_emit('error_message', {'message': 'ログファイルの読み込みに失敗しました。'})
 
     @socketio.on('get_current_log_buffer')
     def handle_get_current_log_buffer():
@@ -262,16 +447,16 @@ def init_events(socketio, app):
         if sid in terminal_handler.client_states:
             handler = terminal_handler.client_states[sid]
             if handler.is_logging:
-                content = "".join(handler.log_buffer)
-                content_for_terminal = content.replace(
-                    '\r\n', '\n').replace('\n', '\r\n')
-                emit('log_content', {'filename': '(ロギング中)',
-                     'content': content_for_terminal})
+                truncated = len(handler.log_buffer) > LOG_CONTENT_MAX_BYTES
+                raw = bytes(handler.log_buffer[-LOG_CONTENT_MAX_BYTES:])
+                content_for_terminal = _log_bytes_for_terminal(raw, truncated)
+                _local_emit('log_content', {'filename': '(ロギング中)',
+                            'content': content_for_terminal})
                 logging.info(
                     f"Sent current log buffer to {session.get('username')} (sid: {sid})")
             else:
-                emit('log_content', {'filename': '(ロギング中)',
-                     'content': 'ロギングが開始されていません。'})
+                _local_emit('log_content', {'filename': '(ロギング中)',
+                            'content': 'ロギングが開始されていません。'})
 
     @socketio.on('upload_attachment')
     def handle_upload_attachment(data):
@@ -284,15 +469,15 @@ def init_events(socketio, app):
         handler.pending_attachment = None
 
         if 'user_id' not in handler.user_session:
-            emit('attachment_upload_error', {'message': '認証されていません。'})
+            _local_emit('attachment_upload_error', {'message': '認証されていません。'})
             return
 
         filename = data.get('filename')
         file_data = data.get('data')
 
         if not filename or not file_data:
-            emit('attachment_upload_error',
-                 {'message': 'ファイル名またはデータがありません。'})
+            _local_emit('attachment_upload_error',
+                        {'message': 'ファイル名またはデータがありません。'})
             return
 
         board_config = getattr(handler, 'current_board_for_upload', {}) or {}
@@ -308,7 +493,7 @@ def init_events(socketio, app):
             message = f'ファイルサイズが大きすぎます ({max_size_mb}MBまで)。'
 
         # ファイル名を無害化してから拡張子チェックを行う
-        safe_original_filename = secure_filename(filename)
+        safe_original_filename = _fast_secure_filename(filename)
 
         if not message:
             allowed_extensions_str = board_config.get('allowed_extensions')
@@ -324,7 +509,7 @@ def init_events(socketio, app):
 
         if message:
             handler.pending_attachment = {'error': message}
-            emit('attachment_upload_error', {'message': message})
+            _local_emit('attachment_upload_error', {'message': message})
             return
 
         _, ext = os.path.splitext(safe_original_filename)
@@ -333,11 +518,9 @@ def init_events(socketio, app):
         save_path = os.path.join(attachment_dir, unique_filename)
 
         try:
-            with open(save_path, 'wb') as f:
-                f.write(file_data)
-
             # --- ClamAVによるウイルススキャン ---
-            is_safe, scan_message = util.scan_file_with_clamav(save_path)
+            # ディスクに書き込む前にメモリ上のデータをスキャンする
+            is_safe, scan_message = util.scan_bytes_with_clamav(file_data)
             if not is_safe:
                 logging.warning(
                     f"ウイルス検出: {filename} (User: {handler.user_session.get('username')}). Reason: {scan_message}")
@@ -358,24 +541,11 @@ def init_events(socketio, app):
                         'board_name': board_config.get('name', 'N/A'),
                         'scan_result': scan_message,
                     }
-                    log_file_path = os.path.join(
-                        quarantine_dir_abs, 'quarantine_log.json')
-                    logs = []
-                    if os.path.exists(log_file_path):
-                        try:
-                            with open(log_file_path, 'r', encoding='utf-8') as f:
-                                logs = json.load(f)
-                                if not isinstance(logs, list):
-                                    logs = []
-                        except (json.JSONDecodeError, IOError):
-                            logs = []
-                    logs.append(log_entry)
-                    with open(log_file_path, 'w', encoding='utf-8') as f:
-                        json.dump(logs, f, indent=4)
-
-                    # ファイルを隔離ディレクトリに移動
-                    shutil.move(save_path, os.path.join(
-                        quarantine_dir_abs, unique_filename))
+                    util.append_quarantine_log(quarantine_dir_abs, log_entry)
+
+                    # ファイルを隔離ディレクトリに直接書き込む
+                    _write_upload_file(os.path.join(
+                        quarantine_dir_abs, unique_filename), file_data)
                     logging.info(
                         f"ファイルを隔離しました: {unique_filename} -> {quarantine_dir_abs}")
                 except OSError as e:
@@ -384,9 +554,11 @@ def init_events(socketio, app):
                 # エラーメッセージをクライアントに送信
                 error_msg = f"ウイルスが検出されたため、アップロードは拒否されました。({scan_message})"
                 handler.pending_attachment = {'error': error_msg}
-                emit('attachment_upload_error', {'message': error_msg})
+                _local_emit('attachment_upload_error', {'message': error_msg})
                 return
 
+            _write_upload_file(save_path, file_data)
+
             # --- サムネイル生成 ---
             is_image = safe_original_filename.lower().endswith(
                 ('.png', '.jpg', '.jpeg', '.gif', '.bmp'))
@@ -397,7 +569,10 @@ def init_events(socketio, app):
                     current_app.config['PROJECT_ROOT'], thumbnail_dir_rel)
                 thumbnail_path = os.path.join(
                     thumbnail_dir_abs, unique_filename)
-                util.create_thumbnail(save_path, thumbnail_path)
+                # サムネイル生成はCPU負荷が高いため、イベントループを止めないよう
+                # ワーカースレッドで実行し、完了は待たない
+                _get_thumbnail_pool().spawn(
+                    _create_thumbnail_in_pool, save_path, thumbnail_path)
 
             handler.pending_attachment = {
                 'unique_filename': unique_filename,
@@ -407,12 +582,12 @@ def init_events(socketio, app):
             }
             logging.info(
                 f"ファイルがアップロードされました: {filename} -> {unique_filename} (User: {handler.user_session.get('username')})")
-            emit('attachment_upload_success',
-                 {'original_filename': filename})
+            _local_emit('attachment_upload_success',
+                        {'original_filename': filename})
         except Exception as e:
             logging.error(f"ファイルアップロード処理中にエラー: {e}", exc_info=True)
-            emit('attachment_upload_error',
-                 {'message': 'サーバーエラーが発生しました。'})
+            _local_emit('attachment_upload_error',
+                        {'message': 'サーバーエラーが発生しました。'})
 
     @socketio.on('upload_file_from_plugin')
     def handle_upload_file_from_plugin(data):
@@ -425,7 +600,7 @@ def init_events(socketio, app):
         handler.pending_upload = None  # 古い情報をクリア
 
         if 'user_id' not in handler.user_session:
-            emit('upload_error_from_plugin', {'message': '認証されていません。'})
+            _local_emit('upload_error_from_plugin', {'message': '認証されていません。'})
             return
 
         filename = data.get('filename')
@@ -441,22 +616,23 @@ def init_events(socketio, app):
         upload_settings = handler.pending_upload_settings or {}
         max_size_mb = upload_settings.get('max_size_mb', 10)
         allowed_extensions = upload_settings.get('allowed_extensions')
+        allowed_extensions_lc = upload_settings.get('allowed_extensions_lc')
 
         # ファイルサイズチェック
         max_size_bytes = max_size_mb * 1024 * 1024
         if len(file_data) > max_size_bytes:
             msg = f'ファイルサイズが大きすぎます ({max_size_mb}MBまで)。'
             handler.pending_upload = {'error': msg}
-            emit('upload_error_from_plugin', {'message': msg})
+            _local_emit('upload_error_from_plugin', {'message': msg})
             handler.input_event.set()  # APIの待機を解除
             return
 
         # 拡張子チェック
-        safe_original_filename = secure_filename(filename)
-        if allowed_extensions:
+        safe_original_filename = _fast_secure_filename(filename)
+        if allowed_extensions_lc:
             file_ext = os.path.splitext(safe_original_filename)[
                 1].lstrip('.').lower()
-            if file_ext not in [ext.lower() for ext in allowed_extensions]:
+            if file_ext not in allowed_extensions_lc:
                 msg = f'許可されていないファイル形式です。({", ".join(allowed_extensions)})'
                 handler.pending_upload = {'error': msg}
                 handler.input_event.set()  # APIの待機を解除
@@ -468,7 +644,8 @@ def init_events(socketio, app):
         if preferred_filename:
             # 拡張子を元ファイルから拝借し、ファイル名を無害化
             _, ext = os.path.splitext(safe_original_filename)
-            unique_filename = secure_filename(f"{preferred_filename}{ext}")
+            unique_filename = _fast_secure_filename(
+                f"{preferred_filename}{ext}")
         else:
             _, ext = os.path.splitext(safe_original_filename)
             unique_filename = f"{uuid.uuid4()}{ext}"
@@ -487,8 +664,7 @@ def init_events(socketio, app):
         os.makedirs(plugin_upload_dir, exist_ok=True)
         save_path = os.path.join(plugin_upload_dir, unique_filename)
 
-        with open(save_path, 'wb') as f:
-            f.write(file_data)
+        _write_upload_file(save_path, file_data)
 
         # 成功情報をハンドラにセット
         handler.pending_upload = {
@@ -517,5 +693,4 @@ def init_events(socketio, app):
         handler = terminal_handler.client_states.get(sid)
         if handler:
             content = data.get('content', '')
-            handler.input_queue.append(content)
-            handler.input_event.set()
+            handler.enqueue_input(content)
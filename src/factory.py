@@ -8,24 +8,27 @@
 Blueprintの登録、拡張機能の初期化など、起動に関する中核的な処理を担当します。
 """
 
+import atexit
 import datetime
-import ipaddress
+import functools
 import threading
 import logging
 import os
 import secrets
-from logging.handlers import RotatingFileHandler
+import tempfile
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from urllib.parse import urlparse
 
 import redis
-from flask import Flask, Response, session
+from flask import Flask, Response, g, session
 from flask import request
 from markupsafe import escape, Markup
 from flask_session import Session
 from flask_socketio import SocketIO
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-from . import util, database, plugin_manager, backup_util, errors, extensions
+from . import util, database, plugin_manager, backup_util, errors, extensions, passkey_handler
 from .routes import web_bp
 from .events import init_events
 from .admin.routes import admin_bp
@@ -34,6 +37,145 @@ from .admin.routes import admin_bp
 db_init_lock = threading.Lock()
 db_initialized = False
 socketio = SocketIO()
+# --- 共有Redis接続プール ---
+# セッション (Flask-Session) とレートリミット (Flask-Limiter) で同じプールを使い、
+# ワーカーごとのアイドル接続を減らす。上限に達した場合は空きが出るまで待機する。
+_REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+_REDIS_POOL = redis.BlockingConnectionPool.from_url(
+    _REDIS_URL, max_connections=int(os.getenv('REDIS_POOL_SIZE', '10')))
+# --- 全レスポンスに付与するセキュリティヘッダー ---
+_CSP = (
+    "default-src 'self';"
+    "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://cdn.socket.io https://cdn.jsdelivr.net https://code.jquery.com https://stackpath.bootstrapcdn.com https://fonts.googleapis.com;"
+    "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://fonts.googleapis.com https://cdnjs.cloudflare.com https://stackpath.bootstrapcdn.com https://themes.googleusercontent.com;"
+    "font-src 'self' https://fonts.gstatic.com https://cdnjs.cloudflare.com;"
+    "img-src 'self' data: https:;"
+    "connect-src 'self' wss: ws: https://grbbs.midyuki.net https://cdn.jsdelivr.net https://cdn.socket.io;"
+    "frame-ancestors 'none';"
+    "form-action 'self';"
+    "base-uri 'self';"
+)
+_SECURITY_HEADERS = {
+    'Content-Security-Policy': _CSP,
+    'X-Content-Type-Options': 'nosniff',
+    'X-Frame-Options': 'DENY',
+    'X-XSS-Protection': '1; mode=block',
+}
+
+# セッション署名用の秘密鍵 (setting/.secret_key から読み込む)
+_secret_key = None
+
+# create_app() で作成/確認済みのディレクトリ
+_ENSURED_DIRS = set()
+
+# セキュリティチェック (before_request) の対象外とするパス
+_SKIP_PREFIXES = ('/socket.io',)
+
+# SocketIO (Engine.IO) の設定
+# ProxyFixがSocketIOにも適用されるようにws_proxy_fixを有効にし、
+# ファイルアップロードの上限を12MBに設定する (デフォルトは1MB)
+_ENGINEIO_OPTIONS = {
+    "async_mode": "gevent",
+    "ws_proxy_fix": True,
+    "max_http_buffer_size": 12 * 1024 * 1024,
+}
+
+# アクセスログ・監査ログをファイルに書き出すバックグラウンドリスナー
+_log_queue_listener = None
+# キーを大文字化した設定: (元の設定辞書, 大文字化した設定辞書)
+_uppercase_config_cache = (None, None)
+
+
+# これより短い鍵ファイルは、書き込み途中で中断されたものとみなして作り直す
+SECRET_KEY_MIN_LENGTH = 16
+
+
+def _read_secret_key(path):
+    """鍵ファイルを読み込みます。ファイルがないか、内容が短すぎる場合はNoneを返します。"""
+    try:
+        with open(path, 'rb') as f:
+            key = f.read()
+    except FileNotFoundError:
+        return None
+    if len(key) < SECRET_KEY_MIN_LENGTH:
+        return None
+    return key
+
+
+def _load_or_create_secret_key(path):
+    """セッション署名用の秘密鍵をファイルから読み込みます。ファイルがなければ生成して保存します。
+
+    再起動のたびに鍵が変わると既存のセッションが全て無効になるため、鍵を永続化します。
+    鍵は一時ファイルに書き込んでから配置するため、書き込み途中のファイルが読まれることはありません。
+    """
+    global _secret_key
+    if _secret_key is not None:
+        return _secret_key
+
+    key = _read_secret_key(path)
+    if key is None:
+        new_key = secrets.token_bytes(32)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix='.secret_key.')
+        try:
+            try:
+                os.write(fd, new_key)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            if os.path.exists(path):
+                # 空や短すぎる鍵ファイルは置き換える
+                os.replace(tmp_path, path)
+            else:
+                try:
+                    # 他のワーカーが先に作成していた場合は、そちらの鍵を使う
+                    os.link(tmp_path, path)
+                except FileExistsError:
+                    pass
+                except OSError:
+                    # ハードリンクが使えないファイルシステムでは置き換えで配置する
+                    os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        # 同時に起動したワーカー間で同じ鍵を使うよう、配置されたファイルを読み直す
+        key = _read_secret_key(path) or new_key
+        logging.info(f"セッション用の秘密鍵を用意しました: {path}")
+    _secret_key = key
+    return key
+
+
+@functools.lru_cache(maxsize=8)
+def _split_origins(origins_str):
+    """カンマ区切りのオリジン文字列をタプルに分割します。"""
+    return tuple(origins_str.split(',')) if origins_str else ()
+
+
+def _ensure_dir(path):
+    """ディレクトリが存在しなければ作成します。作成/確認済みのディレクトリは再確認しません。"""
+    if path in _ENSURED_DIRS:
+        return
+    os.makedirs(path, exist_ok=True)
+    _ENSURED_DIRS.add(path)
+
+
+@functools.lru_cache(maxsize=8192)
+def _format_timestamp(ts):
+    """UNIXタイムスタンプ (整数秒) を日時文字列に変換します。一覧表示などで同じ値が繰り返されるためキャッシュします。"""
+    return datetime.datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _nl2br(s):
+    """文字列をエスケープし、改行を <br> に変換します。"""
+    # `<code>` タグなどを安全にエスケープしつつ、改行を <br> に変換する
+    escaped = escape(s)
+    if '\n' not in escaped:
+        return escaped
+    return escaped.replace('\n', Markup('<br>\n'))
+
+
+# 同じ本文が繰り返し描画されることが多いため、変換結果をキャッシュする
+_nl2br_cached = functools.lru_cache(maxsize=4096)(_nl2br)
 
 
 def create_app():
@@ -46,7 +188,7 @@ def create_app():
     Returns:
         tuple[Flask, SocketIO]: 設定済みのFlaskアプリとSocketIOインスタンス。
     """
-    global db_initialized
+    global db_initialized, _uppercase_config_cache, _log_queue_listener
 
     # --- パス設定 ---
     _current_dir = os.path.dirname(os.path.abspath(__file__))  # srcディレクトリ
@@ -62,8 +204,10 @@ def create_app():
     # --- アプリケーション設定の読み込みと適用 ---
     config_path = os.path.join(PROJECT_ROOT, 'setting', 'config.toml')
     util.load_app_config_from_path(config_path)
-    uppercase_config = {key.upper(): value for key,
-                        value in util.app_config.items()}
+    if _uppercase_config_cache[0] is not util.app_config:
+        _uppercase_config_cache = (util.app_config, {key.upper(): value for key,
+                                                     value in util.app_config.items()})
+    uppercase_config = _uppercase_config_cache[1]
     app.config.from_mapping(uppercase_config)
     app.config['PROJECT_ROOT'] = PROJECT_ROOT
 
@@ -79,23 +223,21 @@ def create_app():
 
     app.wsgi_app = ProxyFix(
         app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
-    app.secret_key = secrets.token_hex(16)
+    app.secret_key = _load_or_create_secret_key(
+        os.path.join(PROJECT_ROOT, 'setting', '.secret_key'))
 
     # --- 必要なディレクトリの存在確認と作成 ---
     ATTACHMENT_DIR = app.config.get('WEBAPP', {}).get(
         'ATTACHMENT_UPLOAD_DIR', 'data/attachments')
     if not os.path.isabs(ATTACHMENT_DIR):
         ATTACHMENT_DIR = os.path.join(PROJECT_ROOT, ATTACHMENT_DIR)
-    os.makedirs(ATTACHMENT_DIR, exist_ok=True)
-    os.makedirs(APP_LOG_DIR, exist_ok=True)
-    os.makedirs(TELEGRAM_LOG_DIR, exist_ok=True)
-    os.makedirs(CHAT_LOG_DIR, exist_ok=True)
     QUARANTINE_DIR = app.config.get('CLAMAV', {}).get(
         'QUARANTINE_DIRECTORY', 'data/quarantine')
     if not os.path.isabs(QUARANTINE_DIR):
         QUARANTINE_DIR = os.path.join(PROJECT_ROOT, QUARANTINE_DIR)
-    os.makedirs(QUARANTINE_DIR, exist_ok=True)
-    os.makedirs(SESSION_LOG_DIR, exist_ok=True)
+    for directory in (ATTACHMENT_DIR, APP_LOG_DIR, TELEGRAM_LOG_DIR,
+                      CHAT_LOG_DIR, QUARANTINE_DIR, SESSION_LOG_DIR):
+        _ensure_dir(directory)
     app.config['ATTACHMENT_DIR'] = ATTACHMENT_DIR
     app.config['SESSION_LOG_DIR'] = SESSION_LOG_DIR
 
@@ -104,10 +246,11 @@ def create_app():
     access_logger.setLevel(logging.INFO)
     access_handler = RotatingFileHandler(
         os.path.join(APP_LOG_DIR, 'grbbs.access.log'),
-        maxBytes=1024 * 1024 * 5, backupCount=3, encoding='utf-8'
+        maxBytes=1024 * 1024 * 5, backupCount=3, encoding='utf-8', delay=True
     )
     access_handler.setFormatter(logging.Formatter('[%(asctime)s] %(message)s'))
-    access_logger.addHandler(access_handler)
+    # 同じロガー名でフィルタし、QueueListener が各レコードを対応するファイルにのみ書き込むようにする
+    access_handler.addFilter(logging.Filter('grbbs.access'))
     access_logger.propagate = False
 
     error_handler = RotatingFileHandler(
@@ -122,23 +265,39 @@ def create_app():
     audit_logger.setLevel(logging.INFO)
     audit_handler = RotatingFileHandler(
         os.path.join(APP_LOG_DIR, 'audit.log'),
-        maxBytes=1024 * 1024 * 2, backupCount=3, encoding='utf-8'
+        maxBytes=1024 * 1024 * 2, backupCount=3, encoding='utf-8', delay=True
     )
     audit_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-    audit_logger.addHandler(audit_handler)
+    audit_handler.addFilter(logging.Filter('grbbs.audit'))
     audit_logger.propagate = False
 
+    # アクセスログと監査ログのファイル書き込みはリクエスト処理中に行わず、
+    # キュー経由でバックグラウンドのリスナーに任せる
+    if _log_queue_listener is None:
+        log_queue = queue.Queue(-1)
+        queue_handler = QueueHandler(log_queue)
+        access_logger.addHandler(queue_handler)
+        audit_logger.addHandler(queue_handler)
+        _log_queue_listener = QueueListener(
+            log_queue, access_handler, audit_handler, respect_handler_level=True)
+        _log_queue_listener.start()
+        atexit.register(_log_queue_listener.stop)
+
     # --- データベースの初期化 ---
     # この中でテーブル作成や初期データ投入が行われる
     with db_init_lock:
         if not db_initialized:
             database.init_app(app)
-            plugin_manager.load_plugins()
+            # プラグインの読み込みは起動を遅らせないようバックグラウンドで行う
+            plugin_manager.load_plugins_in_background()
             db_initialized = True
 
     # --- Flask拡張機能の初期化 ---
-    app.config.setdefault('RATELIMIT_STORAGE_URI', os.getenv(
-        'REDIS_URL', 'redis://localhost:6379/0').replace('/0', '/1'))
+    if 'RATELIMIT_STORAGE_URI' not in app.config:
+        # レートリミットのキーには 'LIMITS' プレフィックスが付くため、セッションと同じDBで共存できる
+        app.config['RATELIMIT_STORAGE_URI'] = _REDIS_URL
+        app.config['RATELIMIT_STORAGE_OPTIONS'] = {
+            'connection_pool': _REDIS_POOL}
     ratelimit_config = app.config.get('RATELIMIT', {})
     default_limits_str = ratelimit_config.get(
         'default_limits', '200 per day;50 per hour')
@@ -146,9 +305,8 @@ def create_app():
     extensions.limiter.init_app(app)
 
     # --- セッション設定 (Redis) ---
-    redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     app.config['SESSION_TYPE'] = 'redis'
-    app.config['SESSION_REDIS'] = redis.from_url(redis_url)
+    app.config['SESSION_REDIS'] = redis.Redis(connection_pool=_REDIS_POOL)
     app.config['SESSION_PERMANENT'] = True
     app.config['SESSION_USE_SIGNER'] = True
     app.config['SESSION_KEY_PREFIX'] = 'grbbs_'
@@ -180,8 +338,8 @@ def create_app():
     def timestamp_to_datetime_filter(ts):
         """Jinja2フィルタ: UNIXタイムスタンプを日時文字列に変換します。"""
         try:
-            return datetime.datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
-        except (ValueError, OSError):
+            return _format_timestamp(int(ts))
+        except (ValueError, OSError, OverflowError, TypeError):
             return "Invalid Date"
 
     @app.template_filter('nl2br')
@@ -189,111 +347,107 @@ def create_app():
         """Jinja2フィルタ: 文字列内の改行をHTMLの<br>タグに変換します（XSS対策済み）。"""
         if not s:
             return ""
-        # `<code>` タグなどを安全にエスケープしつつ、改行を <br> に変換する
-        return escape(s).replace('\n', Markup('<br>\n'))
+        # Markupは同じ内容のstrと等価に扱われキャッシュが衝突するため、素のstrのみキャッシュする
+        if type(s) is str:
+            return _nl2br_cached(s)
+        return _nl2br(s)
 
     # --- リクエスト前後のフック処理 ---
+    block_proxies = app.config.get('SECURITY', {}).get('block_proxies', False)
+
     @app.before_request
-    def check_ip_ban():
-        """各リクエストの前に、アクセス元のIPがBANリストに含まれていないかチェックします。"""
+    def security_gate():
+        """各リクエストの前に、プロキシ経由のアクセスとBANされたIPからのアクセスを拒否します。
+
+        クライアントIPはここで一度だけ取得し、`g.client_ip` として後続の処理
+        (管理画面のIP制限など) でも使い回します。
+        """
         # Socket.IO関連のパスは events.py で処理するため、このチェックをスキップ
-        if request.path.startswith('/socket.io'):
+        if request.path.startswith(_SKIP_PREFIXES):
             return
 
-        # --- Proxy/VPN/Torチェック ---
-        security_config = app.config.get('SECURITY', {})
-        if security_config.get('block_proxies', False):
-            remote_ip_str = util.get_client_ip()
-            if remote_ip_str:
-                is_proxy, reason = util.is_proxy_connection(remote_ip_str)
-                if is_proxy:
-                    logging.warning(
-                        f"Proxy/VPN/Torからのアクセスをブロックしました。IP: {remote_ip_str}, Reason: {reason}")
-                    database.log_access_event(
-                        ip_address=remote_ip_str, event_type='PROXY_BLOCKED',
-                        username=session.get('username'), display_name=session.get('display_name'),
-                        message=f"Blocked proxy/hosting access ({reason})."
-                    )
-                    locale = 'ja' if request.accept_languages.best_match(
-                        ['ja']) else 'en'
-                    error_message = util.get_text_by_key(
-                        'common_messages.proxy_access_denied', locale)
-                    return Response(error_message, status=403, content_type="text/plain; charset=utf-8")
+        remote_ip_str = util.get_client_ip()
+        g.client_ip = remote_ip_str
 
+        # --- Proxy/VPN/Torチェック ---
+        if block_proxies and remote_ip_str:
+            is_proxy, reason = util.is_proxy_connection(remote_ip_str)
+            if is_proxy:
+                logging.warning(
+                    f"Proxy/VPN/Torからのアクセスをブロックしました。IP: {remote_ip_str}, Reason: {reason}")
+                database.log_access_event(
+                    ip_address=remote_ip_str, event_type='PROXY_BLOCKED',
+                    username=session.get('username'), display_name=session.get('display_name'),
+                    message=f"Blocked proxy/hosting access ({reason})."
+                )
+                locale = 'ja' if request.accept_languages.best_match(
+                    ['ja']) else 'en'
+                error_message = util.get_text_by_key(
+                    'common_messages.proxy_access_denied', locale)
+                return Response(error_message, status=403, content_type="text/plain; charset=utf-8")
+
+        # --- IP BANチェック ---
         # このチェックを管理画面のIP制限より先に行う
+        if not remote_ip_str:
+            return
         try:
-            banned_ips = database.get_all_ip_bans()
-            if not banned_ips:
+            # BANが1件もなければ、IPアドレスの解析も含めてチェックを省略する
+            if not util.has_ip_bans():
                 return
-
-            remote_ip_str = util.get_client_ip()
-            if not remote_ip_str:
-                return
-
-            remote_ip = ipaddress.ip_address(remote_ip_str)
-            if any(remote_ip in ipaddress.ip_network(ban['ip_address'], strict=False) for ban in banned_ips):
+            remote_ip = util.parse_ip(remote_ip_str)
+            if util.is_ip_banned(remote_ip):
                 # BANされたIPからのアクセスは、エラーページをレンダリングせず、
                 # 空の403レスポンスを返して即座に接続を拒否する。
                 return Response('Forbidden', status=403)
         except Exception as e:
             logging.error(f"IP BANチェック中にエラーが発生しました: {e}")
 
-    @app.before_request
+    # 管理画面のIP制限設定は起動時に一度だけ読み取り、解析済みの値をクロージャで参照する
+    admin_ip_restriction_enabled = bool(
+        admin_config.get('ip_restriction_enabled', False))
+    admin_allowed_networks = []
+    for allowed in admin_config.get('ALLOWED_IPS', ['127.0.0.1', '::1']):
+        try:
+            admin_allowed_networks.append(
+                util.parse_net(allowed))
+        except ValueError:
+            logging.error(f"管理画面の許可IP設定が不正なため無視します: {allowed}")
+    admin_allowed_networks = tuple(admin_allowed_networks)
+
     def restrict_admin_access_by_ip():
         """管理画面 (`/admin`) へのアクセスをIPアドレスで制限します。"""
-        if request.path.startswith(admin_prefix):
-            if not admin_config.get('ip_restriction_enabled', False):
-                return
-            allowed_ips_str = admin_config.get(
-                'ALLOWED_IPS', ['127.0.0.1', '::1'])
-            remote_ip_str = util.get_client_ip()
-            if not remote_ip_str:
-                abort(403)
-            try:
-                remote_ip = ipaddress.ip_address(remote_ip_str)
-                is_allowed = any(remote_ip in ipaddress.ip_network(
-                    allowed, strict=False) for allowed in allowed_ips_str)
-                if not is_allowed:
-                    return Response('Forbidden', status=403)
-            except ValueError:
-                return Response('Forbidden', status=403)
+        remote_ip_str = g.get('client_ip') or util.get_client_ip()
+        if not remote_ip_str:
+            return Response('Forbidden', status=403)
+        try:
+            remote_ip = util.parse_ip(remote_ip_str)
+        except ValueError:
+            return Response('Forbidden', status=403)
+        if not any(remote_ip in network for network in admin_allowed_networks):
+            return Response('Forbidden', status=403)
+
+    # 管理画面Blueprintのリクエストに対してのみ実行されるよう登録する。
+    # admin_bp はモジュール共有のため、Blueprint側ではなくアプリ側に登録する。
+    # IP制限が無効な場合はフック自体を登録しない。
+    if admin_ip_restriction_enabled:
+        app.before_request_funcs.setdefault(admin_bp.name, []).append(
+            restrict_admin_access_by_ip)
 
     @app.after_request
     def add_security_headers(response):
         """すべてのレスポンスにセキュリティ関連のHTTPヘッダーを追加します。"""
-        csp = (
-            "default-src 'self';"
-            "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://cdn.socket.io https://cdn.jsdelivr.net https://code.jquery.com https://stackpath.bootstrapcdn.com https://fonts.googleapis.com;"
-            "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://fonts.googleapis.com https://cdnjs.cloudflare.com https://stackpath.bootstrapcdn.com https://themes.googleusercontent.com;"
-            "font-src 'self' https://fonts.gstatic.com https://cdnjs.cloudflare.com;"
-            "img-src 'self' data: https:;"
-            "connect-src 'self' wss: ws: https://grbbs.midyuki.net https://cdn.jsdelivr.net https://cdn.socket.io;"
-            "frame-ancestors 'none';"
-            "form-action 'self';"
-            "base-uri 'self';"
-        )
-        response.headers['Content-Security-Policy'] = csp
-        response.headers['X-Content-Type-Options'] = 'nosniff'
-        response.headers['X-Frame-Options'] = 'DENY'
-        response.headers['X-XSS-Protection'] = '1; mode=block'
+        response.headers.update(_SECURITY_HEADERS)
         return response
 
     # --- SocketIOの初期化 ---
-    allowed_origins_str = os.getenv('SOCKETIO_ALLOWED_ORIGINS', app.config.get(
-        'WEBAPP', {}).get('ORIGIN', 'http://localhost:5000'))
-    allowed_origins = allowed_origins_str.split(
-        ',') if allowed_origins_str else []
-
-    # ProxyFixがSocketIOにも適用されるようにengineio_optionsを設定
-    # ファイルアップロードの上限を12MBに設定 (デフォルトは1MB)
-    engineio_options = {
-        "async_mode": "gevent",
-        "ws_proxy_fix": True,
-        "max_http_buffer_size": 12 * 1024 * 1024
-    }
+    allowed_origins_str = os.getenv('SOCKETIO_ALLOWED_ORIGINS') or app.config.get(
+        'WEBAPP', {}).get('ORIGIN', 'http://localhost:5000')
+    allowed_origins = list(_split_origins(allowed_origins_str))
+
     socketio.init_app(
-        app, cors_allowed_origins=allowed_origins, **engineio_options)
+        app, cors_allowed_origins=allowed_origins, **_ENGINEIO_OPTIONS)
 
     init_events(socketio, app)
+    passkey_handler.init_sign_count_flusher(socketio)
 
     return app, socketio
@@ -1,9 +1,12 @@
 import base64
 # -*- coding: utf-8 -*-
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 import io
-import json
+import orjson
 import os
-from PIL import Image
+from urllib.parse import quote
 
 # SPDX-FileCopyrightText: 2025 mid.yuki(LoveYokado)
 # SPDX-License-Identifier: MIT
@@ -16,6 +19,67 @@ BBS本体の内部実装を隠蔽し、安定したインターフェースの
 """
 
 
+# get_online_users() でプラグインに公開するオンラインユーザーの項目
+_ONLINE_USER_FIELDS = ('user_id', 'username', 'display_name')
+_get_online_user_fields = itemgetter(*_ONLINE_USER_FIELDS)
+
+# プラグインの静的ファイルURL (routes.py の web.serve_plugin_static と同じ形式)。
+# アプリがルート以外にマウントされていない限り、url_for を使わずにこの書式から直接組み立てる。
+_PLUGIN_STATIC_URL_TMPL = "/plugins/{plugin_id}/static/{filename}"
+
+# プッシュ通知送信用のスレッドプール。購読先ごとのHTTP送信を並行して行う。
+_PUSH_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv('PUSH_WORKERS', '8')), thread_name_prefix='grbbs-push')
+
+
+@functools.lru_cache(maxsize=256)
+def _encode_popup_title(title):
+    """画像ポップアップのタイトルをBase64エンコードしたバイト列を返します。"""
+    return base64.b64encode(title.encode('utf-8'))
+
+
+@functools.lru_cache(maxsize=128)
+def _render_image_data_uri(full_path, mtime, resize, reduce_colors, enlarge_to, enlarge_filter, image_format="png"):
+    """画像を加工し、Data URIとして返します。
+
+    同じ画像・同じ加工条件での呼び出しはキャッシュされます。`mtime` はファイルが
+    更新された際にキャッシュを無効にするためのキーとしてのみ使用します。
+    `image_format` には 'png' または 'webp' を指定します。
+    """
+    from PIL import Image
+
+    with Image.open(full_path) as img:
+        if img.mode in ("RGB", "RGBA"):
+            processed_img = img
+        else:
+            processed_img = img.convert("RGBA")  # 透過情報を保持するためにRGBAに変換
+        if resize:
+            processed_img = processed_img.resize(
+                resize, Image.Resampling.LANCZOS)
+        if enlarge_to:
+            filter_map = {
+                'nearest': Image.Resampling.NEAREST,
+                'box': Image.Resampling.BOX,
+            }
+            resample_algo = filter_map.get(
+                enlarge_filter.lower(), Image.Resampling.NEAREST)
+            processed_img = processed_img.resize(
+                enlarge_to, resample=resample_algo)
+        if reduce_colors:
+            processed_img = processed_img.quantize(
+                colors=reduce_colors)
+        buffer = io.BytesIO()
+        # 一度クライアントに送るだけなので、圧縮率よりエンコード速度を優先する
+        if image_format == "webp":
+            processed_img.save(buffer, format="WEBP", quality=80, method=0)
+            mime_type = "image/webp"
+        else:
+            processed_img.save(buffer, format="PNG", compress_level=1)
+            mime_type = "image/png"
+    encoded_string = base64.b64encode(buffer.getvalue()).decode("utf-8")
+    return f"data:{mime_type};base64,{encoded_string}"
+
+
 class GrbbsApi:
     """
     プラグインに提供されるAPIのエントリーポイントとなるクラス。
@@ -99,6 +163,35 @@ class GrbbsApi:
         from . import database
         return database.get_plugin_data(self._plugin_id, key)
 
+    def save_data_many(self, items):
+        """複数のデータをまとめて保存または更新します。
+
+        キーごとにDBとの往復が発生するため、ループ内で `save_data` を
+        繰り返し呼び出す代わりにこちらを使用してください。
+
+        Args:
+            items (dict): {'key1': value1, 'key2': value2, ...} 形式の辞書。
+
+        Returns:
+            bool: 成功した場合はTrue、失敗した場合はFalse。
+        """
+        from . import database
+        return database.save_plugin_data_many(self._plugin_id, items)
+
+    def get_data_many(self, keys):
+        """複数のキーのデータを1回のクエリでまとめて取得します。
+
+        ループ内で `get_data` を繰り返し呼び出す代わりにこちらを使用してください。
+
+        Args:
+            keys (list): 取得するデータのキーのリスト。
+
+        Returns:
+            dict: {'key1': value1, ...} 形式の辞書。存在しないキーは含まれません。
+        """
+        from . import database
+        return database.get_plugin_data_many(self._plugin_id, keys)
+
     def delete_data(self, key):
         """指定されたキーのデータを削除します。
 
@@ -149,15 +242,10 @@ class GrbbsApi:
             return []
 
         online_members_raw = self._online_members_func()
-        safe_online_list = []
-        for _, member_data in online_members_raw.items():
-            safe_data = {
-                'user_id': member_data.get('user_id'),
-                'username': member_data.get('username'),
-                'display_name': member_data.get('display_name'),
-            }
-            safe_online_list.append(safe_data)
-        return safe_online_list
+        if not online_members_raw:
+            return []
+        return [dict(zip(_ONLINE_USER_FIELDS, _get_online_user_fields(member_data)))
+                for member_data in online_members_raw.values()]
 
     def get_sysop_user_id(self):
         """
@@ -193,14 +281,16 @@ class GrbbsApi:
         if url:
             payload_data["data"] = {"url": url}
 
-        payload_json = json.dumps(payload_data)
+        # orjson はバイト列を直接返すため、そのまま送信処理へ渡す
+        payload_bytes = orjson.dumps(payload_data)
 
-        success_count = 0
-        for sub in subscriptions:
-            if util.send_push_notification(sub['subscription_info'], payload_json):
-                success_count += 1
+        # 購読先ごとの送信を並行して行い、全体の所要時間を最も遅い送信分に抑える
+        results = list(_PUSH_POOL.map(
+            lambda sub: util.send_push_notification(
+                sub['subscription_info'], payload_bytes),
+            subscriptions))
 
-        return success_count > 0
+        return any(results)
 
     def show_image_popup(self, image_path, title="Image", resize=None, reduce_colors=None, enlarge_to=None, enlarge_filter="nearest"):
         """
@@ -234,45 +324,36 @@ class GrbbsApi:
                     image_path) else os.path.join(
                         PLUGINS_DIR, self._plugin_id, 'static', image_path)
 
-                if not os.path.exists(full_path):
+                try:
+                    mtime = os.path.getmtime(full_path)
+                except OSError:
                     self.send(
                         f"\r\n[API Error] Image not found: {full_path}\r\n")
                     return
 
-                with Image.open(full_path) as img:
-                    processed_img = img.convert("RGBA")  # 透過情報を保持するためにRGBAに変換
-                    if resize:
-                        processed_img = processed_img.resize(
-                            resize, Image.Resampling.LANCZOS)
-                    if enlarge_to:
-                        filter_map = {
-                            'nearest': Image.Resampling.NEAREST,
-                            'box': Image.Resampling.BOX,
-                        }
-                        resample_algo = filter_map.get(
-                            enlarge_filter.lower(), Image.Resampling.NEAREST)
-                        processed_img = processed_img.resize(
-                            enlarge_to, resample=resample_algo)
-                    if reduce_colors:
-                        processed_img = processed_img.quantize(
-                            colors=reduce_colors)
-                    buffer = io.BytesIO()
-                    processed_img.save(buffer, format="PNG")
-                    encoded_string = base64.b64encode(
-                        buffer.getvalue()).decode("utf-8")
-                    image_data_uri = f"data:image/png;base64,{encoded_string}"
-
+                image_format = str(self._app.config.get('WEBAPP', {}).get(
+                    'POPUP_IMAGE_FORMAT', 'png')).lower()
+                image_data_uri = _render_image_data_uri(
+                    full_path, mtime,
+                    tuple(resize) if resize else None, reduce_colors,
+                    tuple(enlarge_to) if enlarge_to else None, enlarge_filter,
+                    image_format)
             except Exception as e:
                 self.send(f"\r\n[API Error] Image processing failed: {e}\r\n")
                 return
         else:
             # 加工が不要で、かつ相対パスまたは外部リンクの場合
             try:
-                with self._app.app_context():  # URL生成にはアプリケーションコンテキストが必要
-                    if image_path.startswith('http'):
-                        image_data_uri = image_path  # 外部リンク
-                    else:
-                        # プラグインのstaticディレクトリからの相対パス
+                if image_path.startswith('http'):
+                    image_data_uri = image_path  # 外部リンク
+                elif self._app.config.get('APPLICATION_ROOT', '/') in ('/', '', None):
+                    # プラグインのstaticディレクトリからの相対パス。
+                    # アプリケーションコンテキストを作らずに直接組み立てる
+                    image_data_uri = _PLUGIN_STATIC_URL_TMPL.format(
+                        plugin_id=quote(self._plugin_id, safe=''),
+                        filename=quote(image_path))
+                else:
+                    with self._app.app_context():  # URL生成にはアプリケーションコンテキストが必要
                         image_data_uri = url_for('web.serve_plugin_static',
                                                  plugin_id=self._plugin_id, filename=image_path)
             except Exception as e:
@@ -283,11 +364,9 @@ class GrbbsApi:
             self.send(f"\r\n[API Error] Could not generate image URI.\r\n")
             return
 
-        title_b64 = base64.b64encode(title.encode('utf-8')).decode('utf-8')
-        uri_b64 = base64.b64encode(
-            image_data_uri.encode('utf-8')).decode('utf-8')
-
-        sequence = f"\x1b]GRBBS;SHOW_IMAGE_POPUP;{title_b64};{uri_b64}\x07"
+        # エスケープシーケンスはバイト列のまま組み立てて送信する
+        sequence = (b"\x1b]GRBBS;SHOW_IMAGE_POPUP;" + _encode_popup_title(title)
+                    + b";" + base64.b64encode(image_data_uri.encode('utf-8')) + b"\x07")
         self.send(sequence)
 
     def upload_file(self, prompt="ファイルを選択してください", allowed_extensions=None, max_size_mb=10, preferred_filename=None):
@@ -314,6 +393,8 @@ class GrbbsApi:
         if hasattr(self._chan, 'handler') and isinstance(self._chan.handler, terminal_handler.WebTerminalHandler):
             self._chan.handler.pending_upload_settings = {
                 'allowed_extensions': allowed_extensions,
+                # 拡張子チェック用に小文字化した集合を一度だけ作っておく
+                'allowed_extensions_lc': frozenset(ext.lower() for ext in allowed_extensions) if allowed_extensions else None,
                 'max_size_mb': max_size_mb,
                 'plugin_id': self._plugin_id,  # どのプラグインからの要求か記録
                 'preferred_filename': preferred_filename,
@@ -369,7 +450,8 @@ class GrbbsApi:
 
         file_path = os.path.join(
             PLUGINS_DIR, self._plugin_id, 'static', filename)
-        if os.path.exists(file_path):
+        try:
             os.remove(file_path)
             return True
-        return False
+        except FileNotFoundError:
+            return False
@@ -7,11 +7,13 @@
 このモジュールは、プロジェクトの元となったBBSソフトウェア「BIG-Model」に
 付属していたゲームへのオマージュとして、「ハムレットゲーム」と名付けられた
 「コネクトフォー」風のゲームを実装します。
-1人プレイ用に、単純なヒューリスティックベースのAIを搭載しています。
+1人プレイ用に、ビットボード上でアルファベータ探索を行うAIを搭載しています。
+探索は純粋なPythonの整数演算のみで実装されており、追加の依存パッケージを必要としません。
 """
 
 import numpy as np
 import random
+import re
 import time
 
 from . import util
@@ -30,20 +32,52 @@ EMPTY = 0
 SYMBOL_HUMAN = "O"
 SYMBOL_AI = "X"
 SYMBOL_EMPTY = " "
+# プレイヤー識別子 -> 表示シンボル
+SYMBOL_MAP = {EMPTY: SYMBOL_EMPTY,
+              PLAYER_HUMAN: SYMBOL_HUMAN, PLAYER_AI: SYMBOL_AI}
+# 盤面の値をそのままインデックスとして使えるシンボル表 (盤面全体を一度に変換する)
+_SYMBOLS = np.array([SYMBOL_MAP[i] for i in range(len(SYMBOL_MAP))])
+# 盤面表示の列番号と区切り線は固定のため、あらかじめ組み立てておく
+_BOARD_HEADER = ["|" + "|".join([str(i+1) for i in range(COLS)]) + "|",
+                 "-" * (COLS * 2 + 1)]
+
+# --- Bitboard / ビットボード ---
+# 盤面を1プレイヤーにつき1つの整数で表現する。各列に番兵ビットを含めた7ビットを割り当て、
+# セル (r, c) をビット `c * 7 + (ROWS - 1 - r)` に対応させる (最下段が各列の最下位ビット)。
+# 番兵ビットにより、シフト時に列をまたいで誤って連続と判定されることがない。
+BB_HEIGHT = ROWS + 1
+# (r, c) -> セルのビット値 の対応表。盤面配列からビットボードを組み立てる際に使用する。
+_CELL_BITS = np.array(
+    [[1 << (c * BB_HEIGHT + (ROWS - 1 - r)) for c in range(COLS)]
+     for r in range(ROWS)], dtype=np.uint64)
 
 
 def create_board():
     """空のゲーム盤 (6x7のNumpy配列) を作成します。"""
-    return np.zeros((ROWS, COLS), dtype=int)  # 6x7の盤面を作成
+    # セルの値は 0/1/2 のみのため、int8 で盤面全体を1キャッシュライン (42バイト) に収める
+    return np.zeros((ROWS, COLS), dtype=np.int8)  # 6x7の盤面を作成
+
+
+# 入力の解釈用
+# 列番号の入力 (ASCII数字のみ。str.isdigit と異なり int() で変換できない全角・上付き数字は受け付けない)
+_DIGIT_RE = re.compile(r'[0-9]+')
+# 先攻・後攻の選択 -> (最初の手番, 表示するメッセージのキー)
+_FIRST_CHOICE = {
+    'Y': (PLAYER_HUMAN, "hamlet_game.you_are_first"),
+    'N': (PLAYER_AI, "hamlet_game.ai_is_first"),
+}
+
+# 勝利ラインの方向 (横, 縦, 右下がり, 右上がり) を (行, 列) の増分で表したもの
+_WIN_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
 
 
 def drop_piece(board, col, player):
-    """指定された列にプレイヤーの駒を落とします。"""
+    """指定された列にプレイヤーの駒を落とし、駒が置かれた行を返します。列が埋まっている場合は-1を返します。"""
     for r in range(ROWS - 1, -1, -1):
         if board[r, col] == EMPTY:
             board[r, col] = player
-            return True
-    return False
+            return r
+    return -1
 
 
 def is_valid_location(board, col):
@@ -51,155 +85,435 @@ def is_valid_location(board, col):
     return 0 <= col < COLS and board[0, col] == EMPTY  # 盤の範囲内で、一番上が空いているか
 
 
-def check_win(board, player):
-    """指定されたプレイヤーが勝利条件を満たしたか（CONNECT_N個連続）をチェックします。"""
-    # 横方向のチェック
-    for r in range(ROWS):
-        for c in range(COLS - CONNECT_N + 1):
-            if all(board[r, c+i] == player for i in range(CONNECT_N)):
-                return True
-
-    # 縦方向のチェック
-    for c in range(COLS):
-        for r in range(ROWS - CONNECT_N + 1):
-            if all(board[r+i, c] == player for i in range(CONNECT_N)):
-                return True
-
-    # 右下がりの斜め方向のチェック
-    for r in range(ROWS - CONNECT_N + 1):
-        for c in range(COLS - CONNECT_N + 1):
-            if all(board[r+i, c+i] == player for i in range(CONNECT_N)):
-                return True
-
-    # 右上がりの斜め方向のチェック
-    for r in range(CONNECT_N - 1, ROWS):
-        for c in range(COLS - CONNECT_N + 1):
-            if all(board[r-i, c+i] == player for i in range(CONNECT_N)):
-                return True
-
+def to_bitboard(board, player):
+    """盤面配列から、指定されたプレイヤーの駒の位置を表すビットボードを作成します。"""
+    return int(np.bitwise_or.reduce(_CELL_BITS[board == player]))
+
+
+def has_four(bb):
+    """ビットボード上にCONNECT_N個連続した駒があるかを判定します。
+
+    縦(1)、横(7)、右上がり(8)、右下がり(6) の各方向について、
+    ビットシフトと論理積だけで4連続を検出します。
+    """
+    m = bb & (bb >> BB_HEIGHT)  # 横方向
+    if m & (m >> (2 * BB_HEIGHT)):
+        return True
+    m = bb & (bb >> 1)  # 縦方向
+    if m & (m >> 2):
+        return True
+    m = bb & (bb >> (BB_HEIGHT + 1))  # 右上がりの斜め方向
+    if m & (m >> (2 * (BB_HEIGHT + 1))):
+        return True
+    m = bb & (bb >> (BB_HEIGHT - 1))  # 右下がりの斜め方向
+    return bool(m & (m >> (2 * (BB_HEIGHT - 1))))
+
+
+def check_win_from(board, row, col, player):
+    """直前に (row, col) に置かれた駒を通るラインだけを調べて、勝利条件を満たしたかをチェックします。"""
+    for dr, dc in _WIN_DIRECTIONS:
+        count = 1
+        # 置いた駒から両方向に、同じプレイヤーの駒が続く限り数える
+        for step_r, step_c in ((dr, dc), (-dr, -dc)):
+            r, c = row + step_r, col + step_c
+            while 0 <= r < ROWS and 0 <= c < COLS and board[r, c] == player:
+                count += 1
+                r += step_r
+                c += step_c
+        if count >= CONNECT_N:
+            return True
     return False
 
 
-def get_valid_locations(board):
-    """駒を置ける全ての有効な列のリストを返します。"""
-    valid_cols = []
-    for col in range(COLS):
-        if is_valid_location(board, col):
-            valid_cols.append(col)
-    return valid_cols
-
-
-def evaluate_position(board, player):
-    """現在の盤面を指定されたプレイヤーにとってどれだけ有利かを評価するヒューリスティック関数。"""
+# --- AI search / AI探索 ---
+# AIが1手あたりに探索に使う時間 (秒)。この時間内で反復深化により探索を深めていく。
+AI_THINK_SECONDS = 1.0
+# 探索中に時間切れの確認と他のグリーンレットへの実行の譲渡を行う間隔 (ノード数, 2のべき乗)
+SEARCH_CHECK_INTERVAL = 1024
+# 勝利局面の評価値。早く勝てるほど (少ない手数ほど) 高い値になるよう手数を差し引いて使う。
+WIN_SCORE = 1000000
+INFINITY = WIN_SCORE * 2
+# 置換表エントリの評価値の種類 (正確な値 / 下限 / 上限)
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+# 中央に近い列ほど有利になりやすいため、中央から外側への順で手を調べる。
+# (置換表の手 → この順) で十分に枝刈りが効くため、キラー手やヒストリーによる並べ替えは行わない。
+# 計測ではどちらも探索ノード数が減らず、並べ替えの分だけ遅くなった。
+MOVE_ORDER = tuple(sorted(range(COLS), key=lambda c: abs(c - COLS // 2)))
+
+# AIの手の選択に使う乱数生成器。モジュール共有の乱数生成器とは独立させる。
+_rng = random.Random()
+
+# Zobristハッシュ用の乱数表 ([プレイヤー-1][ビット位置])。
+# 固定シードで生成し、プロセスをまたいでも同じ局面が同じハッシュ値になるようにする。
+_zobrist_rng = random.Random(0x48414D4C)
+ZOBRIST = tuple(
+    tuple(_zobrist_rng.getrandbits(64) for _ in range(COLS * BB_HEIGHT))
+    for _ in (PLAYER_HUMAN, PLAYER_AI))
+
+# 評価関数用: 盤面上の全セルと中央列のビットマスク
+_BOARD_MASK = int(np.bitwise_or.reduce(_CELL_BITS.ravel()))
+_CENTER_MASK = ((1 << ROWS) - 1) << (COLS // 2 * BB_HEIGHT)
+# 各列で駒を置けるビット位置の上限 (この位置は番兵ビット)
+_COLUMN_LIMITS = tuple(c * BB_HEIGHT + ROWS for c in range(COLS))
+# 勝利ラインの方向 (縦, 横, 右上がり, 右下がり) ごとのビットシフト量
+_DIRECTIONS = (1, BB_HEIGHT, BB_HEIGHT + 1, BB_HEIGHT - 1)
+
+
+class SearchTimeout(Exception):
+    """探索の制限時間を超えた場合に送出される例外。"""
+
+
+class SearchClock:
+    """探索の制限時間を管理します。
+
+    探索はCPUを占有するため、一定ノードごとに時間切れを確認し、
+    併せて `time.sleep(0)` で他のグリーンレット (他の接続) に実行を譲ります。
+    """
+    __slots__ = ('deadline', 'nodes')
+
+    def __init__(self, seconds):
+        self.deadline = time.monotonic() + seconds
+        self.nodes = 0
+
+    def tick(self):
+        """探索ノードを1つ数え、一定間隔ごとに時間切れを確認します。"""
+        self.nodes += 1
+        if not self.nodes & (SEARCH_CHECK_INTERVAL - 1):
+            if time.monotonic() > self.deadline:
+                raise SearchTimeout()
+            time.sleep(0)
+
+
+class SearchPosition:
+    """AI探索用の局面。
+
+    両プレイヤーのビットボード、各列で次に駒が入るビット位置、Zobristハッシュを保持し、
+    `play` / `undo` で差分更新します。
+    """
+    __slots__ = ('bb', 'heights', 'hash', 'moves')
+
+    def __init__(self, board):
+        self.bb = [0, to_bitboard(board, PLAYER_HUMAN),
+                   to_bitboard(board, PLAYER_AI)]
+        counts = np.count_nonzero(board != EMPTY, axis=0)
+        self.heights = [c * BB_HEIGHT + int(n) for c, n in enumerate(counts)]
+        self.moves = int(counts.sum())
+        self.hash = 0
+        for player in (PLAYER_HUMAN, PLAYER_AI):
+            keys = ZOBRIST[player - 1]
+            bb = self.bb[player]
+            while bb:
+                bit = bb & -bb
+                self.hash ^= keys[bit.bit_length() - 1]
+                bb ^= bit
+
+    def can_play(self, col):
+        """指定された列に駒を置けるかを返します。"""
+        return self.heights[col] < _COLUMN_LIMITS[col]
+
+    def play(self, col, player):
+        """指定された列にプレイヤーの駒を置きます。"""
+        pos = self.heights[col]
+        self.bb[player] |= 1 << pos
+        self.heights[col] = pos + 1
+        self.hash ^= ZOBRIST[player - 1][pos]
+        self.moves += 1
+
+    def undo(self, col, player):
+        """`play` で置いた駒を取り除きます。"""
+        pos = self.heights[col] - 1
+        self.bb[player] ^= 1 << pos
+        self.heights[col] = pos
+        self.hash ^= ZOBRIST[player - 1][pos]
+        self.moves -= 1
+
+    def ordered_moves(self, first=-1):
+        """置ける列を探索順に返します。`first` が指定されていれば最初に調べます。"""
+        heights = self.heights
+        moves = [c for c in MOVE_ORDER
+                 if c != first and heights[c] < _COLUMN_LIMITS[c]]
+        if first >= 0 and heights[first] < _COLUMN_LIMITS[first]:
+            moves.insert(0, first)
+        return moves
+
+
+def _score_lines(own, opp):
+    """相手の駒を含まない勝利ラインのうち、自分の駒が3個/2個のものを数えて得点化します。
+
+    ラインを1本ずつ調べる代わりに、方向ごとにラインの起点ビットを並べたビット列上で
+    4つのビットの和を加算器の要領で求め、全てのラインを同時に数えます。
+    """
+    free = _BOARD_MASK & ~opp
     score = 0
-    # 横方向の評価
-    for r in range(ROWS):
-        for c in range(COLS - CONNECT_N + 1):
-            window = board[r, c:c+CONNECT_N]
-            if np.count_nonzero(window == player) == CONNECT_N - 1 and np.count_nonzero(window == EMPTY) == 1:
-                score += 5
-            elif np.count_nonzero(window == player) == CONNECT_N - 2 and np.count_nonzero(window == EMPTY) == 2:
-                score += 2
-
-    # 縦方向の評価
-    for c in range(COLS):
-        for r in range(ROWS - CONNECT_N + 1):
-            window = board[r:r+CONNECT_N, c]
-            if np.count_nonzero(window == player) == CONNECT_N - 1 and np.count_nonzero(window == EMPTY) == 1:
-                score += 5
-            elif np.count_nonzero(window == player) == CONNECT_N - 2 and np.count_nonzero(window == EMPTY) == 2:
-                score += 2
-    # 右下がりの斜め方向の評価
-    for r in range(ROWS - CONNECT_N + 1):
-        for c in range(COLS - CONNECT_N + 1):
-            window = [board[r+i, c+i] for i in range(CONNECT_N)]
-            if np.count_nonzero(np.array(window) == player) == CONNECT_N - 1 and np.count_nonzero(np.array(window) == EMPTY) == 1:
-                score += 5
-            elif np.count_nonzero(np.array(window) == player) == CONNECT_N - 2 and np.count_nonzero(np.array(window) == EMPTY) == 2:
-                score += 2
-    # 右上がりの斜め方向の評価
-    for r in range(CONNECT_N - 1, ROWS):
-        for c in range(COLS - CONNECT_N + 1):
-            window = [board[r-i, c+i] for i in range(CONNECT_N)]
-            if np.count_nonzero(np.array(window) == player) == CONNECT_N - 1 and np.count_nonzero(np.array(window) == EMPTY) == 1:
-                score += 5
-            elif np.count_nonzero(np.array(window) == player) == CONNECT_N - 2 and np.count_nonzero(np.array(window) == EMPTY) == 2:
-                score += 2
-
-    # 中央列は戦略的に重要なので、少し評価を高くする
-    center_col = COLS // 2
-    if board[0, center_col] == EMPTY:
-        score += 3
-
+    for s in _DIRECTIONS:
+        s2 = s + s
+        s3 = s2 + s
+        # 4セルとも盤内で、相手の駒を含まないラインの起点
+        windows = free & (free >> s) & (free >> s2) & (free >> s3)
+        if not windows:
+            continue
+        a1 = own >> s
+        a2 = own >> s2
+        a3 = own >> s3
+        x1 = own ^ a1
+        x2 = a2 ^ a3
+        ones = x1 ^ x2  # 駒数の1の位
+        twos = windows & ((own & a1) ^ (a2 & a3) ^ (x1 & x2))  # 駒数の2の位
+        score += 5 * (twos & ones).bit_count() + 2 * (twos & ~ones).bit_count()
     return score
 
 
-def ai_choose_column_heuristic(board):
-    """AIがヒューリスティックに基づいて最適な列を選択する戦略。"""
-    valid_cols = get_valid_locations(board)
-    if not valid_cols:
+def evaluate_bitboards(own, opp):
+    """ビットボード上の局面を `own` 側から見て評価します (中央列の駒数と、あと1〜2手で揃うラインの数から求める)。"""
+    score = 3 * ((own & _CENTER_MASK).bit_count() -
+                 (opp & _CENTER_MASK).bit_count())
+    return score + _score_lines(own, opp) - _score_lines(opp, own)
+
+
+def negamax(pos, depth, alpha, beta, player, tt, clock=None):
+    """置換表付きのアルファベータ法 (ネガマックス形式) で局面を評価します。
+
+    `clock` が指定された場合、制限時間を超えると `SearchTimeout` を送出します。
+
+    Returns:
+        int: `player` (手番側) から見た評価値。
+    """
+    if clock is not None:
+        clock.tick()
+    opponent = PLAYER_AI if player == PLAYER_HUMAN else PLAYER_HUMAN
+    if pos.moves == ROWS * COLS:
+        # ルール: 盤面が埋まった場合は、最後の駒を置かなかった側 (この局面の手番側) の勝ち
+        return WIN_SCORE - pos.moves
+    if depth == 0:
+        return evaluate_bitboards(pos.bb[player], pos.bb[opponent])
+
+    alpha_orig = alpha
+    tt_move = -1
+    entry = tt.get(pos.hash)
+    if entry is not None:
+        value, entry_depth, flag, tt_move = entry
+        if entry_depth >= depth:
+            if flag == TT_EXACT:
+                return value
+            if flag == TT_LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+    # 探索の中心部のため、駒の配置と取り消しは `play` / `undo` を呼ばずにここで直接行う
+    bb = pos.bb
+    heights = pos.heights
+    keys = ZOBRIST[player - 1]
+    own = bb[player]
+    best_value = -INFINITY
+    best_move = -1
+    for col in pos.ordered_moves(tt_move):
+        bit_pos = heights[col]
+        moved = own | (1 << bit_pos)
+        if has_four(moved):
+            # 勝ちが決まる手は、局面を進めずにその場で評価する
+            value = WIN_SCORE - pos.moves - 1
+        else:
+            key = keys[bit_pos]
+            bb[player] = moved
+            heights[col] = bit_pos + 1
+            pos.hash ^= key
+            pos.moves += 1
+            value = -negamax(pos, depth - 1, -beta, -alpha,
+                             opponent, tt, clock)
+            pos.moves -= 1
+            pos.hash ^= key
+            heights[col] = bit_pos
+            bb[player] = own
+
+        if value > best_value:
+            best_value = value
+            best_move = col
+        if value > alpha:
+            alpha = value
+        if alpha >= beta:
+            break
+
+    if best_value <= alpha_orig:
+        flag = TT_UPPER
+    elif best_value >= beta:
+        flag = TT_LOWER
+    else:
+        flag = TT_EXACT
+    tt[pos.hash] = (best_value, depth, flag, best_move)
+    return best_value
+
+
+def search_root(pos, depth, tt, clock=None):
+    """AIの手番の局面を探索し、最善手の列を返します。
+
+    評価値が同じ手が複数ある場合は、手を多様化するためにランダムに選びます。
+    """
+    entry = tt.get(pos.hash)
+    best_value = -INFINITY
+    best_cols = []
+    for col in pos.ordered_moves(entry[3] if entry else -1):
+        pos.play(col, PLAYER_AI)
+        if has_four(pos.bb[PLAYER_AI]):
+            value = WIN_SCORE - pos.moves
+        else:
+            # 同点の手も正確な評価値が得られるよう、上限を最善値の1つ上に取る
+            value = -negamax(pos, depth - 1, -INFINITY, -(best_value - 1),
+                             PLAYER_HUMAN, tt, clock)
+        pos.undo(col, PLAYER_AI)
+
+        if value > best_value:
+            best_value = value
+            best_cols = [col]
+        elif value == best_value:
+            best_cols.append(col)
+
+    if not best_cols:
         return -1
+    best_col = _rng.choice(best_cols)
+    tt[pos.hash] = (best_value, depth, TT_EXACT, best_col)
+    return best_col
 
-    best_col = random.choice(valid_cols)
-    best_score = -10000
-
-    # 1. AIが勝利できる手を探す
-    for col in valid_cols:
-        temp_board = board.copy()
-        drop_piece(temp_board, col, PLAYER_AI)
-        if check_win(temp_board, PLAYER_AI):
-            return col
-
-    # 2. 相手（人間）の勝利を阻止する手を探す
-    for col in valid_cols:
-        temp_board = board.copy()
-        drop_piece(temp_board, col, PLAYER_HUMAN)
-        if check_win(temp_board, PLAYER_HUMAN):
-            return col
-
-    # 3. 上記以外の場合は、ヒューリスティック評価に基づいて最善手を選ぶ
-    for col in valid_cols:
-        temp_board = board.copy()
-        if drop_piece(temp_board, col, PLAYER_AI):
-            score = evaluate_position(temp_board, PLAYER_AI)
-
-            if score > best_score:
-                best_score = score
-                best_col = col
-            elif score == best_score:
-                # 同じスコアの場合は、ランダム性を持たせて手を多様化する
-                if random.random() > 0.5:
-                    best_col = col
 
+# --- Opening book / 定跡 ---
+# 序盤のAIの手番の局面と、その局面での手。tools/generate_hamlet_opening_book.py で、
+# ゲーム中よりも十分に長い時間をかけた探索により求めたもの。
+# キーは盤面が空の状態からの手順 (0始まりの列番号の並び) で、手数が偶数ならAIが先攻、奇数なら人間が先攻。
+OPENING_BOOK_MOVES = {
+    '': 3,
+    '30': 3,
+    '31': 3,
+    '32': 3,
+    '33': 3,
+    '34': 3,
+    '35': 3,
+    '36': 2,
+    '0': 3,
+    '030': 4,
+    '031': 3,
+    '032': 3,
+    '033': 3,
+    '034': 3,
+    '035': 3,
+    '036': 3,
+    '1': 3,
+    '130': 3,
+    '131': 3,
+    '132': 3,
+    '133': 3,
+    '134': 3,
+    '135': 3,
+    '136': 3,
+    '2': 3,
+    '230': 3,
+    '231': 3,
+    '232': 3,
+    '233': 3,
+    '234': 4,
+    '235': 3,
+    '236': 3,
+    '3': 3,
+    '330': 3,
+    '331': 2,
+    '332': 4,
+    '333': 3,
+    '334': 2,
+    '335': 4,
+    '336': 3,
+    '4': 3,
+    '430': 3,
+    '431': 3,
+    '432': 4,
+    '433': 3,
+    '434': 4,
+    '435': 3,
+    '436': 3,
+    '5': 3,
+    '530': 3,
+    '531': 3,
+    '532': 3,
+    '533': 3,
+    '534': 3,
+    '535': 3,
+    '536': 3,
+    '6': 3,
+    '630': 3,
+    '631': 3,
+    '632': 3,
+    '633': 3,
+    '634': 3,
+    '635': 3,
+    '636': 3,
+}
+
+
+def _build_opening_book(book_moves):
+    """手順をキーとする定跡を、Zobristハッシュをキーとする辞書に変換します。"""
+    book = {}
+    for moves, col in book_moves.items():
+        pos = SearchPosition(create_board())
+        player = PLAYER_AI if len(moves) % 2 == 0 else PLAYER_HUMAN
+        for move in moves:
+            pos.play(int(move), player)
+            player = PLAYER_AI if player == PLAYER_HUMAN else PLAYER_HUMAN
+        book[pos.hash] = col
+    return book
+
+
+# {局面のZobristハッシュ: 列}
+OPENING_BOOK = _build_opening_book(OPENING_BOOK_MOVES)
+
+
+def ai_choose_column_heuristic(board, tt=None, think_seconds=AI_THINK_SECONDS, use_book=True):
+    """AIがアルファベータ探索に基づいて最適な列を選択する戦略。
+
+    制限時間内で1手ずつ深さを増やしながら探索 (反復深化) し、時間内に完了した
+    最も深い探索の最善手を返します。前回の探索結果は置換表を通じて次の深さの手順付けに使われます。
+
+    Args:
+        board: 現在の盤面。
+        tt (dict, optional): 置換表。同じゲーム内で使い回すと前の手番の探索結果を再利用できます。
+        think_seconds (float, optional): 探索に使う時間 (秒)。
+        use_book (bool, optional): 定跡にある局面では探索せずに定跡の手を返します。
+    """
+    if tt is None:
+        tt = {}
+    pos = SearchPosition(board)
+    moves = pos.ordered_moves()
+    if not moves:
+        return -1
+    if use_book:
+        book_col = OPENING_BOOK.get(pos.hash)
+        if book_col is not None and pos.can_play(book_col):
+            return book_col
+
+    best_col = moves[0]
+    clock = SearchClock(think_seconds)
+    for depth in range(1, ROWS * COLS - pos.moves + 1):
+        try:
+            best_col = search_root(pos, depth, tt, clock)
+        except SearchTimeout:
+            break
+        # 勝敗が読み切れた場合はそれ以上深く探索しても結果は変わらない
+        if abs(tt[pos.hash][0]) >= WIN_SCORE - ROWS * COLS:
+            break
     return best_col
 
 
 def is_board_full(board):
     """ゲーム盤が全て埋まっているかチェックします。"""
-    return np.all(board != EMPTY)
+    # 駒は下から積まれるため、最上段が全て埋まっていれば盤面全体が埋まっている
+    return bool((board[0] != EMPTY).all())
 
 
 def print_board(chan, board):
     """ゲーム盤をテキスト形式でクライアントに送信します。"""
-    # 列番号の表示
-    col_numbers = "|" + "|".join([str(i+1) for i in range(COLS)]) + "|\r\n"
-    chan.send(col_numbers.encode('utf-8'))
-
-    # 区切り線
-    chan.send(b"-" * (COLS * 2 + 1) + b"\r\n")
-
-    # 盤面の中身を表示 (上から下へ)
-    for r in range(ROWS):
-        row_str = "|"
-        for c in range(COLS):
-            piece = board[r, c]
-            if piece == EMPTY:
-                row_str += SYMBOL_EMPTY + "|"
-            elif piece == PLAYER_HUMAN:
-                row_str += SYMBOL_HUMAN + "|"
-            else:
-                row_str += SYMBOL_AI + "|"
-        chan.send((row_str + "\r\n").encode('utf-8'))
+    # 列番号、区切り線、盤面の中身 (上から下へ) をまとめて組み立て、1回の送信で済ませる
+    lines = _BOARD_HEADER.copy()
+    lines.extend("|" + "|".join(row) + "|" for row in _SYMBOLS[board].tolist())
+    chan.send(("\r\n".join(lines) + "\r\n").encode('utf-8'))
 
 
 def get_player_symbol(player_id):
@@ -210,6 +524,7 @@ def get_player_symbol(player_id):
 def run_game_vs_ai(chan, menu_mode):
     """人間 対 AI のゲームを実行するメインループ。"""
     board = create_board()
+    tt = {}  # AIの置換表。ゲーム中の手番をまたいで使い回す
     game_over = False
     turn = 0
 
@@ -227,20 +542,17 @@ def run_game_vs_ai(chan, menu_mode):
         first_choice_input = chan.process_input()
         if first_choice_input is None:
             return  # 切断
-        first_choice = first_choice_input.strip().upper()
+        first_choice = _FIRST_CHOICE.get(first_choice_input.strip().upper())
 
-        if first_choice == 'Y':
-            current_player = PLAYER_HUMAN
-            util.send_text_by_key(chan, "hamlet_game.you_are_first", menu_mode)
-            break
-        elif first_choice == 'N':
-            current_player = PLAYER_AI
-            util.send_text_by_key(chan, "hamlet_game.ai_is_first", menu_mode)
-            turn = 1
-            break
-        else:
+        if first_choice is None:
             util.send_text_by_key(
                 chan, "common_messages.invalid_command", menu_mode)
+            continue
+        current_player, first_message_key = first_choice
+        util.send_text_by_key(chan, first_message_key, menu_mode)
+        if current_player == PLAYER_AI:
+            turn = 1
+        break
 
     while not game_over:
         print_board(chan, board)
@@ -271,7 +583,7 @@ def run_game_vs_ai(chan, menu_mode):
                         print_board(chan, board)
                         continue
 
-                if choice.isdigit():
+                if _DIGIT_RE.fullmatch(choice):
                     col_choice = int(choice) - 1
                     break
                 else:
@@ -279,7 +591,8 @@ def run_game_vs_ai(chan, menu_mode):
                         chan, "common_messages.invalid_input", menu_mode)
 
             if is_valid_location(board, col_choice):
-                drop_piece(board, col_choice, current_player)
+                last_col = col_choice
+                last_row = drop_piece(board, col_choice, current_player)
             else:
                 util.send_text_by_key(
                     chan, "hamlet_game.invalid_column", menu_mode)
@@ -287,18 +600,17 @@ def run_game_vs_ai(chan, menu_mode):
         else:  # AIのターン
             util.send_text_by_key(
                 chan, "hamlet_game.ai_thinking", menu_mode, symbol=player_prompt_symbol)
-            time.sleep(1)
-            ai_col = ai_choose_column_heuristic(board)  # ヒューリスティックAIを使用
+            ai_col = ai_choose_column_heuristic(board, tt)
 
+            last_col = ai_col
+            last_row = -1
             if ai_col != -1:
                 util.send_text_by_key(
                     chan, "hamlet_game.ai_move", menu_mode, col=ai_col + 1)
-                drop_piece(board, ai_col, current_player)
-            else:
-                pass
+                last_row = drop_piece(board, ai_col, current_player)
 
-        # ゲーム終了条件のチェック
-        if check_win(board, current_player):
+        # ゲーム終了条件のチェック (勝利ラインは直前に置いた駒を通るものだけを調べればよい)
+        if last_row >= 0 and check_win_from(board, last_row, last_col, current_player):
             print_board(chan, board)
             winner_name = get_player_name(current_player, menu_mode)
             winner_symbol = get_player_symbol(current_player)
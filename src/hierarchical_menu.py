@@ -8,10 +8,22 @@
 """
 
 import logging
+import os
 import yaml
 
 from . import util, database
 
+# LibYAML が利用できればC実装のローダーでパースする
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# 読み込み済みのメニュー設定のキャッシュ。
+# {(設定ファイルのパス, 掲示板情報の補完有無): (ファイルの更新時刻, 掲示板の更新バージョン, 設定)}
+# 設定ファイルが更新されるか、掲示板が作成・変更・削除されると読み直す。
+_MENU_CACHE = {}
+
 
 class MenuEngine:
     def __init__(self, chan, config_path, menu_mode, menu_type, enrich_boards=False):
@@ -24,59 +36,95 @@ class MenuEngine:
         self.config = None
         self.path_stack = []
         self.current_path_names = []
+        # メニュー種別のローカライズ名はエンジンの生存期間中変わらないため、一度だけ取得する
+        self.menu_type_localized_name = util.get_text_by_key(
+            f"common_menu_names.{menu_type.lower()}", menu_mode, default_value=menu_type)
+        # プロンプトに表示する階層文字列のスタック。階層の移動時に末尾を追加/削除する
+        self.hierarchy_display_stack = [self.menu_type_localized_name]
 
     def _load_config(self):
-        """階層メニューのYAML設定ファイルを読み込みます。"""
+        """階層メニューのYAML設定ファイルを読み込みます。
+
+        `enrich_boards` が有効な場合は、メニュー全体の掲示板情報を補完した状態でキャッシュします。
+        """
         try:
+            mtime = os.path.getmtime(self.config_path)
+            boards_version = database.get_boards_version() if self.enrich_boards else None
+            cache_key = (self.config_path, self.enrich_boards)
+            cached = _MENU_CACHE.get(cache_key)
+            if cached and cached[0] == mtime and cached[1] == boards_version:
+                self.config = cached[2]
+                return True
+
             with open(self.config_path, "r", encoding="utf-8") as f:
-                self.config = yaml.safe_load(f)
+                config = yaml.load(f, Loader=_YamlLoader)
+            if self.enrich_boards and isinstance(config, dict) and 'categories' in config:
+                config['categories'] = self._enrich_board_items(
+                    config['categories'])
+            _MENU_CACHE[cache_key] = (mtime, boards_version, config)
+            self.config = config
             return True
         except Exception as e:
             logging.error(f"メニュー設定ファイル読み込みエラー ({self.config_path}): {e}")
             return False
 
+    def _collect_board_ids(self, items, shortcut_ids):
+        """メニュー項目を再帰的にたどり、掲示板アイテムのショートカットIDを集めます。"""
+        for item in items or []:
+            if item.get('type') == 'board':
+                if item.get('id'):
+                    shortcut_ids.append(item['id'])
+            elif "items" in item:
+                self._collect_board_ids(item["items"], shortcut_ids)
+        return shortcut_ids
+
     def _enrich_board_items(self, items):
-        """掲示板アイテムに、DBから名前と説明を補完します。"""
+        """掲示板アイテムに、DBから名前と説明を補完します。
+
+        メニュー全体の掲示板を1回のクエリでまとめて取得し、項目をその場で書き換えます。
+        読み込んだばかりの設定に対して呼び出してください。
+        """
         if not items:
             return []
-        enriched_items = []
+        board_infos = database.get_boards_by_shortcut_ids(
+            self._collect_board_ids(items, []))
+        self._apply_board_info(items, board_infos)
+        return items
+
+    def _apply_board_info(self, items, board_infos):
+        """取得済みの掲示板情報を、メニュー項目に再帰的に書き込みます。"""
         for item in items:
-            enriched_item = item.copy()
-            if enriched_item.get('type') == 'board':
-                shortcut_id = enriched_item.get('id')
+            if item.get('type') == 'board':
+                shortcut_id = item.get('id')
                 if shortcut_id:
-                    board_info_db = database.get_board_by_shortcut_id(
-                        shortcut_id)
+                    # YAMLの数値のIDや大文字小文字の違いも、DBでの照合と同様に一致させる
+                    board_info_db = board_infos.get(str(shortcut_id).lower())
                     if board_info_db:
-                        enriched_item['name'] = board_info_db['name'] if 'name' in board_info_db.keys(
-                        ) else shortcut_id
-                        enriched_item['description'] = board_info_db['description'] if 'description' in board_info_db.keys(
-                        ) else ''
+                        item['name'] = board_info_db.get('name', shortcut_id)
+                        item['description'] = board_info_db.get(
+                            'description', '')
                     else:
-                        enriched_item['name'] = f"{shortcut_id} (unregistered)"
-                        enriched_item['description'] = 'This board is not registered in the database.'
-            elif "items" in enriched_item:
-                enriched_item["items"] = self._enrich_board_items(
-                    enriched_item["items"])
-            enriched_items.append(enriched_item)
-        return enriched_items
+                        item['name'] = f"{shortcut_id} (unregistered)"
+                        item['description'] = 'This board is not registered in the database.'
+            elif "items" in item:
+                self._apply_board_info(item["items"], board_infos)
 
     def _display_menu(self, items):
         """現在の階層のメニュー項目をクライアントに表示します。"""
+        # 全項目を組み立ててから1回で送信する
+        indent_spaces = " " * 6
+        lines = []
         for i, item in enumerate(items):
             item_name = item.get('name', 'No name')
             item_description = item.get('description', '')
             display_description = item_description if item_description else ''
-            description_lines = display_description.splitlines()
 
-            self.chan.send(
-                f"[{i+1}] {item_name}\r\n".encode('utf-8'))
+            lines.append(f"[{i+1}] {item_name}\r\n")
+            for line in display_description.splitlines():
+                lines.append(f"{indent_spaces}{line.strip()}\r\n")
 
-            if description_lines:
-                indent_spaces = " " * 6
-                for line in description_lines:
-                    self.chan.send(
-                        f"{indent_spaces}{line.strip()}\r\n".encode('utf-8'))
+        if lines:
+            self.chan.send("".join(lines).encode('utf-8'))
 
     def _navigate_menu(self, items):
         """メニューを表示し、ユーザーの選択を処理します。"""
@@ -87,14 +135,7 @@ class MenuEngine:
         self._display_menu(items)
 
         # プロンプト表示
-        menu_type_loc_key = f"common_menu_names.{self.menu_type.lower()}"
-        menu_type_localized_name = util.get_text_by_key(
-            menu_type_loc_key, self.menu_mode, default_value=self.menu_type)
-        current_hierarchy_path_str = "/".join(self.current_path_names)
-        if not self.current_path_names:
-            prompt_hierarchy_display_str = menu_type_localized_name
-        else:
-            prompt_hierarchy_display_str = f"{menu_type_localized_name}/{current_hierarchy_path_str}"
+        prompt_hierarchy_display_str = self.hierarchy_display_stack[-1]
 
         util.send_text_by_key(self.chan, "prompt.hierarchy", self.menu_mode, add_newline=False,
                               menu_name=self.menu_type.upper(), hierarchy=prompt_hierarchy_display_str)
@@ -125,9 +166,8 @@ class MenuEngine:
             logging.warning(f"メニュー設定が無効か、カテゴリが定義されていません: {self.config_path}")
             return None
 
+        # 掲示板情報の補完は _load_config でメニュー全体に対して済んでいる
         current_level_items = self.config.get('categories', [])
-        if self.enrich_boards:
-            current_level_items = self._enrich_board_items(current_level_items)
 
         while True:
             selected_item = self._navigate_menu(current_level_items)
@@ -140,17 +180,17 @@ class MenuEngine:
                 current_level_items = self.path_stack.pop()
                 if self.current_path_names:
                     self.current_path_names.pop()
+                    self.hierarchy_display_stack.pop()
             elif selected_item == "continue":
                 continue  # 無効な入力の場合
             elif isinstance(selected_item, dict):
                 if selected_item.get("type") == "child" and "items" in selected_item:
                     self.path_stack.append(current_level_items)
-                    self.current_path_names.append(
-                        selected_item.get('name', 'Unknown'))
+                    child_name = selected_item.get('name', 'Unknown')
+                    self.current_path_names.append(child_name)
+                    self.hierarchy_display_stack.append(
+                        f"{self.hierarchy_display_stack[-1]}/{child_name}")
                     current_level_items = selected_item["items"]
-                    if self.enrich_boards:
-                        current_level_items = self._enrich_board_items(
-                            current_level_items)
                 else:
                     return selected_item  # 末端項目
             else:
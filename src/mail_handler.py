@@ -10,15 +10,67 @@
 """
 
 import datetime
+import functools
 import time
 import logging
 import socket
 import textwrap
+import threading
 import base64
 import json
 
 from . import util
-from . import database, terminal_handler
+from . import database
+
+# メール本文の折り返しに使う TextWrapper (呼び出しごとに作り直さないよう共有する)
+_MAIL_WRAPPER = textwrap.TextWrapper(
+    width=78,
+    replace_whitespace=False,  # 元の空白文字を保持
+    drop_whitespace=False      # 行頭・行末の空白を保持
+)
+
+# 確認画面でメール本文を表示する際のHTMLエスケープ表 (markupsafe.escape と同じ置換)
+_BODY_ESCAPE_TABLE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&#34;',
+    "'": '&#39;',
+})
+
+# MailViewer を終了するキー (e, E, Ctrl+C, ESC)
+_EXIT_KEYS = frozenset((b'e', b'E', b'\x03', b'\x1b'))
+
+# MailViewer が一度にデータベースから読み込むメール一覧の件数
+MAIL_PAGE_SIZE = 50
+
+# カーソルがページ末尾からこの件数以内に来たら、次のページを先読みする
+MAIL_PREFETCH_MARGIN = 5
+
+# MailViewer がキー入力時にチャンネルから一度に読み込む最大バイト数
+KEY_INPUT_READ_SIZE = 32
+
+# ESC [ に続く最終バイト (整数値) と矢印キー名の対応
+_ARROW_MAP = {
+    ord('A'): "KEY_UP",
+    ord('B'): "KEY_DOWN",
+    ord('C'): "KEY_RIGHT",
+    ord('D'): "KEY_LEFT",
+}
+
+
+def _format_mail_date(timestamp):
+    """メールヘッダ用に送信日時を整形します。util.format_timestamp と同じ結果を返します。
+
+    datetime オブジェクトを経由せず time.strftime で直接整形します。
+    """
+    if not timestamp or timestamp <= 0:
+        return "---/--/-- --:--:--"
+    try:
+        return time.strftime('%y-%m-%d %H:%M:%S', time.localtime(timestamp))
+    except (ValueError, OSError, OverflowError, TypeError):
+        logging.warning(f"Invalid timestamp for formatting: {timestamp}")
+        return 'Invalid Date'
 
 
 def format_mail_header_str(mail_data, view_mode, mail_id_width=5):  # noqa
@@ -41,54 +93,68 @@ def format_mail_header_str(mail_data, view_mode, mail_id_width=5):  # noqa
     SENDER_RCPT_WIDTH = 14
     SUBJECT_WIDTH = 38
 
+    # 必要な値は最初に一度だけ取り出し、以降はローカル変数として扱う
+    get = mail_data.get
     mail_id = mail_data['id']
-    date_str = util.format_timestamp(
-        mail_data.get('sent_at'), date_format='%y-%m-%d %H:%M:%S', default_str="---/--/-- --:--:--")
+    subject = get('subject') or "(無題)"
+    is_inbox = view_mode == 'inbox'
 
-    subject = mail_data['subject'] if mail_data['subject'] else "(無題)"
-    mail_id_str = f"{mail_id:0{mail_id_width}d}"
+    date_str = _format_mail_date(get('sent_at'))
+    if mail_id_width == 5:
+        mail_id_str = f"{mail_id:05d}"
+    else:
+        mail_id_str = f"{mail_id:0{mail_id_width}d}"
 
     # --- 状態マークと最終的な件名を決定 ---
-    status_mark_char = " "
-    display_subject_final = ""
-    is_mail_deleted_flag = False
-
-    try:
-        if view_mode == 'inbox' and mail_data['recipient_deleted'] == 1:
-            is_mail_deleted_flag = True
-        elif view_mode == 'outbox' and mail_data['sender_deleted'] == 1:
-            is_mail_deleted_flag = True
-
-        if is_mail_deleted_flag:
+    # 一覧用のデータは SQL 側で状態マークを算出済み。それ以外 (未読メールの読み出しなど) はここで求める。
+    status_mark_char = get('status_mark')
+    if status_mark_char is None:
+        if is_inbox:
+            if get('recipient_deleted') == 1:
+                status_mark_char = "*"
+            elif get('is_read') == 0:
+                status_mark_char = "#"
+            else:
+                status_mark_char = " "
+        elif view_mode == 'outbox' and get('sender_deleted') == 1:
             status_mark_char = "*"
-            display_subject_final = ""  # 削除済みメールには件名を表示しない
         else:
-            if view_mode == 'inbox' and mail_data['is_read'] == 0:
-                status_mark_char = "#"
-            display_subject_final = subject
-    except KeyError as e:
-        logging.warning(f"メールヘッダ表示中にキーエラー ({mail_id}): {e}")
-        display_subject_final = subject
+            status_mark_char = " "
+    # 削除済みメールには件名を表示しない
+    display_subject_final = "" if status_mark_char == "*" else subject
 
     # --- 送信者名/受信者名を決定 ---
-    display_name = ""
-    if view_mode == 'inbox':
-        sender_name_raw = mail_data.get('sender_name')
-        if sender_name_raw and sender_name_raw.upper() == 'GUEST' and mail_data.get('sender_ip_address'):
-            display_name = util.get_display_name(
-                'GUEST', mail_data['sender_ip_address'])
+    if is_inbox:
+        sender_name_raw = get('sender_name')
+        sender_ip_address = get('sender_ip_address')
+        if sender_name_raw and sender_ip_address and sender_name_raw.upper() == 'GUEST':
+            display_name = util.get_display_name('GUEST', sender_ip_address)
         else:
-            display_name = sender_name_raw if sender_name_raw else "(不明)"
+            display_name = sender_name_raw or "(不明)"
     else:  # 送信箱の場合
-        recipient_name = mail_data.get('recipient_name')
-        display_name = recipient_name if recipient_name else "(不明)"
+        display_name = get('recipient_name') or "(不明)"
 
     # カラム幅に合わせて名前を短縮
     display_name_final = util.shorten_text_by_slicing(
         display_name, width=SENDER_RCPT_WIDTH)
 
-    # 名前と状態マークの間はスペース1つ
-    return f"{mail_id_str}  {date_str}  {display_name_final:<{SENDER_RCPT_WIDTH}} {status_mark_char}{display_subject_final}"
+    # 名前と状態マークの間はスペース1つ (幅指定は SENDER_RCPT_WIDTH と同じ値を直接書き、書式の組み立てを省く)
+    return f"{mail_id_str}  {date_str}  {display_name_final:<14} {status_mark_char}{display_subject_final}"
+
+
+@functools.lru_cache(maxsize=256)
+def _text_line_bytes(key_string, menu_mode):
+    """キーに対応するテキストを、util.send_text_by_key と同じ改行処理をした送信用のバイト列として返します。
+
+    テキストデータは起動後に変わらないため、(キー, メニューモード) ごとに結果をキャッシュします。
+    """
+    text = util.get_text_by_key(key_string, menu_mode)
+    if not text:
+        return b""
+    text = util.to_crlf(text)
+    if not text.endswith('\r\n'):
+        text += '\r\n'
+    return text.encode('utf-8')
 
 
 class MailViewer:
@@ -107,9 +173,22 @@ class MailViewer:
 
         # --- インスタンスの状態管理 ---
         self.view_mode = 'inbox'  # 'inbox' (受信箱) または 'outbox' (送信箱)
-        self.mails = []
-        self.current_index = 0
+        # 一覧の見出し (受信箱は送信者、送信箱は受信者)
+        self._sender_header_bytes = _text_line_bytes(
+            "mail_handler.sender_header", menu_mode)
+        self._recipient_header_bytes = _text_line_bytes(
+            "mail_handler.recipient_header", menu_mode)
+        self._column_header_bytes = self._sender_header_bytes
+        self.mails = []  # 一覧のうち、現在読み込んでいるページ
+        self._page_start = 0  # self.mails[0] の一覧全体での位置
+        self._id_to_index = {}  # 読み込み済みページのメールID -> 一覧全体での位置
+        self._prefetch = None  # 先読み中のページ ((表示モード, ページ先頭位置), スレッド, 結果)
+        self._total = 0  # 一覧全体のメール件数
+        self.current_index = 0  # 一覧全体での位置 (-1 と self._total はマーカー)
         self.mail_count_digits = 5
+        self._inbuf = bytearray()  # チャンネルから読み込んだ未処理の入力
+        self._sendbuf = bytearray(256)  # 複数の行をまとめて送信するときに再利用するバッファ
+        self._update_markers()  # self._top_marker_bytes, self._bottom_marker_bytes
 
         # --- キー入力とメソッドのディスパッチテーブル ---
         self.key_dispatch = {
@@ -125,108 +204,234 @@ class MailViewer:
             't': self._display_title_list, 'T': self._display_title_list,
             '?': self._display_help,
         }
+        # 受信したバイトをデコードせずに引けるよう、1文字のキーはバイト列に変換した表を使う
+        self._byte_dispatch = {
+            (key.encode('ascii') if len(key) == 1 else key): handler
+            for key, handler in self.key_dispatch.items()
+        }
+
+    def _get_header_line_bytes(self, mail_data):
+        """メールデータ一件のヘッダ行を、送信用のバイト列として返します。
+
+        整形結果はメールデータ自身に `_header_cache` として保持し、再表示時は整形を省略します。
+        ページを読み込み直すとメールデータも作り直されるため、既読・削除状態の変化は自然に反映されます。
+        """
+        cached = mail_data.get('_header_cache')
+        if cached is None or cached[0] != self.mail_count_digits:
+            header_line = format_mail_header_str(
+                mail_data, self.view_mode, self.mail_count_digits)
+            header_bytes = header_line.encode(
+                'utf-8') + b"\r\n" if header_line else b""
+            cached = (self.mail_count_digits, header_bytes)
+            mail_data['_header_cache'] = cached
+        return cached[1]
 
     def _display_mail_header_line(self, mail_data):
         """指定されたメールデータ一件のヘッダ情報（1行）を整形して表示します。"""
-        header_line = format_mail_header_str(
-            mail_data, self.view_mode, self.mail_count_digits)
-        if header_line:
-            self.chan.send(header_line.encode('utf-8') + b"\r\n")
+        header_bytes = self._get_header_line_bytes(mail_data)
+        if header_bytes:
+            self.chan.send(header_bytes)
+
+    def _get_current_header_bytes(self):
+        """現在のカーソル位置 (`current_index`) に対応するメールヘッダまたはマーカーを、送信用のバイト列として返します。"""
+        if self.current_index == -1:
+            return self._top_marker_bytes
+        if self.current_index == self._total:
+            return self._bottom_marker_bytes
+        mail_data = self._mail_at(self.current_index)
+        if mail_data is not None:
+            return self._get_header_line_bytes(mail_data)
+        return "メールがありません。\r\n".encode('utf-8')
 
     def _display_current_header(self):
         """現在のカーソル位置 (`current_index`) に対応するメールヘッダまたはマーカーを表示します。"""
-        if self.current_index == -1:
-            marker_id_str = "0" * self.mail_count_digits
-            self.chan.send(f"{marker_id_str} v\r\n".encode('utf-8'))
-        elif self.current_index == len(self.mails):
-            if not self.mails:
-                util.send_text_by_key(
-                    self.chan, "mail_handler.no_mails", self.menu_mode)
-            else:
-                marker_num = len(self.mails) + 1
-                marker_id_str = f"{marker_num:0{self.mail_count_digits}d}"
-                self.chan.send(f"{marker_id_str} ^\r\n".encode('utf-8'))
-        elif self.mails and 0 <= self.current_index < len(self.mails):
-            self._display_mail_header_line(self.mails[self.current_index])
+        self.chan.send(self._get_current_header_bytes())
+
+    def _display_column_and_current_header(self, prefix=b""):
+        """一覧の見出しと現在のカーソル位置のヘッダを、prefix に続けて1回の送信で表示します。"""
+        self._emit(prefix, self._column_header_bytes,
+                   self._get_current_header_bytes())
+
+    def _emit(self, *parts):
+        """複数のバイト列を再利用する送信バッファにまとめ、1回で送信します。"""
+        send_buffer = self._sendbuf
+        del send_buffer[:]
+        for part in parts:
+            send_buffer += part
+        self.chan.send(bytes(send_buffer))
+
+    def _update_markers(self):
+        """一覧の先頭と末尾に表示するマーカーを、現在の件数と桁数から作り直します。"""
+        self._top_marker_bytes = b"0" * self.mail_count_digits + b" v\r\n"
+        if self._total:
+            self._bottom_marker_bytes = f"{self._total + 1:0{self.mail_count_digits}d} ^\r\n".encode(
+                'utf-8')
         else:
-            self.chan.send("メールがありません。\r\n".encode('utf-8'))
+            self._bottom_marker_bytes = _text_line_bytes(
+                "mail_handler.no_mails", self.menu_mode)
+
+    def _load_page(self, index):
+        """一覧全体での位置 index を含むページをデータベースから読み込みます。先読み済みであればそれを使います。"""
+        page_start = index - index % MAIL_PAGE_SIZE
+        fetched_mails = self._take_prefetched_page(page_start)
+        if fetched_mails is None:
+            fetched_mails = database.get_mail_headers_for_view(
+                self.user_id, self.view_mode, limit=MAIL_PAGE_SIZE, offset=page_start)
+        self.mails = fetched_mails if fetched_mails else []
+        self._page_start = page_start
+        self._id_to_index = {mail['id']: page_start + i for i, mail in enumerate(self.mails)}
+
+    def _start_prefetch(self):
+        """カーソルが現在のページの末尾に近づいていれば、次のページをバックグラウンドで読み込み始めます。"""
+        next_page_start = self._page_start + MAIL_PAGE_SIZE
+        if next_page_start >= self._total or self.current_index < next_page_start - MAIL_PREFETCH_MARGIN:
+            return
+        key = (self.view_mode, next_page_start)
+        if self._prefetch is not None and self._prefetch[0] == key:
+            return  # 既に先読み中
+
+        result = {}
+
+        def prefetch_worker():
+            try:
+                result['mails'] = database.get_mail_headers_for_view(
+                    self.user_id, key[0], limit=MAIL_PAGE_SIZE, offset=next_page_start)
+            except Exception as e:
+                logging.error(
+                    f"メール一覧の先読み中にDBエラー (ユーザーID: {self.user_id}, Mode:{key[0]}): {e}")
+
+        thread = threading.Thread(
+            target=prefetch_worker, name='grbbs-mail-prefetch', daemon=True)
+        thread.start()
+        self._prefetch = (key, thread, result)
+
+    def _take_prefetched_page(self, page_start):
+        """page_start から始まるページが先読みされていれば、その結果を返します (読み込み中なら完了を待ちます)。"""
+        prefetch = self._prefetch
+        if prefetch is None or prefetch[0] != (self.view_mode, page_start):
+            return None
+        self._prefetch = None
+        _, thread, result = prefetch
+        thread.join()
+        return result.get('mails')
+
+    def _mail_at(self, index):
+        """一覧全体での位置 index にあるメールを返します。読み込み済みのページになければ読み込みます。"""
+        if not 0 <= index < self._total:
+            return None
+        if not 0 <= index - self._page_start < len(self.mails):
+            self._load_page(index)
+        local_index = index - self._page_start
+        if 0 <= local_index < len(self.mails):
+            return self.mails[local_index]
+        return None
 
     def _reload_mails(self, keep_index=True):
-        """データベースからメールリストを再読み込みし、表示を更新します。"""
+        """データベースからメール件数と現在位置のページを再読み込みし、表示を更新します。"""
         current_mail_id = None
-        if self.mails and 0 <= self.current_index < len(self.mails):
-            current_mail_id = self.mails[self.current_index]['id']
+        local_index = self.current_index - self._page_start
+        if 0 <= local_index < len(self.mails):
+            current_mail_id = self.mails[local_index]['id']
+
+        if not keep_index:
+            # 表示モードの切り替えやメール作成後は、先読みした内容が古い可能性があるため破棄する
+            self._prefetch = None
 
         try:
-            fetched_mails = database.get_mails_for_view(
+            self._total = database.get_mail_count_for_view(
                 self.user_id, self.view_mode)
-            self.mails = fetched_mails if fetched_mails else []
 
             new_index = 0
-            if self.mails:
+            if self._total:
                 if keep_index and current_mail_id is not None:
-                    found_index = next((i for i, mail in enumerate(
-                        self.mails) if mail['id'] == current_mail_id), -1)
-                    if found_index != -1:
-                        new_index = found_index
-                else:
+                    # 一覧は送信日時順で、メールは論理削除のみのため、通常は位置が変わらない
+                    new_index = min(self.current_index, self._total - 1)
+                elif not keep_index:
                     # keep_index=False の場合、未読メールにフォーカス
+                    first_unread_index = None
                     if self.view_mode == 'inbox':
-                        # 最初の未読メールを探す
-                        first_unread_index = next((i for i, mail in enumerate(self.mails)
-                                                   if mail['is_read'] == 0 and mail['recipient_deleted'] == 0), -1)
-                        if first_unread_index != -1:
-                            new_index = first_unread_index
-                        else:
-                            # 未読がなければ最終メールにフォーカス
-                            new_index = len(self.mails) - 1
-                    else:  # 送信箱の場合
-                        new_index = len(self.mails) - 1
-                self.mail_count_digits = max(5, len(str(len(self.mails) + 1)))
+                        first_unread_index = database.get_first_unread_mail_index(
+                            self.user_id)
+                    if first_unread_index is not None:
+                        new_index = first_unread_index
+                    else:
+                        # 未読がなければ (送信箱の場合も) 最終メールにフォーカス
+                        new_index = self._total - 1
+                self._load_page(new_index)
+                if keep_index and current_mail_id is not None:
+                    new_index = self._id_to_index.get(current_mail_id, 0)
+                self.mail_count_digits = max(5, len(str(self._total + 1)))
             else:
+                self.mails = []
+                self._page_start = 0
+                self._id_to_index = {}
                 self.mail_count_digits = 5
 
             self.current_index = new_index if new_index >= 0 else 0
+            self._update_markers()
             return True
         except Exception as e:
             logging.error(
                 f"メール一覧取得中にDBエラー (ユーザーID: {self.user_id}, Mode:{self.view_mode}): {e}")
             self.chan.send("\r\nメール一覧の取得中にエラーが発生しました。\r\n".encode('utf-8'))
             self.mails = []
+            self._page_start = 0
+            self._id_to_index = {}
+            self._total = 0
             self.current_index = 0
+            self._update_markers()
             return False
 
+    def _read_input(self, size):
+        """チャンネルから最大 size バイトを読み込み、入力バッファに追加します。"""
+        data = self.chan.recv(size)
+        if data:
+            self._inbuf.extend(data)
+        return data
+
+    def _release_inbuf(self):
+        """入力バッファに残っている未処理のデータをチャンネルに戻します。
+
+        行入力など、チャンネルから直接読み込む処理へ制御を渡す前に呼び出します。
+        """
+        if self._inbuf:
+            self.chan.unrecv(bytes(self._inbuf))
+            self._inbuf.clear()
+
     def _get_key_input(self):
-        """チャンネルから1キー入力を取得し、特殊キーを解釈して統一された文字列として返します。"""
+        """チャンネルから1キー入力を取得します。
+
+        通常のキーは受信した1バイトをそのまま bytes で返し、矢印キーのみ "KEY_UP" などの文字列で返します。
+        チャンネルからはまとめて読み込んで入力バッファに貯め、そこから1キーずつ取り出します。
+        """
         try:
-            data = self.chan.recv(1)
-            if not data:
+            if not self._inbuf and not self._read_input(KEY_INPUT_READ_SIZE):
                 logging.info(  # ログ
                     f"メールメニュー中にクライアントが切断されました。 (ユーザーID: {self.user_id})")
                 return None
 
+            data = bytes(self._inbuf[:1])
+            del self._inbuf[:1]
+
             if data == b'\x1b':  # ESC - 矢印キーの可能性
-                self.chan.settimeout(0.05)
-                try:
-                    nextbyte1 = self.chan.recv(1)
-                    if nextbyte1 == b'[':
-                        nextbyte2 = self.chan.recv(1)
-                        if nextbyte2 == b'A':
-                            return "KEY_UP"
-                        if nextbyte2 == b'B':
-                            return "KEY_DOWN"
-                        if nextbyte2 == b'C':
-                            return "KEY_RIGHT"
-                        if nextbyte2 == b'D':
-                            return "KEY_LEFT"
-                    return data.decode('ascii')  # ESC単体
-                except socket.timeout:  # タイムアウト
-                    return data.decode('ascii')  # ESC単体
-                finally:
-                    self.chan.settimeout(None)
-            else:
-                return data.decode('ascii')
-        except (socket.error, UnicodeDecodeError, EOFError) as e:
+                if len(self._inbuf) < 2:
+                    # 続きがまだ届いていない場合のみ、短いタイムアウトで読み込む
+                    self.chan.settimeout(0.05)
+                    try:
+                        while len(self._inbuf) < 2 and self._read_input(2 - len(self._inbuf)):
+                            pass
+                    except socket.timeout:  # タイムアウト
+                        pass
+                    finally:
+                        self.chan.settimeout(None)
+                # バッファを直接添字で参照し、スライスのバイト列を作らずに判定する
+                if len(self._inbuf) >= 2 and self._inbuf[0] == 0x5b:  # '['
+                    arrow_key = _ARROW_MAP.get(self._inbuf[1])
+                    if arrow_key:
+                        del self._inbuf[:2]
+                        return arrow_key
+            return data  # ESC単体を含む通常のキー
+        except (socket.error, EOFError) as e:
             logging.error(f"メールメニュー中にソケット受信エラー (ユーザーID: {self.user_id}): {e}")
             return None
 
@@ -235,8 +440,8 @@ class MailViewer:
         # モバイル用の操作ボタンを表示
         self.chan.send(b'\x1b[?2024h')
 
-        total_mail_count = database.get_total_mail_count(self.user_id)  # noqa
-        unread_mail_count = database.get_total_unread_mail_count(self.user_id)
+        total_mail_count, unread_mail_count = database.get_mail_counts(
+            self.user_id)
         util.send_text_by_key(
             self.chan, "mail_handler.article_list_count", self.menu_mode,
             total_count=total_mail_count, unread_count=unread_mail_count
@@ -247,37 +452,32 @@ class MailViewer:
             return "back_to_top"  # トップメニューに戻る
 
         # ヘッダ表示
-        if self.view_mode == 'inbox':
-            util.send_text_by_key(
-                self.chan, "mail_handler.sender_header", self.menu_mode)
-        else:
-            util.send_text_by_key(
-                self.chan, "mail_handler.recipient_header", self.menu_mode)
-        self._display_current_header()
+        self._display_column_and_current_header()
 
         try:
             while True:
                 key_input = self._get_key_input()
                 if key_input is None:
                     return None  # 切断
-                # Ctrl+C, ESC, e, E
-                if key_input in ('e', 'E', '\x03', '\x1b'):  # Ctrl+C, ESC, e, E
+                if key_input in _EXIT_KEYS:  # Ctrl+C, ESC, e, E
                     break
 
-                handler = self.key_dispatch.get(key_input)
+                handler = self._byte_dispatch.get(key_input)
                 if handler:
                     handler()
                 else:
                     self.chan.send(b'\a')
         finally:
-            # ループを抜けるときに必ずパネルを非表示にする
+            # ループを抜けるときに必ずパネルを非表示にし、読み過ぎた入力をチャンネルに戻す
             self.chan.send(b'\x1b[?2024l')
+            self._release_inbuf()
+            self._prefetch = None  # 先読み中のスレッドは結果を捨てて自然に終了させる
 
         return "back_to_top"
 
     def _move_cursor_up(self):
         """カーソルを一つ上に移動し、移動先のヘッダを表示します。"""
-        if not self.mails:
+        if not self._total:
             self.chan.send(b'\a')
             return
         if self.current_index > -1:
@@ -288,59 +488,59 @@ class MailViewer:
 
     def _move_cursor_down(self):
         """カーソルを一つ下に移動し、移動先のヘッダを表示します。"""
-        if not self.mails:
+        if not self._total:
             self.chan.send(b'\a')
             return
-        if self.current_index < len(self.mails):
+        if self.current_index < self._total:
             self.current_index += 1
             self._display_current_header()
+            self._start_prefetch()
         else:
             self.chan.send(b'\a')
 
-    def _read_selected_mail(self, advance_cursor_after=False):
-        """現在カーソルがあるメールを読み込み、必要に応じてカーソルを進めます。"""
-        if not (self.mails and 0 <= self.current_index < len(self.mails)):
-            self.chan.send(b'\a')
-            return
+    def _read_selected_mail(self, advance_cursor_after=False, skip_reload=False):
+        """現在カーソルがあるメールを読み込み、必要に応じてカーソルを進めます。
 
-        selected_mail_data = self.mails[self.current_index]
+        skip_reload=True の場合は既読化・一覧の再読み込み・ヘッダの再表示を行わず、
+        既読にすべきメールのIDを返します (連続して読む場合に、呼び出し元でまとめて処理するため)。
+        """
+        selected_mail_data = self._mail_at(self.current_index)
+        if selected_mail_data is None:
+            self.chan.send(b'\a')
+            return None
 
-        is_deleted = False
-        try:
-            if self.view_mode == 'inbox' and selected_mail_data['recipient_deleted'] == 1:
-                is_deleted = True
-            elif self.view_mode == 'outbox' and selected_mail_data['sender_deleted'] == 1:
-                is_deleted = True
-        except KeyError:
-            logging.warning(
-                f"メールデータに削除フラグが見つかりません(MailID: {selected_mail_id})")
+        is_deleted = selected_mail_data['is_deleted'] == 1
+        # 本文を送信している間に、必要なら次のページを先読みしておく
+        self._start_prefetch()
 
+        mail_id_to_mark = None
         if is_deleted:
             util.send_text_by_key(
                 self.chan, "mail_handler.mail_deleted", self.menu_mode)
         else:
             # 本文表示
             success, _ = display_mail_content(
-                self.chan, selected_mail_data, self.user_id, self.view_mode, self.menu_mode)
+                self.chan, selected_mail_data, self.user_id, self.view_mode, self.menu_mode,
+                mark_as_read=not skip_reload)
             if not success:
                 util.send_text_by_key(
                     self.chan, "common_messages.error", self.menu_mode)
+            elif self.view_mode == 'inbox':
+                mail_id_to_mark = selected_mail_data['id']
+
+        if skip_reload:
+            return mail_id_to_mark
 
         # メールリストを再読み込み（既読状態の更新などを反映）
         self._reload_mails(keep_index=True)
 
         if advance_cursor_after:
-            if self.mails:
+            if self._total:
                 self.current_index += 1
 
         # ヘッダ表示
-        if self.view_mode == 'inbox':
-            util.send_text_by_key(
-                self.chan, "mail_handler.sender_header", self.menu_mode)
-        else:
-            util.send_text_by_key(
-                self.chan, "mail_handler.recipient_header", self.menu_mode)
-        self._display_current_header()
+        self._display_column_and_current_header()
+        return None
 
     def _read_selected_mail_and_stay(self):
         """選択されているメールを読み込みます（カーソル位置は変更しない）。"""
@@ -352,7 +552,7 @@ class MailViewer:
 
     def _read_and_move_up(self):
         """カーソルを一つ上に移動し、その位置のメールを読み込みます（読み戻り）。"""
-        if not self.mails:
+        if not self._total:
             self.chan.send(b'\a')
             return
         if self.current_index > 0:
@@ -363,11 +563,12 @@ class MailViewer:
 
     def _toggle_delete(self):
         """選択されているメールの削除状態（論理削除）を切り替えます。"""
-        if not (self.mails and 0 <= self.current_index < len(self.mails)):
+        selected_mail_data = self._mail_at(self.current_index)
+        if selected_mail_data is None:
             self.chan.send(b'\a')
             return
 
-        selected_mail_id = self.mails[self.current_index]['id']
+        selected_mail_id = selected_mail_data['id']
         mode_for_toggle = 'recipient' if self.view_mode == 'inbox' else 'sender'
 
         toggled, _ = database.toggle_mail_delete_status_generic(
@@ -383,91 +584,76 @@ class MailViewer:
 
     def _switch_view_mode(self):
         """受信箱 (inbox) と送信箱 (outbox) の表示を切り替えます。"""
-        self.view_mode = 'outbox' if self.view_mode == 'inbox' else 'inbox'
-        self._reload_mails(keep_index=False)
-        # ヘッダ表示
         if self.view_mode == 'inbox':
-            util.send_text_by_key(
-                self.chan, "mail_handler.sender_header", self.menu_mode)
+            self.view_mode = 'outbox'
+            self._column_header_bytes = self._recipient_header_bytes
         else:
-            util.send_text_by_key(
-                self.chan, "mail_handler.recipient_header", self.menu_mode)
-        self._display_current_header()
+            self.view_mode = 'inbox'
+            self._column_header_bytes = self._sender_header_bytes
+        self._reload_mails(keep_index=False)
+        # ヘッダ表示
+        self._display_column_and_current_header()
 
     def _write_mail(self):
         """メール作成画面を呼び出し、完了後に一覧をリロードします。"""
         self.chan.send(b'\r\n')
+        self._release_inbuf()
         mail_write(self.chan, self.login_id, self.menu_mode)
         self._reload_mails(keep_index=False)
         # ヘッダ表示
-        if self.view_mode == 'inbox':
-            util.send_text_by_key(
-                self.chan, "mail_handler.sender_header", self.menu_mode)
-        else:
-            util.send_text_by_key(
-                self.chan, "mail_handler.recipient_header", self.menu_mode)
-        self._display_current_header()
+        self._display_column_and_current_header()
 
     def _read_all_from_current(self):
         """現在カーソルがある位置から、リストの最後までメールを連続で表示します。"""
-        if not self.mails or self.current_index == len(self.mails):
+        if not self._total or self.current_index == self._total:
             self.chan.send(b'\a')
             return
 
         start_idx = self.current_index if self.current_index != -1 else 0
-        self.chan.send(b'\r\n')
+        self.chan.send(b'\r\n' + self._column_header_bytes)
 
-        if self.view_mode == 'inbox':
-            util.send_text_by_key(
-                self.chan, "mail_handler.sender_header", self.menu_mode)
-        else:
-            util.send_text_by_key(
-                self.chan, "mail_handler.recipient_header", self.menu_mode)
-
-        for i in range(start_idx, len(self.mails)):
+        # 1通ごとに一覧を再読み込みせず、既読化も最後にまとめて1回で行う
+        mail_ids_to_mark = []
+        for i in range(start_idx, self._total):
             self.current_index = i
-            self._display_mail_header_line(self.mails[i])
-            self._read_selected_mail(advance_cursor_after=False)  # 本文表示
+            self._display_mail_header_line(self._mail_at(i))
+            mail_id_to_mark = self._read_selected_mail(
+                advance_cursor_after=False, skip_reload=True)  # 本文表示
+            if mail_id_to_mark is not None:
+                mail_ids_to_mark.append(mail_id_to_mark)
             self.chan.send(b'\r\n')
 
-        self.current_index = len(self.mails)
+        if mail_ids_to_mark:
+            database.mark_mails_as_read_bulk(mail_ids_to_mark, self.user_id)
+        self._reload_mails(keep_index=True)
+        self.current_index = self._total
         self._display_current_header()
 
     def _display_title_list(self):
         """現在カーソルがある位置から、リストの最後までメールのヘッダのみを一覧表示します。"""
-        if not self.mails or self.current_index == len(self.mails):
+        if not self._total or self.current_index == self._total:
             self.chan.send(b'\a')
             return
 
         start_idx = self.current_index if self.current_index != -1 else 0
-        self.chan.send(b'\r\n')
 
-        if self.view_mode == 'inbox':
-            util.send_text_by_key(
-                self.chan, "mail_handler.sender_header", self.menu_mode)
-        else:
-            util.send_text_by_key(
-                self.chan, "mail_handler.recipient_header", self.menu_mode)
-
-        for i in range(start_idx, len(self.mails)):
-            self._display_mail_header_line(self.mails[i])
+        # 一覧全体を1つのバッファにまとめ、1回で送信する
+        send_buffer = self._sendbuf
+        del send_buffer[:]
+        send_buffer += b'\r\n'
+        send_buffer += self._column_header_bytes
+        for i in range(start_idx, self._total):
+            send_buffer += self._get_header_line_bytes(self._mail_at(i))
 
-        self.current_index = len(self.mails)
-        self._display_current_header()
+        self.current_index = self._total
+        send_buffer += self._get_current_header_bytes()
+        self.chan.send(bytes(send_buffer))
 
     def _display_help(self):
         """メールビューアの操作ヘルプを表示します。"""
-        self.chan.send(b'\r\n')
-        util.send_text_by_key(
-            self.chan, "mail_handler.mail_help", self.menu_mode)
         # ヘルプ表示後に現在の行を再表示
-        if self.view_mode == 'inbox':
-            util.send_text_by_key(
-                self.chan, "mail_handler.sender_header", self.menu_mode)
-        else:
-            util.send_text_by_key(
-                self.chan, "mail_handler.recipient_header", self.menu_mode)
-        self._display_current_header()
+        self._display_column_and_current_header(
+            b'\r\n' + _text_line_bytes("mail_handler.mail_help", self.menu_mode))
 
 
 def mail(chan, login_id, menu_mode, ip_address):
@@ -508,9 +694,7 @@ def mail(chan, login_id, menu_mode, ip_address):
                 continue
             elif choice == 'r':
                 # 1.初回に新着メールの総数未読数表示
-                unread_count_initial = database.get_total_unread_mail_count(
-                    user_id)
-                total_mail_count_initial = database.get_total_mail_count(
+                total_mail_count_initial, unread_count_initial = database.get_mail_counts(
                     user_id)
 
                 if unread_count_initial > 0:
@@ -535,12 +719,10 @@ def mail(chan, login_id, menu_mode, ip_address):
                         break
 
                     # ヘッダ表示
-                    util.send_text_by_key(
-                        chan, "mail_handler.subject_header", menu_mode)
+                    chan.send(_text_line_bytes("mail_handler.subject_header", menu_mode) +
+                              _text_line_bytes("mail_handler.sender_header", menu_mode))
 
                     mail_id_width_for_reader = 5
-                    util.send_text_by_key(
-                        chan, "mail_handler.sender_header", menu_mode)
                     display_mail_header(chan, oldest_unread_mail,
                                         'inbox', mail_id_width_for_reader)
 
@@ -602,7 +784,7 @@ def display_mail_header(chan, mail_data, view_mode='inbox', mail_id_width=5):
         chan.send((header_line + "\r\n").encode('utf-8'))
 
 
-def display_mail_content(chan, mail_data, recipient_user_id_pk, view_mode='inbox', menu_mode='2'):
+def display_mail_content(chan, mail_data, recipient_user_id_pk, view_mode='inbox', menu_mode='2', mark_as_read=True):
     try:
         if not mail_data:
             util.send_text_by_key(
@@ -611,24 +793,28 @@ def display_mail_content(chan, mail_data, recipient_user_id_pk, view_mode='inbox
             return False, False
 
         mail_id = mail_data['id']
-        body = mail_data['body'] if mail_data['body'] else "(本文なし)"
+        if 'body' in mail_data:
+            body = mail_data['body']
+        else:
+            # 一覧から開いた場合はヘッダのみのため、本文をここで取得する
+            body = database.get_mail_body(mail_id, recipient_user_id_pk)
+        if not body:
+            body = "(本文なし)"
 
         # ユーザーが入力した改行を維持しつつ、長い行を折り返す
+        lines_out = []
         for line in body.splitlines():
-            wrapped_lines = textwrap.wrap(
-                line,
-                width=78,
-                replace_whitespace=False,  # 元の空白文字を保持
-                drop_whitespace=False      # 行頭・行末の空白を保持
-            )
+            wrapped_lines = _MAIL_WRAPPER.wrap(line)
             if not wrapped_lines:  # 元の行が空行だった場合
-                chan.send(b'\r\n')
+                lines_out.append('')
             else:
-                for wrapped_line in wrapped_lines:
-                    chan.send(wrapped_line.encode('utf-8') + b'\r\n')
+                lines_out.extend(wrapped_lines)
+        if lines_out:
+            # 本文全体をまとめて1回で送信する
+            chan.send(('\r\n'.join(lines_out) + '\r\n').encode('utf-8'))
 
         marked_as_read = False
-        if view_mode == 'inbox':
+        if view_mode == 'inbox' and mark_as_read:
             if database.mark_mail_as_read(mail_id, recipient_user_id_pk):
                 marked_as_read = True
         return True, marked_as_read
@@ -638,27 +824,32 @@ def display_mail_content(chan, mail_data, recipient_user_id_pk, view_mode='inbox
         return False, False
 
 
-def _get_recipients(chan, menu_mode):
+@functools.lru_cache(maxsize=16)
+def _confirm_buttons_command(menu_mode):
+    """モバイル向けの Yes/No ボタンにラベルを設定して表示するコマンドを返します。
+
+    ラベルはメニューモードごとに固定のため、組み立てたバイト列をキャッシュします。
+    """
+    yes_label = util.get_text_by_key(
+        "common_messages.yes_button", menu_mode, default_value="Yes")
+    no_label = util.get_text_by_key(
+        "common_messages.no_button", menu_mode, default_value="No")
+    yes_label_b64 = base64.b64encode(
+        yes_label.encode('utf-8')).decode('utf-8')
+    no_label_b64 = base64.b64encode(
+        no_label.encode('utf-8')).decode('utf-8')
+    return f'\x1b]GRBBS;CONFIRM_BUTTONS;{yes_label_b64};{no_label_b64}\x07\x1b[?2035h'.encode('utf-8')
+
+
+def _get_recipients(chan, menu_mode, is_mobile_web_client=False):
     """宛先をユーザーから対話的に取得し、検証してリストとして返します。"""
     recipient_info_list = []  # 複数宛先に対応
-    is_mobile_web_client = (isinstance(chan, terminal_handler.WebTerminalHandler.WebChannel) and getattr(
-        chan.handler, 'is_mobile', False))
 
     def get_confirm_input(prompt_key):
         """Yes/No確認プロンプトを表示し、ユーザーの入力を取得するヘルパー関数。"""
         confirm_input_raw = None
         if is_mobile_web_client:
-            yes_label = util.get_text_by_key(
-                "common_messages.yes_button", menu_mode, default_value="Yes")
-            no_label = util.get_text_by_key(
-                "common_messages.no_button", menu_mode, default_value="No")
-            yes_label_b64 = base64.b64encode(
-                yes_label.encode('utf-8')).decode('utf-8')
-            no_label_b64 = base64.b64encode(
-                no_label.encode('utf-8')).decode('utf-8')
-            chan.send(
-                f'\x1b]GRBBS;CONFIRM_BUTTONS;{yes_label_b64};{no_label_b64}\x07'.encode('utf-8'))
-            chan.send(b'\x1b[?2035h')
+            chan.send(_confirm_buttons_command(menu_mode))
         try:
             util.send_text_by_key(
                 chan, prompt_key, menu_mode, add_newline=False)
@@ -668,27 +859,32 @@ def _get_recipients(chan, menu_mode):
                 chan.send(b'\x1b[?2035l')
         return confirm_input_raw
 
+    user_select_command = None
+    if is_mobile_web_client:
+        # 宛先選択ポップアップのコマンドは宛先を追加するたびに同じものを送るため、ループの前に一度だけ組み立てる
+        all_users = database.get_memberlist()
+        if not all_users:
+            util.send_text_by_key(
+                chan, "mail_handler.no_users_to_select", menu_mode, default_value="送信可能なユーザーがいません。")
+            return []
+        prompt_text = util.get_text_by_key(
+            "mail_handler.select_recipient_prompt_popup", menu_mode, default_value="宛先を選択してください")
+        prompt_b64 = base64.b64encode(
+            prompt_text.encode('utf-8')).decode('utf-8')
+        user_list_json = json.dumps(all_users)
+        user_list_b64 = base64.b64encode(
+            user_list_json.encode('utf-8')).decode('utf-8')
+        user_select_command = f'\x1b]GRBBS;USER_SELECT;{prompt_b64};{user_list_b64}\x07'.encode(
+            'utf-8')
+        prompt_display_text = util.get_text_by_key(
+            "mail_handler.enter_recipient", menu_mode)
+
     while True:
         recipient_name_input = None
         if is_mobile_web_client:
-            all_users = database.get_memberlist()
-            if not all_users:
-                util.send_text_by_key(
-                    chan, "mail_handler.no_users_to_select", menu_mode, default_value="送信可能なユーザーがいません。")
-                return []
-            prompt_text = util.get_text_by_key(
-                "mail_handler.select_recipient_prompt_popup", menu_mode, default_value="宛先を選択してください")
-            prompt_b64 = base64.b64encode(
-                prompt_text.encode('utf-8')).decode('utf-8')
-            user_list_json = json.dumps(all_users)
-            user_list_b64 = base64.b64encode(
-                user_list_json.encode('utf-8')).decode('utf-8')
-            chan.send(
-                f'\x1b]GRBBS;USER_SELECT;{prompt_b64};{user_list_b64}\x07'.encode('utf-8'))
+            chan.send(user_select_command)
             recipient_name_input = chan.process_input()
             if recipient_name_input:
-                prompt_display_text = util.get_text_by_key(
-                    "mail_handler.enter_recipient", menu_mode)
                 chan.send(
                     f"{prompt_display_text}{recipient_name_input}\r\n".encode('utf-8'))
         else:
@@ -717,8 +913,9 @@ def _get_recipients(chan, menu_mode):
             return None
 
         if ans.lower().strip() == 'y':
+            # 送信時に再度ユーザーを検索しないよう、確認済みのユーザーIDも保持する
             recipient_info_list.append(
-                (current_recipient_name, current_recipient_comment))
+                (current_recipient_name, current_recipient_comment, userdata['id']))
 
             add_more_ans = get_confirm_input("mail_handler.send_another_yn")
             if add_more_ans is None:
@@ -732,16 +929,11 @@ def _get_recipients(chan, menu_mode):
             continue
 
 
-def _get_subject(chan, menu_mode):
+def _get_subject(chan, menu_mode, is_mobile_web_client=False):
     """件名をユーザーから対話的に取得し、最大長を超えた場合は切り詰めます。"""
     limits_config = util.app_config.get('limits', {})
     mail_subject_max_len = limits_config.get('mail_subject_max_length', 100)
 
-    is_mobile_web_client = (
-        isinstance(chan, terminal_handler.WebTerminalHandler.WebChannel) and
-        getattr(chan.handler, 'is_mobile', False)
-    )
-
     if is_mobile_web_client:
         prompt_text_template = util.get_text_by_key(
             "mail_handler.enter_subject", menu_mode)
@@ -776,18 +968,13 @@ def _get_subject(chan, menu_mode):
     return subject
 
 
-def _get_body(chan, menu_mode):
+def _get_body(chan, menu_mode, is_mobile_web_client=False):
     """本文をユーザーから対話的に取得し、最大長を超えた場合は切り詰めます。"""
     limits_config = util.app_config.get('limits', {})
     mail_body_max_len = limits_config.get('mail_body_max_length', 4096)
     util.send_text_by_key(
         chan, "mail_handler.enter_body", menu_mode, max_len=mail_body_max_len)
 
-    is_mobile_web_client = (
-        isinstance(chan, terminal_handler.WebTerminalHandler.WebChannel) and
-        getattr(chan.handler, 'is_mobile', False)
-    )
-
     message = ""
     if is_mobile_web_client:
         # モバイルWebクライアントの場合はマルチラインエディタを呼び出す
@@ -800,13 +987,18 @@ def _get_body(chan, menu_mode):
     else:
         # --- 従来のインラインエディタを使用する場合 ---
         message_lines = []
+        # 結合後の本文の長さ (末尾の行にも区切りの \r\n 分を加算したもの)
+        message_len = 0
         while True:
             line = chan.process_input()
             if line is None:
                 return None  # 切断
             if line == '^':
                 break
-            message_lines.append(line)
+            # 最大長を超えた後の行は切り詰めで捨てられるため、保持しない
+            if message_len - 2 <= mail_body_max_len:
+                message_lines.append(line)
+                message_len += len(line) + 2
         message = '\r\n'.join(message_lines)
 
     if len(message) > mail_body_max_len:
@@ -817,68 +1009,48 @@ def _get_body(chan, menu_mode):
 
 
 def _save_mails_to_db(sender_id, recipient_info_list, subject, body, ip_address=None):
-    """複数の宛先に対して、それぞれメールをデータベースに保存します。"""
+    """複数の宛先に対して、メールをまとめてデータベースに保存します。"""
     try:
         sent_at = int(time.time())
-        for rec_name, _ in recipient_info_list:
-            recipient_data = database.get_user_auth_info(rec_name)
-            if not recipient_data:
-                logging.error(f"送信に失敗、{rec_name}がDBに存在しません。")
-                continue
-            recipient_id = recipient_data['id']
-            query = "INSERT INTO mails (sender_id, recipient_id, subject, body, sent_at, sender_ip_address) VALUES (%s, %s, %s, %s, %s, %s)"
-            params = (sender_id, recipient_id, subject,
-                      body, sent_at, ip_address)
-            database.execute_query(query, params)
-        return True
+        # 宛先のユーザーIDは _get_recipients で検証済みのものを使う
+        recipient_ids = [rec_id for _, _, rec_id in recipient_info_list]
+        return database.send_mails(sender_id, recipient_ids, subject, body, sent_at, ip_address=ip_address)
     except Exception as e:
         logging.error(f"メールDB保存中にエラー: {e}")
         return False
 
 
-def _confirm_and_send(chan, login_id, menu_mode, recipient_info_list, subject, body, ip_address=None):
+def _confirm_and_send(chan, login_id, menu_mode, recipient_info_list, subject, body, ip_address=None, is_mobile_web_client=False):
     """送信内容の最終確認画面を表示し、ユーザーの同意を得てからDBに保存します。"""
-    from markupsafe import escape
-    util.send_text_by_key(
-        chan, "mail_handler.confirm_send", menu_mode)
+    # 確認画面はまとめて組み立て、1回の送信で表示する
+    out = bytearray()
+    out += util.build_text_by_key(
+        "mail_handler.confirm_send", menu_mode).encode('utf-8')
 
     # 宛先表示
-    for name, comment in recipient_info_list:
-        util.send_text_by_key(chan, "mail_handler.recipient", menu_mode,
-                              current_recipient_name=name, current_recipient_comment=comment)  # noqa
-
-    util.send_text_by_key(chan, "mail_handler.subject",
-                          menu_mode, subject=subject)
-    util.send_text_by_key(chan, "mail_handler.body", menu_mode)
+    for name, comment, _ in recipient_info_list:
+        out += util.build_text_by_key("mail_handler.recipient", menu_mode,
+                                      current_recipient_name=name, current_recipient_comment=comment).encode('utf-8')  # noqa
+
+    out += util.build_text_by_key("mail_handler.subject",
+                                  menu_mode, subject=subject).encode('utf-8')
+    out += util.build_text_by_key(
+        "mail_handler.body", menu_mode).encode('utf-8')
     # XSS対策: ユーザーが入力した本文をエスケープしてから表示
-    for line in str(escape(body)).splitlines():
-        chan.send(f"{line}\r\n".encode('utf-8'))
-
-    is_mobile_web_client = (
-        isinstance(chan, terminal_handler.WebTerminalHandler.WebChannel) and
-        getattr(chan.handler, 'is_mobile', False)
-    )
+    escaped_body = util.to_crlf(body.translate(_BODY_ESCAPE_TABLE))
+    if not escaped_body.endswith('\r\n'):
+        escaped_body += '\r\n'
+    out += escaped_body.encode('utf-8')
 
     confirm_input_raw = None
     if is_mobile_web_client:
-        # ローカライズされたボタンラベルを取得
-        yes_label = util.get_text_by_key(
-            "common_messages.yes_button", menu_mode, default_value="Yes")
-        no_label = util.get_text_by_key(
-            "common_messages.no_button", menu_mode, default_value="No")
-        # Base64エンコード
-        yes_label_b64 = base64.b64encode(
-            yes_label.encode('utf-8')).decode('utf-8')
-        no_label_b64 = base64.b64encode(
-            no_label.encode('utf-8')).decode('utf-8')
         # ラベルを設定してボタンを表示するコマンドを送信
-        chan.send(
-            f'\x1b]GRBBS;CONFIRM_BUTTONS;{yes_label_b64};{no_label_b64}\x07'.encode('utf-8'))
-        chan.send(b'\x1b[?2035h')
+        out += _confirm_buttons_command(menu_mode)
 
     try:
-        util.send_text_by_key(
-            chan, "mail_handler.confirm_send_yn", menu_mode, add_newline=False)
+        out += util.build_text_by_key(
+            "mail_handler.confirm_send_yn", menu_mode, add_newline=False).encode('utf-8')
+        chan.send(bytes(out))
         confirm_input_raw = chan.process_input()
     finally:
         if is_mobile_web_client:
@@ -906,20 +1078,24 @@ def _confirm_and_send(chan, login_id, menu_mode, recipient_info_list, subject, b
 
 def mail_write(chan, login_id, menu_mode='2', ip_address=None):
     """メール作成のメインハンドラ。宛先、件名、本文の入力を順に受け付け、送信します。"""
-    recipient_info_list = _get_recipients(chan, menu_mode)
+    # モバイルWebクライアントかどうかは、各入力ステップで使うため最初に一度だけ判定する
+    is_mobile_web_client = getattr(chan, 'is_mobile_web', False)
+
+    recipient_info_list = _get_recipients(
+        chan, menu_mode, is_mobile_web_client)
     if not recipient_info_list:  # キャンセルまたは切断
         return
 
-    subject = _get_subject(chan, menu_mode)
+    subject = _get_subject(chan, menu_mode, is_mobile_web_client)
     if subject is None:  # 切断
         return
 
-    body = _get_body(chan, menu_mode)
+    body = _get_body(chan, menu_mode, is_mobile_web_client)
     if body is None:  # 切断
         return
     if not body.strip():
         util.send_text_by_key(chan, "mail_handler.no_body", menu_mode)
         return
 
-    _confirm_and_send(chan, login_id, menu_mode,
-                      recipient_info_list, subject, body, ip_address=ip_address)
+    _confirm_and_send(chan, login_id, menu_mode, recipient_info_list, subject, body,
+                      ip_address=ip_address, is_mobile_web_client=is_mobile_web_client)
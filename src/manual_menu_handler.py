@@ -9,17 +9,64 @@
 入室などの特定のアクションに繋げます。
 """
 
+import os
 import yaml
 import logging
 
 from . import util
 
+# LibYAML が利用できればC実装のローダーでパースする
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# 手書きメニュー設定のキャッシュ。{config_path: (mtime, config)}
+_MENU_CACHE = {}
+
+# メニューを抜けるだけのアクションタイプと、process_manual_menu が返す結果の対応
+_EXIT_ACTION_RESULTS = {
+    "exit_bbs_menu": "exit_bbs_menu",
+    "exit_chat_menu": "exit_chat_menu",
+    "exit_to_top": "back_to_top",
+}
+
+# トップレベルのメニューで "back" が選ばれた場合の、menu_type ごとの結果
+_BACK_RESULTS = {
+    "bbs": "exit_bbs_menu",
+    "chat": "exit_chat_menu",
+}
+
+
+def _normalize_menu_actions(config):
+    """各メニューの `actions` のキーを、入力と照合できるよう小文字の文字列に揃えます。
+
+    入力は小文字に変換して照合するため、読み込み時に一度だけ変換しておきます。
+    YAMLでクォートせずに書かれた数値のキー (例: 1) も文字列として扱われます。
+    """
+    if not isinstance(config, dict):
+        return config
+    for menu_data in config.values():
+        if isinstance(menu_data, dict) and isinstance(menu_data.get("actions"), dict):
+            menu_data["actions"] = {
+                str(key).lower(): action for key, action in menu_data["actions"].items()}
+    return config
+
 
 def _load_manual_menu_config(config_path: str):
-    """手書きメニューのYAML設定ファイルを読み込み、パースします。"""
+    """手書きメニューのYAML設定ファイルを読み込み、パースします。
+
+    パース結果はファイルの更新日時と共にキャッシュし、ファイルが変更されていなければ再利用します。
+    """
     try:
+        mtime = os.path.getmtime(config_path)
+        cached = _MENU_CACHE.get(config_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
         with open(config_path, "r", encoding="utf-8") as f:
-            config = yaml.safe_load(f)
+            config = _normalize_menu_actions(yaml.load(f, Loader=_YamlLoader))
+        _MENU_CACHE[config_path] = (mtime, config)
         return config
     except FileNotFoundError:
         logging.error(f"メニュー設定ファイルが見つかりません。{config_path}")
@@ -60,11 +107,11 @@ def _display_manual_menu(chan, menu_data, current_menu_mode):
         if actual_display_text is None:
             actual_display_text = ""
 
-        processed_text = actual_display_text.replace(
-            '\r\n', '\n').replace('\n', '\r\n')
-        chan.send(processed_text.encode('utf-8'))
+        processed_text = util.to_crlf(actual_display_text)
+        # 末尾の改行も含めて1回で送信する
         if not processed_text.endswith('\r\n'):
-            chan.send(b'\r\n')
+            processed_text += '\r\n'
+        chan.send(processed_text.encode('utf-8'))
 
     else:
         logging.warning("Menu data is missing 'display_text'.")
@@ -119,6 +166,7 @@ def process_manual_menu(chan, login_id: str, menu_mode: str, menu_config_path: s
         user_input = user_input_raw.strip().lower()
 
         # ユーザー入力に対応するアクションを取得 (空入力 "" もキーとして扱えます)
+        # キーは読み込み時に小文字へ正規化済み
         actions = current_menu_data.get("actions", {})
         action_to_take = actions.get(user_input)
 
@@ -165,19 +213,10 @@ def process_manual_menu(chan, login_id: str, menu_mode: str, menu_config_path: s
                 if menu_stack:
                     current_menu_id = menu_stack.pop()
                 else:
-                    if menu_type == "bbs":
-                        return "exit_bbs_menu"
-                    elif menu_type == "chat":
-                        return "exit_chat_menu"
-                    else:
-                        return "back_to_top"
-
-            elif action_type == "exit_bbs_menu":
-                return "exit_bbs_menu"
-            elif action_type == "exit_chat_menu":
-                return "exit_chat_menu"
-            elif action_type == "exit_to_top":
-                return "back_to_top"
+                    return _BACK_RESULTS.get(menu_type, "back_to_top")
+
+            elif action_type in _EXIT_ACTION_RESULTS:
+                return _EXIT_ACTION_RESULTS[action_type]
             else:
                 logging.warning(
                     f"未定義または未定義のアクションタイプ({action_type})が指定されました: {current_menu_id}")
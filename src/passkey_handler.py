@@ -8,7 +8,9 @@
 セキュリティキー）からのレスポンスの検証を担当します。
 """
 
+import atexit
 import logging
+import time
 from webauthn import (
     generate_registration_options,
     options_to_json,
@@ -29,13 +31,95 @@ from webauthn.helpers.exceptions import WebAuthnException
 
 from . import database, util
 
+# --- 署名カウント更新のバッファリング ---
+# ログインのたびに署名カウントをDBへ書き込むと認証の応答が1往復分遅れるため、
+# 更新はPasskeyごとにまとめて保持し、バックグラウンドタスクが一括で書き込む。
+# 書き込み前の値は認証時の検証に使うため、リプレイ攻撃対策は維持される。
+SIGN_COUNT_FLUSH_INTERVAL = 0.2  # 秒
+# {credential_id: (署名カウント, 最終利用日時)}
+_pending_sign_counts = {}
+_sign_count_flusher_started = False
+
+
+def _queue_sign_count_update(credential_id, new_sign_count):
+    """署名カウントの更新を書き込み待ちに追加します。同じPasskeyの更新は最新の値にまとめます。"""
+    _pending_sign_counts[bytes(credential_id)] = (
+        new_sign_count, int(time.time()))
+
+
+def _current_sign_count(db_passkey):
+    """書き込み待ちの更新も考慮した、Passkeyの現在の署名カウントを返します。"""
+    sign_count = db_passkey['sign_count']
+    pending = _pending_sign_counts.get(bytes(db_passkey['credential_id']))
+    if pending and pending[0] > sign_count:
+        return pending[0]
+    return sign_count
+
+
+def _flush_sign_counts():
+    """書き込み待ちの署名カウントをDBにまとめて書き込み、書き込んだ件数を返します。"""
+    if not _pending_sign_counts:
+        return 0
+    batch = list(_pending_sign_counts.items())
+    if not database.update_passkey_sign_counts_bulk(
+            [(credential_id, sign_count, last_used_at)
+             for credential_id, (sign_count, last_used_at) in batch]):
+        # 失敗した更新は破棄せずに残し、次回の書き込みで再試行する
+        logging.error(
+            f"署名カウントの一括書き込みに失敗しました。次回再試行します ({len(batch)}件)")
+        return 0
+    # 書き込み中に新しい値が届いたPasskeyは、次回の書き込みまで残す
+    for credential_id, value in batch:
+        if _pending_sign_counts.get(credential_id) == value:
+            del _pending_sign_counts[credential_id]
+    return len(batch)
+
+
+def _drain_sign_counts():
+    """書き込み待ちの署名カウントを全て書き込みます。終了時に呼び出されます。"""
+    try:
+        _flush_sign_counts()
+    except Exception as e:
+        logging.error(f"署名カウントの書き出し中にエラー: {e}")
+
+
+def _sign_count_flusher(socketio):
+    """一定間隔で書き込み待ちの署名カウントをDBに書き出すバックグラウンドタスク。"""
+    while True:
+        socketio.sleep(SIGN_COUNT_FLUSH_INTERVAL)
+        try:
+            _flush_sign_counts()
+        except Exception as e:
+            logging.error(f"署名カウントの一括書き込み中にエラー: {e}")
+
+
+def init_sign_count_flusher(socketio):
+    """署名カウントを書き出すバックグラウンドタスクを開始します。"""
+    global _sign_count_flusher_started
+    if not _sign_count_flusher_started:
+        _sign_count_flusher_started = True
+        socketio.start_background_task(_sign_count_flusher, socketio)
+        atexit.register(_drain_sign_counts)
+
+
+# Relying Party の情報のキャッシュ。(読み込み元の設定辞書, (rp_id, rp_name)) の形式。
+# 設定ファイルが読み直されて `util.app_config` が差し替わった場合は作り直す。
+_rp_info_cache = (None, None)
+
 
 def _get_rp_info():
     """Relying Party (RP) のIDと名前を config.toml から取得するヘルパー関数。"""
+    global _rp_info_cache
+    config, rp_info = _rp_info_cache
+    if config is util.app_config:
+        return rp_info
+
     webapp_config = util.app_config.get('webapp', {})
     rp_id = webapp_config.get('RP_ID', 'localhost')
     rp_name = webapp_config.get('BBS_NAME', 'GR-BBS')
-    return rp_id, rp_name
+    rp_info = (rp_id, rp_name)
+    _rp_info_cache = (util.app_config, rp_info)
+    return rp_info
 
 
 def generate_registration_options_for_user(user_id, username):
@@ -171,15 +255,14 @@ def verify_authentication_for_user(credential, expected_challenge, expected_orig
             expected_origin=normalized_origin,
             expected_rp_id=rp_id,
             credential_public_key=db_passkey['public_key'],
-            credential_current_sign_count=db_passkey['sign_count'],
+            credential_current_sign_count=_current_sign_count(db_passkey),
             require_user_verification=False,
         )
 
         # --- 3. 署名カウントを更新（リプレイ攻撃対策） ---
-        database.update_passkey_sign_count(
-            credential_id=verification.credential_id,
-            new_sign_count=verification.new_sign_count
-        )
+        # DBへの書き込みはバックグラウンドでまとめて行う
+        _queue_sign_count_update(
+            verification.credential_id, verification.new_sign_count)
 
         # --- 4. 認証成功。ユーザー情報を返す ---
         return database.get_user_by_id(db_passkey['user_id'])
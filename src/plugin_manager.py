@@ -15,8 +15,12 @@ import os
 import importlib
 import importlib.util
 from gevent import Timeout
+from gevent.lock import BoundedSemaphore
 import logging
+import pkgutil
 import sys
+import threading
+import time
 import toml
 
 from .grbbs_api import GrbbsApi
@@ -30,104 +34,216 @@ PLUGINS_DIR = os.path.join(PROJECT_ROOT, 'plugins')
 # ロード済みのプラグイン情報を格納するグローバル辞書。
 # 形式: { 'plugin_dir_name': {'module': module, 'name': 'Plugin Name', ...} }
 _loaded_plugins = {}
+# メニュー表示用に名前順に整形したプラグイン一覧。`load_plugins()` の度に作り直す。
+_loaded_plugins_list = []
+
+# plugin.toml のパース結果のキャッシュ。{metadata_path: (mtime, metadata)}
+# ファイルの更新日時が変わった場合のみ読み直す。
+_metadata_cache = {}
+
+# 管理画面用の全プラグイン一覧のキャッシュ。(有効期限(monotonic), 一覧) の形式。
+# 有効/無効の切り替えやプラグインの再読み込み時には破棄されます。
+AVAILABLE_PLUGINS_CACHE_TTL = 5.0  # 秒
+_available_plugins_cache = (0.0, None)
+
+# 初回のプラグイン読み込みが完了したことを示すイベント。
+# 起動時の読み込みはバックグラウンドで行われるため、プラグインを利用する処理は
+# `wait_ready()` で完了を待ちます。
+_plugins_ready = threading.Event()
+# `wait_ready()` のデフォルトの待機時間 (秒)
+PLUGIN_LOAD_WAIT_TIMEOUT = 30
+
+
+def _iter_plugin_metadata_paths():
+    """プラグインディレクトリを走査し、(プラグインID, plugin.toml のパス) を順に返します。
+
+    `os.scandir` のエントリが持つ種別情報を使い、ディレクトリかどうかの判定で stat を発行しません。
+    """
+    with os.scandir(PLUGINS_DIR) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            metadata_path = os.path.join(entry.path, 'plugin.toml')
+            if os.path.exists(metadata_path):
+                yield entry.name, metadata_path
+
+
+def _load_metadata(metadata_path):
+    """プラグインのメタデータ(plugin.toml)を読み込みます。
+
+    ファイルが前回から変更されていなければ、キャッシュしたパース結果を返します。
+    """
+    mtime = os.path.getmtime(metadata_path)
+    cached = _metadata_cache.get(metadata_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        metadata = toml.load(f)
+    _metadata_cache[metadata_path] = (mtime, metadata)
+    return metadata
+
+
+def _find_installed_modules():
+    """インストール済みのトップレベルモジュール名の集合を返します。
+
+    `sys.path` を1回だけ走査し、依存ライブラリの存在確認に使います。
+    """
+    installed = set(sys.builtin_module_names)
+    installed.update(module.name for module in pkgutil.iter_modules())
+    return frozenset(installed)
+
+
+def _is_requirement_available(req, installed_modules):
+    """依存ライブラリ `req` がインポート可能かどうかを返します。
+
+    インストール済みモジュールの集合に無い名前 (サブモジュール指定など) のみ
+    `importlib.util.find_spec` で確認します。
+    """
+    if req in installed_modules:
+        return True
+    try:
+        return importlib.util.find_spec(req) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def load_plugins_in_background():
+    """プラグインの読み込みをバックグラウンドスレッドで開始します。"""
+    threading.Thread(target=load_plugins, name='grbbs-plugin-loader',
+                     daemon=True).start()
+
+
+def wait_ready(timeout=PLUGIN_LOAD_WAIT_TIMEOUT):
+    """初回のプラグイン読み込みが完了するまで待機します。
+
+    Returns:
+        bool: 読み込みが完了していればTrue、タイムアウトした場合はFalse。
+    """
+    if _plugins_ready.wait(timeout):
+        return True
+    logging.warning(f"プラグインの読み込みが{timeout}秒以内に完了しませんでした。")
+    return False
 
 
 def load_plugins():
     """'plugins' ディレクトリをスキャンし、有効な全てのプラグインをロードします。"""
-    global _loaded_plugins
-    _loaded_plugins = {}
+    global _loaded_plugins, _loaded_plugins_list
+    try:
+        loaded_plugins = _scan_and_load_plugins()
+        _loaded_plugins_list = _build_plugins_list(loaded_plugins)
+        _loaded_plugins = loaded_plugins
+        invalidate_available_plugins_cache()
+    finally:
+        _plugins_ready.set()
+
+
+def _scan_and_load_plugins():
+    """プラグインを読み込み、ロード済みプラグインの辞書を返します。
+
+    読み込み中も既存のプラグイン一覧を参照できるよう、結果は新しい辞書に構築します。
+    """
+    loaded_plugins = {}
     logging.info("プラグインの読み込みを開始します...")
 
     if not os.path.isdir(PLUGINS_DIR):
         logging.warning(f"プラグインディレクトリが見つかりません: {PLUGINS_DIR}")
-        return
+        return loaded_plugins
 
     # データベースから現在のプラグイン設定を一括で取得
     plugin_settings = database.get_all_plugin_settings()
+    # インストール済みモジュールの一覧は、依存ライブラリを持つプラグインが現れた時点で一度だけ作成する
+    installed_modules = None
 
-    for item in os.listdir(PLUGINS_DIR):
-        plugin_dir = os.path.join(PLUGINS_DIR, item)
-        metadata_path = os.path.join(plugin_dir, 'plugin.toml')
-
-        if os.path.isdir(plugin_dir) and os.path.exists(metadata_path):
-            plugin_id = item
-            try:
-                is_enabled = plugin_settings.get(plugin_id, True)
-
-                if not is_enabled:
-                    logging.info(
-                        f"Plugin '{plugin_id}' is disabled, skipping.")
-                    continue
-
-                # プラグインのメタデータ(plugin.toml)を読み込み
-                with open(metadata_path, 'r', encoding='utf-8') as f:
-                    metadata = toml.load(f)
-
-                # 依存ライブラリがインストールされているかチェック
-                requirements = metadata.get('requirements', [])
-                is_loadable = True
-                for req in requirements:
-                    if importlib.util.find_spec(req) is None:
-                        logging.warning(
-                            f"プラグイン '{metadata.get('name', plugin_id)}' の依存ライブラリ '{req}' が見つかりません。このプラグインは無効化されます。")
-                        is_loadable = False
-                        break
-
-                if not is_loadable:
-                    continue
-
-                # エントリーポイントとして指定されたモジュールを動的にインポート
-                module_name = metadata.get('entry_point')
-                if not module_name:
-                    logging.warning(
-                        f"プラグイン '{plugin_id}' の 'plugin.toml' に 'entry_point' がありません。")
-                    continue
-
-                if module_name in sys.modules:
-                    plugin_module = importlib.reload(sys.modules[module_name])
-                else:
-                    plugin_module = importlib.import_module(module_name)
-
-                if hasattr(plugin_module, 'run') and callable(plugin_module.run):
-                    _loaded_plugins[plugin_id] = {
-                        'module': plugin_module,
-                        'name': metadata.get('name', plugin_id),
-                        'description': metadata.get('description', ''),
-                        'timeout': metadata.get('timeout'),
-                    }
-                    logging.info(
-                        f"プラグイン '{metadata.get('name', plugin_id)}' ({plugin_id}) を正常にロードしました。")
-                else:
-                    logging.warning(
-                        f"プラグイン '{plugin_id}' のモジュール '{module_name}' に実行可能な 'run' 関数がありません。")
+    for plugin_id, metadata_path in _iter_plugin_metadata_paths():
+        try:
+            is_enabled = plugin_settings.get(plugin_id, True)
 
-            except (ImportError, toml.TomlDecodeError) as e:
-                logging.error(f"プラグイン '{plugin_id}' の読み込みに失敗しました: {e}")
-            except Exception as e:
-                logging.error(
-                    f"プラグイン '{plugin_id}' の読み込み中に予期せぬエラーが発生しました: {e}", exc_info=True)
+            if not is_enabled:
+                logging.info(
+                    f"Plugin '{plugin_id}' is disabled, skipping.")
+                continue
 
-    logging.info(f"{len(_loaded_plugins)}個のプラグインをロードしました。")
+            # プラグインのメタデータ(plugin.toml)を読み込み
+            metadata = _load_metadata(metadata_path)
 
+            # 依存ライブラリがインストールされているかチェック
+            requirements = metadata.get('requirements', [])
+            if requirements and installed_modules is None:
+                installed_modules = _find_installed_modules()
+            is_loadable = True
+            for req in requirements:
+                if not _is_requirement_available(req, installed_modules):
+                    logging.warning(
+                        f"プラグイン '{metadata.get('name', plugin_id)}' の依存ライブラリ '{req}' が見つかりません。このプラグインは無効化されます。")
+                    is_loadable = False
+                    break
 
-def get_loaded_plugins():
-    """ロード済みのプラグインのリストをメニュー表示用に整形して返します。
+            if not is_loadable:
+                continue
 
-    Returns:
-        list[dict]: プラグイン情報の辞書のリスト。
-                    各辞書は 'id', 'name', 'description' を含みます。
-    """
+            # エントリーポイントとして指定されたモジュールを動的にインポート
+            module_name = metadata.get('entry_point')
+            if not module_name:
+                logging.warning(
+                    f"プラグイン '{plugin_id}' の 'plugin.toml' に 'entry_point' がありません。")
+                continue
+
+            if module_name in sys.modules:
+                plugin_module = importlib.reload(sys.modules[module_name])
+            else:
+                plugin_module = importlib.import_module(module_name)
+
+            if hasattr(plugin_module, 'run') and callable(plugin_module.run):
+                # 同時実行数の上限 (plugin.toml の max_concurrent_runs)。未指定なら無制限
+                max_concurrent_runs = metadata.get('max_concurrent_runs')
+                loaded_plugins[plugin_id] = {
+                    'module': plugin_module,
+                    'name': metadata.get('name', plugin_id),
+                    'description': metadata.get('description', ''),
+                    'timeout': metadata.get('timeout'),
+                    'semaphore': BoundedSemaphore(max_concurrent_runs)
+                    if isinstance(max_concurrent_runs, int) and max_concurrent_runs > 0 else None,
+                }
+                logging.info(
+                    f"プラグイン '{metadata.get('name', plugin_id)}' ({plugin_id}) を正常にロードしました。")
+            else:
+                logging.warning(
+                    f"プラグイン '{plugin_id}' のモジュール '{module_name}' に実行可能な 'run' 関数がありません。")
+
+        except (ImportError, toml.TomlDecodeError) as e:
+            logging.error(f"プラグイン '{plugin_id}' の読み込みに失敗しました: {e}")
+        except Exception as e:
+            logging.error(
+                f"プラグイン '{plugin_id}' の読み込み中に予期せぬエラーが発生しました: {e}", exc_info=True)
+
+    logging.info(f"{len(loaded_plugins)}個のプラグインをロードしました。")
+    return loaded_plugins
+
+
+def _build_plugins_list(loaded_plugins):
+    """ロード済みプラグインの辞書から、名前順のメニュー表示用リストを作成します。"""
     plugins_list = []
-    for plugin_id, plugin_data in _loaded_plugins.items():
+    for plugin_id, plugin_data in loaded_plugins.items():
         plugins_list.append({
             'id': plugin_id,
             'name': plugin_data['name'],
             'description': plugin_data['description']
         })
-    # 名前順でソートして返す
     return sorted(plugins_list, key=lambda p: p['name'])
 
 
+def get_loaded_plugins():
+    """ロード済みのプラグインのリストをメニュー表示用に整形して返します。
+
+    Returns:
+        list[dict]: プラグイン情報の辞書のリスト。
+                    各辞書は 'id', 'name', 'description' を含みます。
+    """
+    wait_ready()
+    # 読み込み時に名前順で作成済みの一覧を、呼び出し側が変更しても影響しないよう複製して返す
+    return list(_loaded_plugins_list)
+
+
 def run_plugin(app, plugin_id, context):
     """指定されたIDのプラグインを実行します。
 
@@ -139,6 +255,7 @@ def run_plugin(app, plugin_id, context):
         plugin_id (str): 実行するプラグインのID（ディレクトリ名）。
         context (CommandContext): コマンド実行コンテキスト。
     """
+    wait_ready()
     plugin_data = _loaded_plugins.get(plugin_id)
     if not plugin_data:
         logging.error(f"実行しようとしたプラグイン '{plugin_id}' が見つかりません。")
@@ -170,6 +287,15 @@ def run_plugin(app, plugin_id, context):
         # DBに設定がなければデフォルトで60秒
         timeout_seconds = server_prefs.get('plugin_execution_timeout', 60)
 
+    # 同時実行数の上限に達している場合は実行しない
+    semaphore = plugin_data.get('semaphore')
+    if semaphore is not None and not semaphore.acquire(blocking=False):
+        logging.info(
+            f"プラグイン '{plugin_data['name']}' は同時実行数の上限に達しているため実行しませんでした。")
+        api.send(
+            "\r\nこのプログラムは現在混み合っています。しばらくしてから再度お試しください。\r\n".encode('utf-8'))
+        return False
+
     logging.info(
         f"プラグイン '{plugin_data['name']}' を実行します (タイムアウト: {timeout_seconds if timeout_seconds is not None else 'なし'})...")
 
@@ -189,41 +315,61 @@ def run_plugin(app, plugin_id, context):
         api.send(
             f"\r\nエラー: プログラムが時間内に応答しませんでした。({timeout_seconds}秒)\r\n".encode('utf-8'))
         return False
+    finally:
+        if semaphore is not None:
+            semaphore.release()
+
+
+def invalidate_available_plugins_cache():
+    """管理画面用の全プラグイン一覧のキャッシュを破棄します。"""
+    global _available_plugins_cache
+    _available_plugins_cache = (0.0, None)
 
 
 def get_all_available_plugins():
     """利用可能な全てのプラグインの情報を、DBの有効/無効状態と合わせて返します。
 
+    管理画面の再表示のたびにDBとディレクトリを走査しないよう、
+    結果は `AVAILABLE_PLUGINS_CACHE_TTL` 秒間キャッシュします。
+
     Returns:
         list[dict]: 利用可能な全プラグイン情報のリスト。
                     各辞書は 'id', 'name', 'description', 'is_enabled' を含みます。
     """
+    global _available_plugins_cache
+    expires_at, cached_plugins = _available_plugins_cache
+    now = time.monotonic()
+    if cached_plugins is not None and now < expires_at:
+        return list(cached_plugins)
+
+    available_plugins = _scan_available_plugins()
+    _available_plugins_cache = (
+        now + AVAILABLE_PLUGINS_CACHE_TTL, available_plugins)
+    return list(available_plugins)
+
+
+def _scan_available_plugins():
+    """プラグインディレクトリを走査し、名前順の全プラグイン情報のリストを返します。"""
     available_plugins = []
     if not os.path.isdir(PLUGINS_DIR):
         return []
 
     plugin_settings = database.get_all_plugin_settings()
 
-    for item in os.listdir(PLUGINS_DIR):
-        plugin_dir = os.path.join(PLUGINS_DIR, item)
-        metadata_path = os.path.join(plugin_dir, 'plugin.toml')
-
-        if os.path.isdir(plugin_dir) and os.path.exists(metadata_path):
-            plugin_id = item
-            try:
-                with open(metadata_path, 'r', encoding='utf-8') as f:
-                    metadata = toml.load(f)
-
-                is_enabled = plugin_settings.get(plugin_id, True)
-
-                available_plugins.append({
-                    'id': plugin_id,
-                    'name': metadata.get('name', plugin_id),
-                    'description': metadata.get('description', ''),
-                    'is_enabled': is_enabled,
-                })
-            except Exception as e:
-                logging.error(f"プラグイン '{plugin_id}' のメタデータ読み込みに失敗: {e}")
-                continue
+    for plugin_id, metadata_path in _iter_plugin_metadata_paths():
+        try:
+            metadata = _load_metadata(metadata_path)
+
+            is_enabled = plugin_settings.get(plugin_id, True)
+
+            available_plugins.append({
+                'id': plugin_id,
+                'name': metadata.get('name', plugin_id),
+                'description': metadata.get('description', ''),
+                'is_enabled': is_enabled,
+            })
+        except Exception as e:
+            logging.error(f"プラグイン '{plugin_id}' のメタデータ読み込みに失敗: {e}")
+            continue
 
     return sorted(available_plugins, key=lambda p: p['name'])
@@ -30,6 +30,43 @@ client_states = {}
 current_webapp_clients = 0
 current_webapp_clients_lock = threading.Lock()
 
+# {username.upper(): sid}
+# ログイン中ユーザー(GUEST以外)のセッションを引くための索引。
+# `current_webapp_clients_lock` で保護されます。
+username_to_sid = {}
+
+
+# サーバー設定 `max_concurrent_webapp_clients` のキャッシュ。
+# 接続のたびにDBを読まないよう保持し、管理画面で設定が更新されたら破棄します。
+# 複数プロセスで動作している場合に備え、一定時間で読み直します。
+MAX_CLIENTS_CACHE_TTL = 60  # 秒
+_max_concurrent_webapp_clients = None
+_max_concurrent_webapp_clients_loaded_at = 0.0
+
+
+def get_max_concurrent_webapp_clients():
+    """Webターミナルの最大同時接続数を返します。値はキャッシュされます。"""
+    global _max_concurrent_webapp_clients, _max_concurrent_webapp_clients_loaded_at
+    now = time.monotonic()
+    if (_max_concurrent_webapp_clients is None
+            or now - _max_concurrent_webapp_clients_loaded_at > MAX_CLIENTS_CACHE_TTL):
+        server_prefs = database.read_server_pref() or {}
+        _max_concurrent_webapp_clients = int(
+            server_prefs.get('max_concurrent_webapp_clients', 4))
+        _max_concurrent_webapp_clients_loaded_at = now
+    return _max_concurrent_webapp_clients
+
+
+def invalidate_max_concurrent_webapp_clients():
+    """最大同時接続数のキャッシュを破棄します。"""
+    global _max_concurrent_webapp_clients
+    _max_concurrent_webapp_clients = None
+
+
+# 1セッションあたりの入力キューの上限。ワーカーが停止している間に
+# 入力が無制限に溜まらないよう、上限を超えると古い入力から破棄します。
+INPUT_QUEUE_MAXLEN = 4096
+
 
 # --- Constants for Simulated Baud Rates / 擬似BPSレート用定数 ---
 BPS_DELAYS = {
@@ -82,8 +119,7 @@ def kick_user_session(sid, socketio):
             "auth.kicked_by_sysop",
             client_states[sid].user_session.get('menu_mode', '2')
         )
-        processed_text = logoff_message_text.replace(
-            '\r\n', '\n').replace('\n', '\r\n')
+        processed_text = util.to_crlf(logoff_message_text)
         socketio.emit('force_disconnect', {'message': processed_text}, to=sid)
         socketio.close_room(sid)
         logging.info(f"SysOp kicked user with SID: {sid}")
@@ -112,12 +148,13 @@ class WebTerminalHandler:
         self.app = app  # Flaskアプリケーションインスタンスを保持
         self.bps_delay = 0
         self.output_queue = collections.deque()
-        self.input_queue = collections.deque()
+        self.input_queue = collections.deque(maxlen=INPUT_QUEUE_MAXLEN)
+        self.input_dropped_count = 0  # 入力キューが溢れて破棄された入力の数
         self.input_event = threading.Event()
         self.stop_worker_event = threading.Event()
         self.is_logging = False
         self.connect_time = time.time()
-        self.log_buffer = []
+        self.log_buffer = bytearray()  # セッションログ (UTF-8バイト列)
         self.mail_notified_this_session = False
         self.main_thread_active = True
         self.pending_upload = None  # プラグインからのファイルアップロード結果を一時的に保持
@@ -186,6 +223,8 @@ class WebTerminalHandler:
         def __init__(self, handler_instance, ip_addr):
             self.handler = handler_instance
             self.ip_address = ip_addr
+            # モバイル向けWebクライアントかどうか (セッション中は変わらないため生成時に決定する)
+            self.is_mobile_web = getattr(handler_instance, 'is_mobile', False)
             self.recv_buffer = b''
             self.active = True
             self._timeout = None
@@ -199,11 +238,12 @@ class WebTerminalHandler:
             else:
                 text_to_send = str(data)
             if self.handler.is_logging:
-                self.handler.log_buffer.append(text_to_send)
+                self.handler.log_buffer += text_to_send.encode('utf-8')
             self.handler.output_queue.append(text_to_send)
 
         def recv(self, n):
-            while len(self.recv_buffer) < n and self.active:
+            # ソケットと同様に、1バイト以上届いていれば最大 n バイトまでを返す
+            while not self.recv_buffer and self.active:
                 if not self.handler.input_queue:
                     if not self.handler.input_event.wait(timeout=None):
                         raise socket.timeout("timed out")
@@ -221,6 +261,10 @@ class WebTerminalHandler:
             self.recv_buffer = self.recv_buffer[n:]
             return ret
 
+        def unrecv(self, data):
+            """読み込んだものの未処理だったデータを、受信バッファの先頭に戻します。"""
+            self.recv_buffer = data + self.recv_buffer
+
         def getpeername(self):
             return (self.ip_address, 12345)
 
@@ -302,6 +346,16 @@ class WebTerminalHandler:
             # 全文が入力キューに入っている
             return self.handler.input_queue.popleft()
 
+    def enqueue_input(self, data):
+        """クライアントからの入力を入力キューに追加し、ワーカーに通知します。"""
+        if len(self.input_queue) == INPUT_QUEUE_MAXLEN:
+            self.input_dropped_count += 1
+            if self.input_dropped_count == 1:
+                logging.warning(
+                    f"入力キューが上限に達したため、古い入力を破棄しました。(SID: {self.sid})")
+        self.input_queue.append(data)
+        self.input_event.set()
+
     def stop_worker(self):
         self.main_thread_active = False
         self.channel.close()
@@ -362,8 +416,7 @@ class WebTerminalHandler:
                 if result.get('status') == 'logoff':
                     logoff_message_text = util.get_text_by_key(  # ログオフメッセージを取得
                         "logoff.message", context.menu_mode)
-                    processed_text = logoff_message_text.replace(
-                        '\r\n', '\n').replace('\n', '\r\n')
+                    processed_text = util.to_crlf(logoff_message_text)
                     self.main_thread_active = False
                     self.socketio.emit('force_disconnect', {
                                        'message': processed_text}, to=self.sid)
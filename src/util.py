@@ -14,12 +14,15 @@ import logging
 import toml
 import os
 import hashlib
+import ipaddress
+import functools
 import time
 import yaml
 import datetime
 import re
 import secrets
 import json
+import orjson
 import string
 from flask import request, session
 import base64
@@ -33,6 +36,10 @@ from cryptography.hazmat.primitives import serialization
 # --- Global Variables / グローバル変数 ---
 _master_text_data_cache = None
 
+# 隔離ログのファイル名 (JSON Lines形式)。旧形式はJSON配列を丸ごと書き換えていた。
+QUARANTINE_LOG_FILENAME = 'quarantine_log.jsonl'
+_LEGACY_QUARANTINE_LOG_FILENAME = 'quarantine_log.json'
+
 
 def log_audit_event(action: str, details: dict):
     """
@@ -115,14 +122,28 @@ def save_bbs_config(config_data):
         yaml.dump(config_data, f, allow_unicode=True, sort_keys=False)
 
 
+# 読み込み済みの設定ファイル: {パス: (更新日時, 設定辞書)}
+_app_config_cache = {}
+
+
 def load_app_config_from_path(config_file_path):
-    """指定されたパスのTOMLファイルからアプリケーション設定を読み込みます。"""
+    """指定されたパスのTOMLファイルからアプリケーション設定を読み込みます。
+
+    ファイルの更新日時が前回読み込み時から変わっていなければ、再パースせずに
+    前回の設定を使用します。
+    """
     global app_config
     try:
+        mtime = os.path.getmtime(config_file_path)
+        cached = _app_config_cache.get(config_file_path)
+        if cached and cached[0] == mtime:
+            app_config = cached[1]
+            return
         with open(config_file_path, 'r', encoding='utf-8') as f:
             app_config = toml.load(f)
             logging.info(f"設定ファイルを読み込みました: {config_file_path}")
             _validate_config_or_log_warnings()
+        _app_config_cache[config_file_path] = (mtime, app_config)
     except FileNotFoundError:
         logging.error(f"設定ファイル '{config_file_path}' が見つかりません。")
         raise
@@ -239,55 +260,53 @@ def get_text_by_key(key_string, mode_or_lang, default_value=""):
         return default_value
 
 
-def send_text_by_key(chan, key_string, menu_mode, default_value="", add_newline=True, **kwargs):
-    """指定されたキーのテキストを取得し、プレースホルダを置換してクライアントに送信します。"""
-    text_to_send = get_text_by_key(key_string, menu_mode, default_value)
-    if text_to_send:
-        try:
-            if kwargs:
-                text_to_send = text_to_send.format(**kwargs)
+# 改行コードの正規化 (\r\n または \n を \r\n に統一) に使用する
+_NL_NORMALIZE_RE = re.compile(r'\r?\n')
 
-            # SSHチャンネル向けに改行コードを正規化 (\r\n または \n を \r\n に統一)
-            processed_text = text_to_send.replace(
-                '\r\n', '\n').replace('\n', '\r\n')
 
-            # 末尾の改行を追加するかどうか制御
-            if add_newline:
-                if not processed_text.endswith('\r\n'):
-                    chan.send(processed_text + '\r\n')
-                else:
-                    chan.send(processed_text)  # 既に改行で終わっている場合はそのまま送信
-            else:
-                chan.send(processed_text)  # 末尾に改行を追加しない
+def to_crlf(text):
+    """テキストの改行コード (LF/CRLF) を1パスでCRLFに統一します。"""
+    return _NL_NORMALIZE_RE.sub('\r\n', text)
 
-        except KeyError as e:
+
+def build_text_by_key(key_string, menu_mode, default_value="", add_newline=True, **kwargs):
+    """指定されたキーのテキストを取得し、プレースホルダを置換した送信用の文字列を返します。
+
+    複数のテキストをまとめて1回で送信したい場合に使います。テキストがない場合は空文字列を返します。
+    """
+    text_to_send = get_text_by_key(key_string, menu_mode, default_value)
+    if not text_to_send:
+        if not default_value:
             logging.warning(
-                f"キー {key_string}のテキストフォーマット中にエラー：未定義のプレイスホルダ {e}")
-            # フォーマットエラーの場合も、改行処理と送信は試みる (text_to_send はフォーマット前のもの)
-            processed_text_on_error = text_to_send.replace(
-                '\r\n', '\n').replace('\n', '\r\n')
-            if add_newline:
-                if not processed_text_on_error.endswith('\r\n'):
-                    chan.send(processed_text_on_error + '\r\n')
-                else:
-                    chan.send(processed_text_on_error)
-            else:
-                chan.send(processed_text_on_error)
-        except Exception as e:
-            logging.error(
-                f"テキスト送信中にエラー(キー: {key_string})： {e}")
-            processed_text_on_error = text_to_send.replace(
-                '\r\n', '\n').replace('\n', '\r\n')
-            if add_newline:
-                if not processed_text_on_error.endswith('\r\n'):
-                    chan.send(processed_text_on_error + '\r\n')
-                else:
-                    chan.send(processed_text_on_error)
-            else:
-                chan.send(processed_text_on_error)
-    elif not default_value:
+                f"キー {key_string} (mode{menu_mode}) に対応するテキストデータがないのでスキップします。")
+        return ""
+
+    try:
+        if kwargs:
+            text_to_send = text_to_send.format(**kwargs)
+    except KeyError as e:
         logging.warning(
-            f"キー {key_string} (mode{menu_mode}) に対応するテキストデータがないのでスキップします。")
+            f"キー {key_string}のテキストフォーマット中にエラー：未定義のプレイスホルダ {e}")
+        # フォーマットエラーの場合も、改行処理と送信は試みる (text_to_send はフォーマット前のもの)
+    except Exception as e:
+        logging.error(
+            f"テキスト送信中にエラー(キー: {key_string})： {e}")
+
+    # SSHチャンネル向けに改行コードを正規化 (\r\n または \n を \r\n に統一)
+    processed_text = to_crlf(text_to_send)
+
+    # 末尾の改行を追加するかどうか制御 (既に改行で終わっている場合はそのまま)
+    if add_newline and not processed_text.endswith('\r\n'):
+        processed_text += '\r\n'
+    return processed_text
+
+
+def send_text_by_key(chan, key_string, menu_mode, default_value="", add_newline=True, **kwargs):
+    """指定されたキーのテキストを取得し、プレースホルダを置換してクライアントに送信します。"""
+    text_to_send = build_text_by_key(
+        key_string, menu_mode, default_value, add_newline, **kwargs)
+    if text_to_send:
+        chan.send(text_to_send)
 
 
 def send_top_menu(chan, menu_mode):
@@ -484,7 +503,7 @@ def check_new_mail(chan, username, current_menu_mode, notified_in_session):
         return notified_in_session  # ユーザーが見つからない場合は元の状態を返す
 
     try:
-        unread_count = database.get_total_unread_mail_count(user_id)
+        total_mail_count, unread_count = database.get_mail_counts(user_id)
 
         # 未読メールが0件なら、通知フラグをリセット(False)して終了
         if unread_count == 0:
@@ -497,7 +516,6 @@ def check_new_mail(chan, username, current_menu_mode, notified_in_session):
             return True
 
         # まだ通知していない場合、通知処理を行う
-        total_mail_count = database.get_total_mail_count(user_id)
         notification_message_format = get_text_by_key(
             "mail_handler.new_mail_notification", current_menu_mode
         )
@@ -919,7 +937,10 @@ def get_client_ip():
 
 
 def send_push_notification(subscription_info_json, payload_json):
-    """単一の購読情報を使用して、購読済みクライアントにプッシュ通知を送信します。"""
+    """単一の購読情報を使用して、購読済みクライアントにプッシュ通知を送信します。
+
+    `payload_json` は JSON 文字列のほか、`orjson.dumps` が返すバイト列もそのまま受け付けます。
+    """
     push_config = app_config.get('push', {})
     # VAPID_PRIVATE_KEY はファイルから直接読み込む
     private_key_path = '/app/private_key.pem'
@@ -993,39 +1014,118 @@ def send_push_notification(subscription_info_json, payload_json):
         return False
 
 
-def scan_file_with_clamav(filepath):
-    """指定されたファイルをClamAVデーモン (clamd) を使ってスキャンします。"""
+def _clamav_instream(chunks):
+    """チャンクのイテラブルをclamdのINSTREAMコマンドでスキャンします。"""
     clamav_config = app_config.get('clamav', {})
-    if not clamav_config.get('enabled', False):
-        return True, "ClamAV scan is disabled."
-
     host = clamav_config.get('host', 'localhost')
     port = clamav_config.get('port', 3310)
     timeout = 10  # タイムアウトを10秒に設定
 
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect((host, port))
+        # clamdにINSTREAMコマンドを送信
+        sock.sendall(b'zINSTREAM\0')
+        for chunk in chunks:
+            sock.sendall(len(chunk).to_bytes(4, 'big'))
+            sock.sendall(chunk)
+        sock.sendall((0).to_bytes(4, 'big'))  # ストリームの終わりを通知
+        response = sock.recv(1024).decode('utf-8').strip()
+        return "OK" in response, response
+
+
+def scan_file_with_clamav(filepath):
+    """指定されたファイルをClamAVデーモン (clamd) を使ってスキャンします。"""
+    if not app_config.get('clamav', {}).get('enabled', False):
+        return True, "ClamAV scan is disabled."
+
+    def _read_chunks():
+        with open(filepath, 'rb') as f:
+            # ファイルをチャンクで送信
+            while True:
+                chunk = f.read(2048)
+                if not chunk:
+                    break
+                yield chunk
+
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(timeout)
-            sock.connect((host, port))
-            # clamdにINSTREAMコマンドを送信
-            sock.sendall(b'zINSTREAM\0')
-            with open(filepath, 'rb') as f:
-                # ファイルをチャンクで送信
-                while True:
-                    chunk = f.read(2048)
-                    if not chunk:
-                        break
-                    size = len(chunk).to_bytes(4, 'big')
-                    sock.sendall(size + chunk)
-            sock.sendall((0).to_bytes(4, 'big'))  # ストリームの終わりを通知
-            response = sock.recv(1024).decode('utf-8').strip()
-            is_safe = "OK" in response
-            return is_safe, response
+        return _clamav_instream(_read_chunks())
     except Exception as e:
         logging.error(f"ClamAVスキャン中にエラーが発生しました: {e}", exc_info=True)
         return False, f"ClamAV scan error: {e}"
 
 
+def scan_bytes_with_clamav(data):
+    """メモリ上のデータをClamAVデーモン (clamd) を使ってスキャンします。
+
+    ディスクに書き込む前のアップロードデータをスキャンするために使用します。
+    """
+    if not app_config.get('clamav', {}).get('enabled', False):
+        return True, "ClamAV scan is disabled."
+
+    chunk_size = 64 * 1024
+    mv = memoryview(data)
+    try:
+        return _clamav_instream(
+            mv[i:i + chunk_size] for i in range(0, len(mv), chunk_size))
+    except Exception as e:
+        logging.error(f"ClamAVスキャン中にエラーが発生しました: {e}", exc_info=True)
+        return False, f"ClamAV scan error: {e}"
+
+
+def append_quarantine_log(quarantine_dir, log_entry):
+    """隔離ログ (JSON Lines形式) にエントリを1行追記します。
+
+    既存のログ全体を読み書きせずに追記するため、ログの件数に関わらず一定のコストで記録できます。
+    """
+    log_file_path = os.path.join(quarantine_dir, QUARANTINE_LOG_FILENAME)
+    with open(log_file_path, 'ab') as f:
+        f.write(orjson.dumps(log_entry) + b'\n')
+
+
+def iter_quarantine_log(quarantine_dir):
+    """隔離ログのエントリを1件ずつ返すジェネレータ。旧形式 (JSON配列) のログも読み込みます。"""
+    legacy_log_path = os.path.join(
+        quarantine_dir, _LEGACY_QUARANTINE_LOG_FILENAME)
+    if os.path.exists(legacy_log_path):
+        try:
+            with open(legacy_log_path, 'r', encoding='utf-8') as f:
+                legacy_logs = json.load(f)
+            if isinstance(legacy_logs, list):
+                yield from legacy_logs
+        except (json.JSONDecodeError, IOError) as e:
+            logging.warning(f"旧形式の隔離ログの読み込みに失敗しました: {e}")
+
+    log_file_path = os.path.join(quarantine_dir, QUARANTINE_LOG_FILENAME)
+    try:
+        with open(log_file_path, 'rb') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    logging.warning(f"隔離ログの不正な行をスキップしました: {line[:80]!r}")
+    except FileNotFoundError:
+        return
+
+
+def remove_quarantine_log_entry(quarantine_dir, unique_filename):
+    """指定されたファイルのエントリを隔離ログから削除します。旧形式のログはこの時に移行されます。"""
+    remaining = [entry for entry in iter_quarantine_log(quarantine_dir)
+                 if entry.get('unique_filename') != unique_filename]
+    log_file_path = os.path.join(quarantine_dir, QUARANTINE_LOG_FILENAME)
+    with open(log_file_path, 'wb') as f:
+        for entry in remaining:
+            f.write(orjson.dumps(entry) + b'\n')
+
+    legacy_log_path = os.path.join(
+        quarantine_dir, _LEGACY_QUARANTINE_LOG_FILENAME)
+    if os.path.exists(legacy_log_path):
+        os.remove(legacy_log_path)
+
+
 def create_thumbnail(original_path, thumbnail_path, size=(100, 100)):
     """指定された画像ファイルからサムネイルを生成し、JPEG形式で保存します。"""
     # サムネイルを保存するディレクトリが存在しない場合は作成
@@ -1034,6 +1134,10 @@ def create_thumbnail(original_path, thumbnail_path, size=(100, 100)):
 
     try:
         with Image.open(original_path) as img:
+            # JPEGの場合、デコード時点で縮小させて不要なブロックの展開を省く
+            # (EXIFによる回転で縦横が入れ替わっても足りるよう、長辺に合わせて要求する)
+            draft_edge = max(size)
+            img.draft('RGB', (draft_edge, draft_edge))
             # 画像の向きをEXIF情報に基づいて補正
             if hasattr(img, '_getexif'):
                 exif = img._getexif()
@@ -1053,19 +1157,95 @@ def create_thumbnail(original_path, thumbnail_path, size=(100, 100)):
         return False
 
 
-def is_proxy_connection(ip_address: str) -> (bool, str):
+# --- IPアドレス解析のキャッシュ ---
+# 同じIPやネットワークからのアクセスが大半を占めるため、文字列の検証・解析結果を再利用します。
+# 解析に失敗した場合は ValueError がそのまま送出されます (例外はキャッシュされません)。
+@functools.lru_cache(maxsize=4096)
+def parse_ip(ip_str):
+    """IPアドレス文字列を解析し、キャッシュされた `ipaddress` オブジェクトを返します。"""
+    return ipaddress.ip_address(ip_str)
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_net(net_str):
+    """ネットワーク文字列を `strict=False` で解析し、キャッシュされた `ipaddress` オブジェクトを返します。"""
+    return ipaddress.ip_network(net_str, strict=False)
+
+
+# --- IP BANリストのキャッシュ ---
+# リクエストのたびにDBからBANリストを読み込まないよう、整数演算で照合できる形式に
+# 変換したものをIPバージョンごとに保持します。BANの追加/削除時には破棄されます。
+IP_BAN_CACHE_TTL = 5.0  # 秒
+# {'loaded_at': 読み込み時刻(monotonic) または None, 4: ((ネットワーク, マスク), ...), 6: (...)}
+_ip_ban_cache = {'loaded_at': None, 4: (), 6: ()}
+
+
+def _get_ip_ban_table():
+    """IPバージョンごとに変換済みのBANリストを返します。期限切れの場合はDBから読み直します。"""
+    global _ip_ban_cache
+    from . import database
+
+    cache = _ip_ban_cache
+    now = time.monotonic()
+    if cache['loaded_at'] is not None and now - cache['loaded_at'] <= IP_BAN_CACHE_TTL:
+        return cache
+
+    table = {4: [], 6: []}
+    for ban in database.get_all_ip_bans() or []:
+        try:
+            net = parse_net(ban['ip_address'])
+        except ValueError:
+            logging.warning(f"不正なBANエントリをスキップしました: {ban['ip_address']}")
+            continue
+        table[net.version].append(
+            (int(net.network_address), int(net.netmask)))
+    cache = {'loaded_at': now, 4: tuple(table[4]), 6: tuple(table[6])}
+    _ip_ban_cache = cache
+    return cache
+
+
+def invalidate_ip_ban_cache():
+    """IP BANリストのキャッシュを破棄します。BANの追加/削除後に呼び出してください。"""
+    global _ip_ban_cache
+    _ip_ban_cache = {'loaded_at': None, 4: (), 6: ()}
+
+
+def has_ip_bans() -> bool:
+    """BANリストに1件以上のエントリがあるかどうかを返します。"""
+    table = _get_ip_ban_table()
+    return bool(table[4] or table[6])
+
+
+def is_ip_banned(ip_obj) -> bool:
+    """解析済みのIPアドレスがBANリストに含まれるか判定します。
+
+    Args:
+        ip_obj (ipaddress.IPv4Address | ipaddress.IPv6Address): 判定するIPアドレス。
+    """
+    bans = _get_ip_ban_table()[ip_obj.version]
+    if not bans:
+        return False
+    ip_int = int(ip_obj)
+    return any(ip_int & mask == network for network, mask in bans)
+
+
+def is_proxy_connection(ip_address: str, ip_obj=None) -> (bool, str):
     """指定されたIPアドレスがプロキシ、VPN、またはTor出口ノードであるかを判定します。
 
     ip-api.com のサービスを利用します。
 
     Args:
         ip_address (str): チェックするIPアドレス。
+        ip_obj (ipaddress.IPv4Address | ipaddress.IPv6Address, optional):
+            解析済みのIPアドレス。呼び出し元で既に解析している場合に渡します。
 
     Returns:
         tuple[bool, str]: (ブロック対象かどうか, 判定理由) のタプル。
                           例: (True, "proxy"), (False, "residential")
     """
     # ローカルホストやプライベートIPはチェック対象外
+    if ip_obj is not None and (ip_obj.is_loopback or ip_obj.is_private):
+        return False, "local/private"
     if ip_address in ('127.0.0.1', '::1') or ip_address.startswith('192.168.') or ip_address.startswith('10.') or ip_address.startswith('172.'):
         return False, "local/private"
 
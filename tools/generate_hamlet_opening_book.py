@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: 2025 mid.yuki(LoveYokado)
+# SPDX-License-Identifier: MIT
+
+import os
+import sys
+
+# プロジェクトのルートディレクトリを import パスに追加し、src パッケージを読み込めるようにする
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from src import hamlet_game  # noqa: E402
+
+# 1局面あたりの探索時間 (秒)。ゲーム中の AI_THINK_SECONDS よりも十分長く取る。
+THINK_SECONDS = 20.0
+
+
+def board_from_moves(moves):
+    """手順 (0始まりの列番号の文字列) から盤面を作成します。
+
+    定跡はAIの手番の局面のみを扱うため、手数が偶数ならAI、奇数なら人間が先攻です。
+    """
+    board = hamlet_game.create_board()
+    player = hamlet_game.PLAYER_AI if len(
+        moves) % 2 == 0 else hamlet_game.PLAYER_HUMAN
+    for move in moves:
+        hamlet_game.drop_piece(board, int(move), player)
+        player = hamlet_game.PLAYER_AI if player == hamlet_game.PLAYER_HUMAN else hamlet_game.PLAYER_HUMAN
+    return board
+
+
+def generate_book():
+    """
+    ハムレットゲームの定跡 (序盤のAIの手) を、通常より長い時間の探索で求めます。
+
+    AIが先攻の場合は1手目と3手目、後攻の場合は2手目と4手目の局面を対象とし、
+    結果を hamlet_game.OPENING_BOOK_MOVES に貼り付けられる形式で出力します。
+    """
+    book = {}
+
+    def solve(moves):
+        col = hamlet_game.ai_choose_column_heuristic(
+            board_from_moves(moves), {}, think_seconds=THINK_SECONDS, use_book=False)
+        book[moves] = col
+        print(f"    {moves!r}: {col},", flush=True)
+        return col
+
+    cols = range(hamlet_game.COLS)
+    print("OPENING_BOOK_MOVES = {")
+    # AIが先攻
+    first = solve("")
+    for human in cols:
+        solve(f"{first}{human}")
+    # AIが後攻
+    for human in cols:
+        reply = solve(f"{human}")
+        for human2 in cols:
+            solve(f"{human}{reply}{human2}")
+    print("}")
+    return book
+
+
+if __name__ == '__main__':
+    generate_book()